@@ -1,66 +1,93 @@
-import csv
-from collections import defaultdict
+import argparse
+
+import numpy as np
+
+from src.analytics import (
+    bootstrap_rate_ci,
+    cost_latency_columns,
+    group_pass_at_k,
+    group_rates,
+    load_runs,
+    num_rows,
+    pass_at_k_values,
+    value_counts,
+)
+from src.metrics import format_cost_latency
 
 CSV_PATH = "results/experiment_runs.csv"
 
 
 def main():
-    with open(CSV_PATH, "r") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
+    parser = argparse.ArgumentParser(description="Summarize multi-run experiment sweeps.")
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=[CSV_PATH],
+        help=f"Sweep files (.csv or .parquet) to analyze together (default: {CSV_PATH}).",
+    )
+    args = parser.parse_args()
 
-    # Group stats by task_id
-    stats = defaultdict(lambda: {
-        "title": None,
-        "func_name": None,
-        "runs": 0,
-        "initial_passed_count": 0,
-        "final_passed_count": 0,
-        "repair_used_count": 0,
-        "total_iterations_when_repair_used": 0,
-    })
+    cols = load_runs(args.paths)
+    if num_rows(cols) == 0:
+        print(f"No runs found in {', '.join(args.paths)}")
+        return
 
-    for row in rows:
-        task_id = row["task_id"]
-        s = stats[task_id]
+    # Group stats by task_id
+    keys, stats = group_rates(cols, ["task_id"])
+    _, title_at = np.unique(cols["task_id"], return_index=True)
 
-        s["title"] = row["title"]
-        s["func_name"] = row["func_name"]
-        s["runs"] += 1
+    # Pretty-print summary
+    print(f"Analysis of {len(keys['task_id'])} tasks from {', '.join(args.paths)}\n")
 
-        initial_passed = row["initial_passed"] == "True"
-        final_passed = row["final_passed"] == "True"
-        used_repair = row["used_repair"] == "True"
-        iterations = int(row["iterations"])
+    for i, task_id in enumerate(keys["task_id"]):
+        row = title_at[i]
+        print(f"Task {task_id}: {cols['title'][row]}  (func: {cols['func_name'][row]})")
+        print(f"  Runs: {int(stats['runs'][i])}")
+        print(f"  Initial pass rate : {stats['initial_pass_rate'][i]:.2f}")
+        print(f"  Final pass rate   : {stats['final_pass_rate'][i]:.2f}")
+        print(f"  Repair used rate  : {stats['repair_used_rate'][i]:.2f}")
+        print(f"  Avg iters (when repair used): {stats['avg_iters_when_repair'][i]:.2f}")
+        print("-" * 60)
 
-        if initial_passed:
-            s["initial_passed_count"] += 1
-        if final_passed:
-            s["final_passed_count"] += 1
-        if used_repair:
-            s["repair_used_count"] += 1
-            s["total_iterations_when_repair_used"] += iterations
+    # Overall rates with 95% bootstrap CIs and pass@k over tasks
+    _, overall = group_rates(cols, [])
+    init_lo, init_hi = bootstrap_rate_ci(overall["initial_passed"], overall["runs"])
+    final_lo, final_hi = bootstrap_rate_ci(overall["final_passed"], overall["runs"])
+    max_k = int(stats["runs"].min())
+    k_values = pass_at_k_values(max_k)
+    _, pass_k = group_pass_at_k(cols, [], k_values=k_values)
+    _, draft_pass_k = group_pass_at_k(cols, [], k_values=k_values, outcome="initial_passed")
 
-    # Pretty-print summary
-    print(f"Analysis of {len(stats)} tasks from {CSV_PATH}\n")
+    print("\nOverall (95% bootstrap CI)")
+    print(
+        f"  Initial pass rate : {overall['initial_pass_rate'][0]:.3f} "
+        f"[{init_lo[0]:.3f}, {init_hi[0]:.3f}]"
+    )
+    print(
+        f"  Final pass rate   : {overall['final_pass_rate'][0]:.3f} "
+        f"[{final_lo[0]:.3f}, {final_hi[0]:.3f}]"
+    )
+    print(f"  Repair lift       : {overall['repair_lift'][0]:+.3f}")
+    print(f"  Unbiased pass@k over {max_k} runs per task (first draft / after repair):")
+    for k in k_values:
+        print(f"    pass@{k:<11}: {draft_pass_k[k][0]:.3f} / {pass_k[k][0]:.3f}")
 
-    for task_id, s in stats.items():
-        runs = s["runs"]
-        init_rate = s["initial_passed_count"] / runs
-        final_rate = s["final_passed_count"] / runs
-        repair_rate = s["repair_used_count"] / runs
-        avg_iters = (
-            s["total_iterations_when_repair_used"] / s["repair_used_count"]
-            if s["repair_used_count"] > 0 else 0.0
-        )
+    # Why the repair loop stopped (sweeps with a stop_reason column)
+    reasons = value_counts(cols, "stop_reason")
+    if reasons:
+        print("\nStop reasons (all runs)")
+        for reason, n in sorted(reasons.items(), key=lambda item: -item[1]):
+            print(f"  {reason:<18}: {n}")
+        escalations = value_counts(cols, "escalations")
+        if escalations:
+            print("  Escalations       : " + ", ".join(f"{e}={n}" for e, n in sorted(escalations.items())))
 
-        print(f"Task {task_id}: {s['title']}  (func: {s['func_name']})")
-        print(f"  Runs: {runs}")
-        print(f"  Initial pass rate : {init_rate:.2f}")
-        print(f"  Final pass rate   : {final_rate:.2f}")
-        print(f"  Repair used rate  : {repair_rate:.2f}")
-        print(f"  Avg iters (when repair used): {avg_iters:.2f}")
-        print("-" * 60)
+    # Cost & latency over all runs (only for sweeps with tracing columns)
+    summary = cost_latency_columns(cols)
+    if summary:
+        print("\nCost & latency (all runs)")
+        for line in format_cost_latency(summary):
+            print(line)
 
 
 if __name__ == "__main__":
@@ -1,94 +1,111 @@
 # analyze_experiments_advanced.py
 
-import csv
-from collections import defaultdict
+import argparse
+
+import numpy as np
+
+from src.analytics import (
+    bootstrap_rate_ci,
+    cost_latency_columns,
+    group_pass_at_k,
+    group_rates,
+    load_runs,
+    num_rows,
+    pass_at_k_values,
+    value_counts,
+)
+from src.metrics import format_cost_latency
 
 CSV_PATH = "results/advanced_experiment_runs.csv"
 
 
 def main():
-    with open(CSV_PATH, "r") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-
-    # stats[(task_id, strategy)] -> aggregations
-    stats = defaultdict(
-        lambda: {
-            "title": None,
-            "func_name": None,
-            "strategy": None,
-            "runs": 0,
-            "initial_passed_count": 0,
-            "final_passed_count": 0,
-            "repair_used_count": 0,
-            "total_iterations_when_repair_used": 0,
-            "sum_initial_static_issues": 0,
-            "sum_final_static_issues": 0,
-        }
+    parser = argparse.ArgumentParser(description="Compare repair strategies across sweeps.")
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=[CSV_PATH],
+        help=f"Sweep files (.csv or .parquet) to analyze together (default: {CSV_PATH}).",
     )
+    args = parser.parse_args()
+
+    cols = load_runs(args.paths)
+    if num_rows(cols) == 0:
+        print(f"No runs found in {', '.join(args.paths)}")
+        return
+
+    # One vectorized pass over all rows; groups come back sorted by
+    # (task_id, strategy), so each task's strategies are contiguous
+    keys, stats = group_rates(cols, ["task_id", "strategy"])
+    _, title_at = np.unique(cols["task_id"], return_index=True)
+    task_ids = np.unique(cols["task_id"])
+
+    print(f"Analysis of strategies from {', '.join(args.paths)}\n")
+
+    for t, task_id in enumerate(task_ids):
+        row = title_at[t]
+        print(f"Task {task_id}: {cols['title'][row]}  (func: {cols['func_name'][row]})")
+
+        for i in np.flatnonzero(keys["task_id"] == task_id):
+            print(f"  Strategy: {keys['strategy'][i]}")
+            print(f"    Runs: {int(stats['runs'][i])}")
+            print(f"    Initial pass rate : {stats['initial_pass_rate'][i]:.2f}")
+            print(f"    Final pass rate   : {stats['final_pass_rate'][i]:.2f}")
+            print(f"    Repair used rate  : {stats['repair_used_rate'][i]:.2f}")
+            print(f"    Avg iters (when repair used): {stats['avg_iters_when_repair'][i]:.2f}")
+            print(f"    Avg flake8 issues (initial): {stats['avg_initial_static_issues'][i]:.2f}")
+            print(f"    Avg flake8 issues (final)  : {stats['avg_final_static_issues'][i]:.2f}")
+        print("-" * 70)
+
+    # Strategy-level rates with 95% bootstrap CIs, repair lift and pass@k
+    strat_keys, strat = group_rates(cols, ["strategy"])
+    final_lo, final_hi = bootstrap_rate_ci(strat["final_passed"], strat["runs"])
+    max_k = int(stats["runs"].min())
+    k_values = pass_at_k_values(max_k)
+    _, pass_k = group_pass_at_k(cols, ["strategy"], k_values=k_values)
+    _, draft_pass_k = group_pass_at_k(cols, ["strategy"], k_values=k_values, outcome="initial_passed")
+
+    print("\nPer strategy (all tasks, 95% bootstrap CI)\n")
+    for i, name in enumerate(strat_keys["strategy"]):
+        print(f"Strategy: {name}")
+        print(f"  Runs              : {int(strat['runs'][i])}")
+        print(f"  Initial pass rate : {strat['initial_pass_rate'][i]:.3f}")
+        print(
+            f"  Final pass rate   : {strat['final_pass_rate'][i]:.3f} "
+            f"[{final_lo[i]:.3f}, {final_hi[i]:.3f}]"
+        )
+        print(f"  Repair lift       : {strat['repair_lift'][i]:+.3f}")
+        print(f"  Unbiased pass@k over {max_k} runs per task (first draft / after repair):")
+        for k in k_values:
+            print(f"    pass@{k:<11}: {draft_pass_k[k][i]:.3f} / {pass_k[k][i]:.3f}")
+    print("-" * 70)
+
+    # Why the repair loop stopped, per strategy (sweeps with a stop_reason column)
+    if value_counts(cols, "stop_reason"):
+        print("\nStop reasons per strategy\n")
+        for name in strat_keys["strategy"]:
+            mask = cols["strategy"] == name
+            reasons = value_counts(cols, "stop_reason", mask)
+            print(f"Strategy: {name}")
+            print("  " + ", ".join(f"{r}={n}" for r, n in sorted(reasons.items(), key=lambda item: -item[1])))
+            escalations = value_counts(cols, "escalations", mask)
+            if escalations:
+                print("  Escalations: " + ", ".join(f"{e}={n}" for e, n in sorted(escalations.items())))
+        print("-" * 70)
 
-    for row in rows:
-        key = (row["task_id"], row["strategy"])
-        s = stats[key]
-
-        s["title"] = row["title"]
-        s["func_name"] = row["func_name"]
-        s["strategy"] = row["strategy"]
-        s["runs"] += 1
-
-        initial_passed = (row["initial_passed"] == "True")
-        final_passed = (row["final_passed"] == "True")
-        used_repair = (row["used_repair"] == "True")
-        iterations = int(row["iterations"])
-
-        s["sum_initial_static_issues"] += int(row["initial_static_issues"])
-        s["sum_final_static_issues"] += int(row["final_static_issues"])
-
-        if initial_passed:
-            s["initial_passed_count"] += 1
-        if final_passed:
-            s["final_passed_count"] += 1
-        if used_repair:
-            s["repair_used_count"] += 1
-            s["total_iterations_when_repair_used"] += iterations
-
-    print(f"Analysis of strategies from {CSV_PATH}\n")
-
-    # Group by task so we can print strategies side-by-side
-    tasks = sorted(set(task_id for (task_id, _) in stats.keys()), key=int)
-
-    for task_id in tasks:
-        # Collect all strategies for this task
-        task_stats = [v for (tid, _), v in stats.items() if tid == task_id]
-        # Sort by strategy name for stable output
-        task_stats.sort(key=lambda x: x["strategy"])
-
-        title = task_stats[0]["title"]
-        func_name = task_stats[0]["func_name"]
-
-        print(f"Task {task_id}: {title}  (func: {func_name})")
-
-        for s in task_stats:
-            runs = s["runs"]
-            init_rate = s["initial_passed_count"] / runs
-            final_rate = s["final_passed_count"] / runs
-            repair_rate = s["repair_used_count"] / runs
-            avg_iters = (
-                s["total_iterations_when_repair_used"] / s["repair_used_count"]
-                if s["repair_used_count"] > 0
-                else 0.0
-            )
-            avg_initial_static = s["sum_initial_static_issues"] / runs
-            avg_final_static = s["sum_final_static_issues"] / runs
-
-            print(f"  Strategy: {s['strategy']}")
-            print(f"    Runs: {runs}")
-            print(f"    Initial pass rate : {init_rate:.2f}")
-            print(f"    Final pass rate   : {final_rate:.2f}")
-            print(f"    Repair used rate  : {repair_rate:.2f}")
-            print(f"    Avg iters (when repair used): {avg_iters:.2f}")
-            print(f"    Avg flake8 issues (initial): {avg_initial_static:.2f}")
-            print(f"    Avg flake8 issues (final)  : {avg_final_static:.2f}")
+    # Cost & latency per strategy (only for sweeps with tracing columns)
+    summaries = {
+        name: cost_latency_columns(cols, cols["strategy"] == name)
+        for name in strat_keys["strategy"]
+    }
+    if any(summaries.values()):
+        print("\nCost & latency per strategy\n")
+        for name in sorted(summaries):
+            if summaries[name] is None:
+                continue
+            print(f"Strategy: {name}")
+            for line in format_cost_latency(summaries[name]):
+                print(line)
         print("-" * 70)
 
 
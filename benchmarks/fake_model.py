@@ -0,0 +1,162 @@
+# benchmarks/fake_model.py
+#
+# Scripted stand-in for the LLM, used with src.llm_client.FakeBackend:
+#
+#   model = ScriptedModel(tasks, seed=0)
+#   set_backend(FakeBackend(model.respond, latency_s=0.05))
+#
+# Replies are built from each task's own tests, so no reference solutions
+# are needed: a "correct" completion is a lookup table from test input to
+# expected output. Every other scenario perturbs that program in a way the
+# real model does (wrong edge case, syntax error, infinite loop, slow code,
+# lint noise, chatty prints). Which scenario a call gets is decided by a
+# hash of (seed, task, call kind, attempt), so a benchmark replays the
+# same mix of completions every time.
+
+import hashlib
+import threading
+
+# Scenario weights for first drafts (generation and review calls)
+DEFAULT_MIX = {
+    "correct": 40,
+    "wrong_edge": 20,
+    "syntax_error": 10,
+    "infinite_loop": 10,
+    "slow": 10,
+    "lint_noise": 10,
+}
+
+# Scenario weights for repair calls: usually fixed, sometimes still broken
+REPAIR_MIX = {
+    "correct": 70,
+    "wrong_edge": 20,
+    "slow": 10,
+}
+
+SCENARIOS = (
+    "correct",
+    "wrong_edge",
+    "syntax_error",
+    "infinite_loop",
+    "slow",
+    "lint_noise",
+    "prints",
+)
+
+
+def _table_entries(task):
+    entries = []
+    for test in task["tests"]:
+        args = tuple(test["input"]) if test.get("multi_args") and isinstance(test["input"], list) else (test["input"],)
+        entries.append((repr(args), test["expected"]))
+    return entries
+
+
+def solution(task, scenario="correct", slow_s=0.2) -> str:
+    """
+    Source of a candidate for `task` under `scenario` (see SCENARIOS). The
+    program answers every test input in the task from a table, so
+    "correct" passes all tests.
+    """
+    func_name = task["func_name"]
+    entries = _table_entries(task)
+    if scenario == "wrong_edge" and entries:
+        # Get the last test wrong, like a missed edge case
+        key, _ = entries[-1]
+        entries[-1] = (key, "__wrong__")
+
+    table = ",\n".join(f"    {key!r}: {expected!r}" for key, expected in entries)
+    body = [
+        f"_ANSWERS = {{\n{table},\n}}",
+        "",
+        "",
+        f"def {func_name}(*args):",
+    ]
+    if scenario == "infinite_loop":
+        body.append("    while True:")
+        body.append("        pass")
+    if scenario == "slow":
+        body.insert(0, "import time")
+        body.append(f"    time.sleep({slow_s})")
+    if scenario == "prints":
+        body.append("    print('debug', args)")
+    body += [
+        "    answer = _ANSWERS.get(repr(args))",
+        "    if answer == 'error_div_zero':",
+        "        raise ZeroDivisionError('division by zero')",
+        "    return answer",
+    ]
+    code = "\n".join(body) + "\n"
+
+    if scenario == "syntax_error":
+        code = code.replace(f"def {func_name}(*args):", f"def {func_name}(*args)")
+    if scenario == "lint_noise":
+        code = "import os, sys\nimport json\n" + code.replace("    return answer", "    unused = 1;  return answer   ") + "x=1\n"
+    return code
+
+
+class ScriptedModel:
+    """
+    Deterministic responder for FakeBackend. Recognizes the task from the
+    problem description in the prompt and the call kind from the prompt
+    template, then replies with solution(task, scenario).
+
+    Counts every (kind, scenario) it served in `served`.
+    """
+
+    def __init__(self, tasks, seed=0, mix=None, repair_mix=None, slow_s=0.2):
+        self.tasks = list(tasks)
+        self.seed = seed
+        self.mix = mix or DEFAULT_MIX
+        self.repair_mix = repair_mix or REPAIR_MIX
+        self.slow_s = slow_s
+        self.served = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def _task_for(self, prompt):
+        # Longest description first, so a task whose description contains
+        # another's is still matched correctly
+        for task in sorted(self.tasks, key=lambda t: -len(t["description"])):
+            if task["description"] in prompt:
+                return task
+        for task in self.tasks:
+            if task["func_name"] in prompt:
+                return task
+        return None
+
+    @staticmethod
+    def _kind(prompt):
+        if "senior Python code reviewer" in prompt:
+            return "review"
+        if "corrected version" in prompt or "unified diff" in prompt:
+            return "repair"
+        return "generate"
+
+    @staticmethod
+    def _pick(weights, digest):
+        total = sum(weights.values())
+        point = int(digest[:8], 16) % total
+        for scenario, weight in weights.items():
+            if point < weight:
+                return scenario
+            point -= weight
+        return next(iter(weights))
+
+    def respond(self, model, messages, temperature):
+        prompt = messages[-1]["content"]
+        task = self._task_for(prompt)
+        if task is None:
+            return "def solution(*args):\n    return None\n"
+
+        kind = self._kind(prompt)
+        key = (task["id"], kind, prompt if kind == "repair" else "")
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+
+        digest = hashlib.sha256(f"{self.seed}/{task['id']}/{kind}/{attempt}/{temperature}".encode()).hexdigest()
+        scenario = self._pick(self.repair_mix if kind == "repair" else self.mix, digest)
+        with self._lock:
+            self.served[(kind, scenario)] = self.served.get((kind, scenario), 0) + 1
+        return solution(task, scenario, slow_s=self.slow_s)
@@ -0,0 +1,302 @@
+# benchmarks/run_benchmarks.py
+#
+# Offline end-to-end benchmarks of the pipeline with a scripted fake model
+# (benchmarks/fake_model.py): no API key, no network, no rate limits.
+#
+#   python -m benchmarks.run_benchmarks                      # every suite
+#   python -m benchmarks.run_benchmarks --suite repair --scale 4
+#   python -m benchmarks.run_benchmarks --json bench.json    # save numbers
+#   python -m benchmarks.run_benchmarks --baseline bench.json  # exit 1 on a
+#                                                            # throughput regression
+#
+# Suites:
+#   repair       repair_code() on a broken first draft of every task
+#   run          run.py main()
+#   experiments  run_experiments.py main()
+#   advanced     run_experiments_advanced.py main() (all strategies, threaded)
+#
+# The runners write to relative results/ paths, so every suite runs inside
+# a throwaway working directory holding its own tasks/sample_tasks.json.
+# For each suite the report gives throughput (units/s), mean and p95
+# latency per pipeline stage (from src/tracing.py) and peak memory of the
+# harness and of the sandbox workers. ru_maxrss is a high-water mark over a
+# process's lifetime, so every suite runs in a freshly spawned process and
+# its peaks are its own rather than the maximum of all suites so far.
+
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Tight sandbox limits so infinite-loop completions cost well under a second.
+# Applied before src.config is imported; explicit environment settings win.
+BENCH_ENV = {
+    "SANDBOX_TEST_TIMEOUT_S": "0.5",
+    "SANDBOX_TEST_CPU_S": "0.5",
+    "SANDBOX_TIMEOUT_S": "3",
+    "LLM_CACHE_MODE": "off",
+}
+
+SUITES = ("repair", "run", "experiments", "advanced")
+
+STAGE_COLUMNS = (
+    "llm_generate_s",
+    "llm_review_s",
+    "llm_repair_s",
+    "sandbox_spawn_s",
+    "sandbox_exec_s",
+    "lint_s",
+    "total_s",
+)
+
+
+def scaled_tasks(tasks, scale):
+    """
+    `scale` copies of the task list. Copies get their own id and function
+    name, so their candidates differ and are not answered from the result
+    caches.
+    """
+    out = []
+    for k in range(scale):
+        for task in tasks:
+            copy = json.loads(json.dumps(task))
+            if k:
+                name = f"{task['func_name']}_{k}"
+                copy["id"] = task["id"] + 1000 * k
+                copy["description"] = f"{task['description'].replace(task['func_name'], name)} (variant {k}, function {name})"
+                copy["func_name"] = name
+            out.append(copy)
+    return out
+
+
+def _stage_summary(rows):
+    """Mean and p95 per stage column over per-unit tracer rows."""
+    import numpy as np
+
+    summary = {}
+    for column in STAGE_COLUMNS:
+        values = np.array([float(r.get(column) or 0) for r in rows])
+        if values.size:
+            summary[column] = {"mean": float(values.mean()), "p95": float(np.percentile(values, 95))}
+    return summary
+
+
+def _reset_state():
+    """Fresh caches, test history, sandbox pool and artifact store for the next suite."""
+    from src import artifact_store, sandbox
+    from src.result_cache import lint_cache, test_results_cache
+    from src.test_history import test_history
+
+    test_results_cache.clear()
+    lint_cache.clear()
+    test_history.clear()
+    if sandbox._pool is not None:
+        sandbox._pool.close()
+        sandbox._pool = None
+    if artifact_store._store is not None:
+        artifact_store._store.close()
+        artifact_store._store = None
+
+
+def _peak_rss_mb(who):
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(who).ru_maxrss / 1024.0
+
+
+def _run_repair(tasks, args):
+    from src import tracing
+    from src.repair_loop import repair_code
+    from benchmarks.fake_model import solution
+
+    rows = []
+    for task in tasks:
+        broken = solution(task, "wrong_edge")
+        with tracing.trace(task_id=task["id"]) as tracer:
+            repair_code(task["description"], task["func_name"], broken, task["tests"], max_iters=3, seed="bench")
+        rows.append(tracer.columns())
+    return len(tasks), rows
+
+
+def _run_script(module_name, argv, runs, csv_path):
+    import importlib
+
+    module = importlib.import_module(module_name)
+    if runs is not None:
+        module.N_RUNS = runs
+    saved_argv = sys.argv
+    sys.argv = [module_name + ".py"] + argv
+    try:
+        module.main()
+    finally:
+        sys.argv = saved_argv
+
+    if csv_path is None:
+        return None
+    from src.analytics import load_runs, num_rows
+
+    cols = load_runs(csv_path)
+    rows = [{c: cols[c][i] for c in STAGE_COLUMNS if c in cols} for i in range(num_rows(cols))]
+    return len(rows), rows
+
+
+def run_suite(name, tasks, args):
+    from src.llm_client import FakeBackend, set_backend
+    from src import tracing
+    from src.result_cache import cache_stats
+    from benchmarks.fake_model import ScriptedModel
+
+    _reset_state()
+    model = ScriptedModel(tasks, seed=args.seed, slow_s=args.slow_s)
+    backend = FakeBackend(model.respond, latency_s=args.llm_latency)
+    set_backend(backend)
+
+    workdir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    os.makedirs(os.path.join(workdir, "tasks"))
+    with open(os.path.join(workdir, "tasks", "sample_tasks.json"), "w") as f:
+        json.dump(tasks, f)
+
+    extra = ["--batch-generate"] if args.batch_generate else []
+    cwd = os.getcwd()
+    out = sys.stdout if args.verbose else io.StringIO()
+    started = time.perf_counter()
+    try:
+        os.chdir(workdir)
+        with contextlib.redirect_stdout(out):
+            if name == "repair":
+                units, rows = _run_repair(tasks, args)
+            elif name == "run":
+                # run.py has no per-unit tracing; one trace covers the whole run
+                with tracing.trace() as tracer:
+                    _run_script("run", [], None, None)
+                units = len(tasks)
+                total = tracer.columns()
+                rows = [{c: float(total[c]) / units for c in STAGE_COLUMNS if c in total}]
+            elif name == "experiments":
+                units, rows = _run_script("run_experiments", extra, args.runs, "results/experiment_runs.csv")
+            else:
+                units, rows = _run_script(
+                    "run_experiments_advanced",
+                    ["--concurrency", str(args.concurrency)] + extra,
+                    args.runs,
+                    "results/advanced_experiment_runs.csv",
+                )
+        wall_s = time.perf_counter() - started
+        caches = cache_stats()
+    finally:
+        os.chdir(cwd)
+        _reset_state()  # closes the pool, so worker peaks land in RUSAGE_CHILDREN
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "units": units,
+        "wall_s": round(wall_s, 3),
+        "units_per_s": round(units / wall_s, 3) if wall_s > 0 else None,
+        "llm_calls": backend.calls,
+        "scenarios": {f"{kind}:{scenario}": n for (kind, scenario), n in sorted(model.served.items())},
+        "stages": _stage_summary(rows),
+        "caches": caches,
+        "peak_rss_mb": round(_peak_rss_mb(resource.RUSAGE_SELF), 1),
+        "sandbox_peak_rss_mb": round(_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    }
+
+
+def print_report(report):
+    for name, r in report["suites"].items():
+        print(f"\n== {name} ==")
+        print(f"  Units             : {r['units']} in {r['wall_s']:.2f}s  ({r['units_per_s']:.2f} units/s)")
+        print(f"  LLM calls         : {r['llm_calls']}")
+        print(f"  Peak RSS          : harness {r['peak_rss_mb']:.0f} MB, sandbox worker {r['sandbox_peak_rss_mb']:.0f} MB")
+        hits = ", ".join(f"{name} {c['hits']}/{c['hits'] + c['misses']}" for name, c in r["caches"].items())
+        print(f"  Cache hits        : {hits}")
+        print("  Stage latency per unit (mean / p95):")
+        for column, s in r["stages"].items():
+            print(f"    {column:<16}: {s['mean'] * 1000:8.1f} ms / {s['p95'] * 1000:8.1f} ms")
+        mix = ", ".join(f"{k}={v}" for k, v in r["scenarios"].items())
+        print(f"  Completions served: {mix}")
+
+
+def compare(report, baseline, tolerance):
+    """Names of suites whose throughput dropped by more than `tolerance`."""
+    regressions = []
+    for name, r in report["suites"].items():
+        old = baseline.get("suites", {}).get(name)
+        if not old or not old.get("units_per_s") or not r.get("units_per_s"):
+            continue
+        change = r["units_per_s"] / old["units_per_s"] - 1
+        print(f"  {name:<12}: {old['units_per_s']:.2f} -> {r['units_per_s']:.2f} units/s ({change:+.1%})")
+        if change < -tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks with a scripted fake LLM.")
+    parser.add_argument("--suite", choices=SUITES + ("all",), default="all")
+    parser.add_argument("--tasks", default=os.path.join(ROOT, "tasks", "sample_tasks.json"), help="Task file to benchmark on.")
+    parser.add_argument("--scale", type=int, default=1, help="Copies of the task set (distinct function names).")
+    parser.add_argument("--runs", type=int, default=2, help="N_RUNS for the experiment runners.")
+    parser.add_argument("--concurrency", type=int, default=4, help="--concurrency for the advanced runner.")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM call.")
+    parser.add_argument("--slow-s", type=float, default=0.2, help="Sleep per call in 'slow' completions.")
+    parser.add_argument(
+        "--batch-generate", action="store_true", help="Run the experiment runners with --batch-generate."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the scripted completion mix.")
+    parser.add_argument("--json", metavar="PATH", help="Write the report as JSON.")
+    parser.add_argument("--baseline", metavar="PATH", help="Earlier --json report to compare throughput against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed throughput drop vs. --baseline.")
+    parser.add_argument("--verbose", action="store_true", help="Show the runners' own output.")
+    args = parser.parse_args()
+
+    for name, value in BENCH_ENV.items():
+        os.environ.setdefault(name, value)
+
+    from src.task_loader import load_tasks
+
+    tasks = scaled_tasks(load_tasks(args.tasks), max(1, args.scale))
+    suites = SUITES if args.suite == "all" else (args.suite,)
+
+    report = {
+        "tasks": len(tasks),
+        "runs": args.runs,
+        "concurrency": args.concurrency,
+        "llm_latency_s": args.llm_latency,
+        "batch_generate": args.batch_generate,
+        "suites": {},
+    }
+    for name in suites:
+        print(f"Running {name} benchmark on {len(tasks)} tasks ...", flush=True)
+        # A new process per suite, so peak RSS is measured per suite
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            report["suites"][name] = pool.submit(run_suite, name, tasks, args).result()
+
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nThroughput vs. {args.baseline} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"REGRESSION in: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# rescore.py
+#
+# Re-score a finished sweep from the candidates kept in the artifact store
+# (src/artifact_store.py): only the sandbox and analysis stages run again,
+# no LLM requests are made.
+#
+#   python3 rescore.py advanced                 # units whose task tests changed
+#   python3 rescore.py experiments --all        # every unit (e.g. scoring logic changed)
+#
+# A unit is re-scored when the tests of its task differ from the ones it was
+# last scored against (or with --all). Its stored initial and final
+# candidates are re-tested in parallel batches, identical ones once, and
+# initial_passed / final_passed (plus the flake8 columns of the advanced
+# sweep) are rewritten in the CSV. The pipeline's decisions stay as they
+# were: a draft that now fails is not repaired, and used_repair,
+# iterations and stop_reason still describe the original run.
+
+import argparse
+import csv
+import os
+import time
+
+import run_experiments
+import run_experiments_advanced
+from src.analyzer import analyze_results
+from src.artifact_store import ArtifactStore, tests_hash
+from src.batch_generation import run_tests_deduplicated
+from src.config import ARTIFACTS_PATH, MAX_CONCURRENCY
+from src.static_analyzer import run_static_analysis
+from src.task_loader import add_task_arguments, tasks_from_args
+
+RUNNERS = {
+    "advanced": {
+        "csv": run_experiments_advanced.RESULTS_CSV,
+        "key_fields": ["strategy", "run_id", "task_id"],
+    },
+    "experiments": {
+        "csv": run_experiments.RESULTS_CSV,
+        "key_fields": ["run_id", "task_id"],
+    },
+}
+
+SCORED_FIELDS = ["initial_passed", "final_passed", "initial_static_issues", "final_static_issues"]
+
+
+def _read_rows(path):
+    with open(path, "r", newline="") as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames, list(reader)
+
+
+def _write_rows(path, fieldnames, rows):
+    # Write next to the target and swap it in, so a crash never leaves half a CSV
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def rescore(store, runner: str, tasks: list, rows: list, rescore_all: bool = False, concurrency: int = 1) -> dict:
+    """
+    Re-score the rows (CSV dicts, updated in place) of `runner` whose
+    stored units need it. Returns a report with the re-scored units
+    (for set_tests_hash), the tasks involved and per-field flip counts.
+    """
+    key_fields = RUNNERS[runner]["key_fields"]
+    by_key = {tuple(row[k] for k in key_fields): row for row in rows}
+    by_id = {str(task["id"]): task for task in tasks}
+
+    todo = []
+    missing = 0
+    for unit in store.units(runner):
+        task = by_id.get(unit["task_id"])
+        if task is None:
+            continue
+        current = tests_hash(task["tests"])
+        if not rescore_all and unit["tests_hash"] == current:
+            continue
+        row = by_key.get(tuple(unit[k] for k in key_fields))
+        if row is None or "initial" not in unit["stages"]:
+            missing += 1
+            continue
+        todo.append((unit, task, row, current))
+
+    codes = {}
+
+    def code(digest):
+        if digest not in codes:
+            codes[digest] = store.get_code(digest)
+        return codes[digest]
+
+    # Initial and final candidate of every unit, tested in one deduplicated pass
+    candidates = []
+    for unit, task, row, _ in todo:
+        stages = unit["stages"]
+        for stage in ("initial", "final"):
+            candidates.append((code(stages.get(stage, stages["initial"])), task["tests"], task["func_name"]))
+    results, unique = run_tests_deduplicated(candidates, concurrency, fail_fast=True)
+
+    flips = {field: {} for field in SCORED_FIELDS}
+    for i, (unit, task, row, _) in enumerate(todo):
+        scored = {}
+        for j, stage in enumerate(("initial", "final")):
+            passed, _ = analyze_results(results[2 * i + j])
+            scored[f"{stage}_passed"] = str(passed)
+            if f"{stage}_static_issues" in row:
+                scored[f"{stage}_static_issues"] = str(len(run_static_analysis(candidates[2 * i + j][0])))
+        for field, value in scored.items():
+            if row[field] != value:
+                change = f"{row[field]} -> {value}"
+                flips[field][change] = flips[field].get(change, 0) + 1
+                row[field] = value
+
+    return {
+        "units": [(unit, current) for unit, _, _, current in todo],
+        "tasks": sorted({unit["task_id"] for unit, _, _, _ in todo}, key=lambda t: (len(t), t)),
+        "missing": missing,
+        "candidates": len(candidates),
+        "unique": unique,
+        "flips": {field: changes for field, changes in flips.items() if changes},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-run the sandbox and analysis stages of a sweep over its stored candidates."
+    )
+    parser.add_argument("runner", choices=sorted(RUNNERS), help="Which sweep to re-score.")
+    parser.add_argument("--csv", help="Sweep CSV to update (default: the runner's results file).")
+    parser.add_argument("--output", metavar="PATH", help="Write the re-scored sweep here instead of in place.")
+    parser.add_argument("--store", default=ARTIFACTS_PATH, help=f"Artifact store (default: {ARTIFACTS_PATH}).")
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Re-score every stored unit, not only those whose task tests changed (e.g. after a scoring fix).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=MAX_CONCURRENCY,
+        help="Sandbox batches to run at once.",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change; write nothing.")
+    add_task_arguments(parser)
+    args = parser.parse_args()
+
+    csv_path = args.csv or RUNNERS[args.runner]["csv"]
+    if not os.path.exists(csv_path):
+        parser.error(f"{csv_path} does not exist")
+    if not os.path.exists(args.store):
+        parser.error(f"{args.store} does not exist; sweeps record it unless ARTIFACTS_ENABLED=0")
+
+    store = ArtifactStore(args.store)
+    tasks = tasks_from_args(args)
+    fieldnames, rows = _read_rows(csv_path)
+
+    start = time.perf_counter()
+    report = rescore(store, args.runner, tasks, rows, rescore_all=args.all, concurrency=args.concurrency)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"Re-scored {len(report['units'])} units over {len(report['tasks'])} tasks "
+        f"({report['unique']} unique of {report['candidates']} candidates tested) in {elapsed:.1f}s"
+    )
+    if report["tasks"]:
+        print(f"  Tasks: {', '.join(report['tasks'])}")
+    if report["missing"]:
+        print(f"  {report['missing']} stored units have no row in {csv_path}; skipped")
+    for field, changes in report["flips"].items():
+        print(f"  {field}: " + ", ".join(f"{change} x{n}" for change, n in sorted(changes.items())))
+    if not report["flips"]:
+        print("  No scores changed")
+
+    if args.dry_run or not report["units"]:
+        store.close()
+        return
+
+    output = args.output or csv_path
+    _write_rows(output, fieldnames, rows)
+    print(f"\n📊 Re-scored sweep saved to {output}")
+
+    # The stored units now match the sweep file they were written to
+    if output == csv_path:
+        for unit, current in report["units"]:
+            store.set_tests_hash(args.runner, unit, current)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
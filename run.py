@@ -4,24 +4,22 @@ from src.code_generator import generate_code
 from src.test_runner import run_tests
 from src.repair_loop import repair_code
 from src.analyzer import analyze_results
+from src.result_cache import print_cache_stats
+from src.verdict import PASS, UNEXPECTED_ERROR, CANDIDATE_ERROR, describe, describe_expected, verdict_of
 
 def print_results(label, results):
     print(label)
     for r in results:
-        expected = r.get("expected")
+        verdict = verdict_of(r)
 
-        if "error" in r:
-            # ✅ Expected division-by-zero error = PASS
-            if expected == "error_div_zero" and "division by zero" in r["error"]:
-                print(f"✓ PASS | input={r['input']} | expected=division by zero error | got error='{r['error']}'")
-            else:
-                print(f"❌ Error for input {r['input']}: {r['error']}")
+        # Passes include expected exceptions (e.g. "error_div_zero"); the
+        # sandbox only sends the verdict for them, not the output
+        if verdict == PASS:
+            print(f"✓ PASS | input={r['input']} | expected={describe_expected(r)}")
+        elif verdict in (UNEXPECTED_ERROR, CANDIDATE_ERROR):
+            print(f"❌ Error for input {r.get('input')}: {r['error']}")
         else:
-            if expected == "error_div_zero":
-                print(f"✗ FAIL | input={r['input']} | expected division-by-zero error but got value {r['output']}")
-            else:
-                status = "✓ PASS" if r["output"] == expected else "✗ FAIL"
-                print(f"{status} | input={r['input']} | output={r['output']} | expected={expected}")
+            print(f"✗ FAIL | {describe(r)}")
 
 
 def main():
@@ -83,6 +81,7 @@ def main():
     # After all tasks, save log
     save_experiment_log(experiment_log)
     print("\n📊 Experiment log saved to results/experiment_log.json")
+    print_cache_stats()
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,17 @@
-import csv
-
-from src.task_loader import load_tasks
+import argparse
+
+from src.batch_generation import charge_draft, evaluate_drafts, pregenerate
+from src.artifact_store import record_unit
+from src.adaptive_sampling import add_sampling_arguments, print_sampling_summary, sampler_from_args
+from src.result_cache import print_cache_stats
+from src.result_writer import ResultWriter
+from src.task_loader import add_task_arguments, shard_results_path, tasks_from_args
 from src.code_generator import generate_code
-from src.test_runner import run_tests
+from src.test_runner import run_tests_adaptive
 from src.repair_loop import repair_code
 from src.analyzer import analyze_results
+from src import tracing
+from src.analytics import csv_to_parquet
 
 # How many independent runs per task
 N_RUNS = 5
@@ -12,20 +19,33 @@ N_RUNS = 5
 RESULTS_CSV = "results/experiment_runs.csv"
 
 
-def run_single_task(task, run_id: int):
+def run_single_task(task, run_id: int, draft: dict = None, stages: dict = None):
     """
     Run one full pipeline (generate -> test -> optional repair)
     for a single task and a single run_id.
+    draft: pre-generated and pre-tested first draft from --batch-generate.
+    stages: filled with the run's candidates (see src/artifact_store.py).
     Returns a dict with metrics for this run.
     """
+    if stages is None:
+        stages = {}
     description = task["description"]
     func_name = task["func_name"]
 
     # 1) Initial generation
-    code = generate_code(description)
-
-    # 2) Initial tests
-    initial_results = run_tests(code, task["tests"], func_name)
+    if draft is not None:
+        code = draft["code"]
+        charge_draft(draft)
+    else:
+        code = generate_code(description, seed=run_id)
+    stages["generated"] = stages["initial"] = stages["final"] = code
+
+    # 2) Initial tests: only the verdict is needed, so run the tests this task
+    #    failed before first and stop at the first failure
+    if draft is not None:
+        initial_results = draft["initial_results"]
+    else:
+        initial_results = run_tests_adaptive(code, task["tests"], func_name, verdict_only=True)
     initial_all_passed, _ = analyze_results(initial_results)
 
     # If everything passes, no repair needed
@@ -39,16 +59,24 @@ def run_single_task(task, run_id: int):
             "used_repair": False,
             "iterations": 0,
             "final_passed": True,   # same as initial
+            "stop_reason": "initial_pass",
+            "escalations": "",
         }
 
     # 3) Run repair loop
+    repair_stats = {}
     fixed_code, fixed_results, iters = repair_code(
         description,
         func_name,
         code,
         task["tests"],
         max_iters=3,
+        seed=run_id,
+        stats=repair_stats,
     )
+    for i, candidate in enumerate(repair_stats["candidates"], start=1):
+        stages[f"repair{i}"] = candidate
+    stages["final"] = fixed_code
 
     final_all_passed, _ = analyze_results(fixed_results)
 
@@ -61,11 +89,98 @@ def run_single_task(task, run_id: int):
         "used_repair": True,
         "iterations": iters,
         "final_passed": final_all_passed,
+        "stop_reason": repair_stats.get("stop_reason", ""),
+        "escalations": "+".join(repair_stats.get("escalations", [])),
     }
 
 
+def _run_and_write(task, run_id, writer, draft=None):
+    print(f"  -> Task {task['id']}: {task['title']}")
+    stages = {}
+    with tracing.trace(task_id=task["id"], run_id=run_id) as tracer:
+        stats = run_single_task(task, run_id, draft, stages)
+    stats.update(tracer.columns())
+    record_unit("experiments", stats, task["tests"], stages)
+    writer.write(stats)
+    return stats
+
+
+def _batch_drafts(tasks, writer):
+    # Every missing run's first draft of a task in one request, then all
+    # drafts tested in batched sandbox runs (see src/batch_generation.py)
+    groups = []
+    items = []
+    for task in tasks:
+        seeds = [r for r in range(1, N_RUNS + 1) if not writer.is_done(run_id=r, task_id=task["id"])]
+        if seeds:
+            groups.append((str(task["id"]), task["description"], seeds))
+            items += [(str(task["id"]), r, task["tests"], task["func_name"]) for r in seeds]
+    drafts = pregenerate(groups)
+    counts = evaluate_drafts(drafts, items)
+    print(
+        f"Batch generation: {len(drafts)} drafts for {len(groups)} tasks; "
+        f"{counts['unique']} unique of {counts['candidates']} tested in batched sandbox runs"
+    )
+    return drafts
+
+
+def _run_adaptive(args, tasks, writer):
+    # One cell per task; rows already on disk (--resume) count towards it
+    by_id = {str(task["id"]): task for task in tasks}
+    sampler = sampler_from_args(args, by_id, N_RUNS)
+    for row in writer.rows():
+        if row["task_id"] in by_id:
+            sampler.record(row["task_id"], row["final_passed"] == "True", int(row["run_id"]))
+
+    round_no = 0
+    while True:
+        batch = sampler.next_batch()
+        if not batch:
+            break
+        round_no += 1
+        print(f"\n=== ROUND {round_no}: {len(batch)} runs ===")
+        for task_id, run_id in batch:
+            stats = _run_and_write(by_id[task_id], run_id, writer)
+            sampler.record(task_id, stats["final_passed"], run_id)
+
+    print_sampling_summary(sampler, N_RUNS)
+
+
 def main():
-    tasks = load_tasks()
+    parser = argparse.ArgumentParser(description="Run the multi-run experiment.")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=f"Keep the rows already in {RESULTS_CSV} and skip those runs.",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Also write every pipeline span as a Chrome trace JSON file.",
+    )
+    parser.add_argument(
+        "--parquet",
+        metavar="PATH",
+        help="Also save the finished sweep as a compact Parquet file (needs pyarrow).",
+    )
+    add_task_arguments(parser)
+    add_sampling_arguments(parser, N_RUNS)
+    parser.add_argument(
+        "--batch-generate",
+        action="store_true",
+        help="Sample all runs' first drafts of a task in one request (n > 1 where the backend supports it) "
+        "and test the unique drafts in batched sandbox runs.",
+    )
+    args = parser.parse_args()
+    if args.batch_generate and args.adaptive:
+        parser.error("--batch-generate cannot be combined with --adaptive")
+    results_csv = shard_results_path(RESULTS_CSV, args.shard)
+
+    if args.trace:
+        tracing.enable_export()
+
+    tasks = tasks_from_args(args)
+    print(f"Selected {len(tasks)} tasks")
     fieldnames = [
         "run_id",
         "task_id",
@@ -75,24 +190,36 @@ def main():
         "used_repair",
         "iterations",
         "final_passed",
-    ]
-
-    rows = []
-
-    for run_id in range(1, N_RUNS + 1):
-        print(f"\n=== RUN {run_id} ===")
-        for task in tasks:
-            print(f"  -> Task {task['id']}: {task['title']}")
-            stats = run_single_task(task, run_id)
-            rows.append(stats)
-
-    # Write all results to CSV
-    with open(RESULTS_CSV, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
-
-    print(f"\n📊 Multi-run experiment saved to {RESULTS_CSV}")
+        "stop_reason",
+        "escalations",
+    ] + tracing.COLUMN_NAMES
+
+    # Each row is appended and fsync'd as soon as it is computed
+    with ResultWriter(results_csv, fieldnames, key_fields=["run_id", "task_id"], resume=args.resume) as writer:
+        if args.resume:
+            print(f"Resuming: {writer.completed} rows already recorded")
+
+        if args.adaptive:
+            _run_adaptive(args, tasks, writer)
+        else:
+            drafts = _batch_drafts(tasks, writer) if args.batch_generate else {}
+            for run_id in range(1, N_RUNS + 1):
+                print(f"\n=== RUN {run_id} ===")
+                for task in tasks:
+                    if writer.is_done(run_id=run_id, task_id=task["id"]):
+                        continue
+                    _run_and_write(task, run_id, writer, drafts.get((str(task["id"]), run_id)))
+
+    print(f"\n📊 Multi-run experiment saved to {results_csv}")
+    print_cache_stats()
+
+    if args.parquet:
+        csv_to_parquet(results_csv, args.parquet)
+        print(f"🗜️  Parquet copy saved to {args.parquet}")
+
+    if args.trace:
+        tracing.write_chrome_trace(args.trace)
+        print(f"🧭 Chrome trace saved to {args.trace}")
 
 
 if __name__ == "__main__":
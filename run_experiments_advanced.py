@@ -1,14 +1,27 @@
 # run_experiments_advanced.py
 
-import csv
+import argparse
+import os
+import subprocess
+import sys
 
-from src.task_loader import load_tasks
+from src.config import MAX_CONCURRENCY
+from src.batch_generation import charge_draft, evaluate_drafts, pregenerate
+from src.artifact_store import record_unit
+from src.adaptive_sampling import add_sampling_arguments, print_sampling_summary, sampler_from_args
+from src.result_cache import print_cache_stats
+from src.result_writer import ResultWriter
+from src.scheduler import run_units
+from src.task_loader import TaskStore, add_task_arguments, shard_results_path, tasks_from_args
 from src.code_generator import generate_code
-from src.test_runner import run_tests
+from src.test_runner import run_tests_adaptive
 from src.repair_loop import repair_code
 from src.analyzer import analyze_results
 from src.agent_reviewer import review_code
 from src.static_analyzer import run_static_analysis
+from src import tracing
+from src.analytics import csv_to_parquet
+from src.work_queue import open_queue, run_worker
 
 # How many independent runs per (task, strategy)
 N_RUNS = 5
@@ -41,28 +54,63 @@ STRATEGIES = [
 ]
 
 
-def run_single_task_with_strategy(task, run_id: int, strategy: dict):
+def run_single_task_with_strategy(task, run_id: int, strategy: dict, draft: dict = None):
     """
     Run one full pipeline (generate -> optional review -> test -> optional repair)
     for a single task, a single run_id, and a specific strategy.
 
-    Returns a dict with metrics for this (task, run, strategy).
+    draft: pre-generated first draft from --batch-generate (see
+    src/batch_generation.py), used instead of a generation request.
+
+    Returns a dict with metrics for this (task, run, strategy), including
+    per-stage latency and token columns (see src/tracing.py). Every
+    candidate the unit produced is kept in the artifact store for rescore.py.
     """
+    stages = {}
+    with tracing.trace(task_id=task["id"], run_id=run_id, strategy=strategy["name"]) as tracer:
+        stats = _run_pipeline(task, run_id, strategy, draft, stages)
+    stats.update(tracer.columns())
+    record_unit("advanced", stats, task["tests"], stages)
+    return stats
+
+
+def _seed(strategy: dict, run_id: int) -> str:
+    # Cache key for LLM responses: each (strategy, run) draws its own samples
+    return f"{strategy['name']}/{run_id}"
+
+
+def _run_pipeline(task, run_id: int, strategy: dict, draft: dict = None, stages: dict = None):
+    # stages is filled with the unit's candidates (see src/artifact_store.py)
+    if stages is None:
+        stages = {}
     description = task["description"]
     func_name = task["func_name"]
 
+    seed = _seed(strategy, run_id)
+
     # 1) Initial generation by "Coder" agent
-    code = generate_code(description)
+    if draft is not None:
+        code = draft["code"]
+        charge_draft(draft)
+    else:
+        code = generate_code(description, seed=seed)
+    stages["generated"] = code
 
     # Optional: second "Reviewer" agent pass before tests
     if strategy.get("use_reviewer"):
-        code = review_code(description, func_name, code)
+        code = review_code(description, func_name, code, seed=seed)
+        stages["reviewed"] = code
+    stages["initial"] = stages["final"] = code
 
     # Static analysis on initial code
     initial_static_issues = len(run_static_analysis(code))
 
-    # 2) Initial tests
-    initial_results = run_tests(code, task["tests"], func_name)
+    # 2) Initial tests: only the verdict is needed, so run the tests this task
+    #    failed before first and stop at the first failure
+    if draft is not None and draft.get("initial_results") is not None and not strategy.get("use_reviewer"):
+        initial_results = draft["initial_results"]
+    else:
+        initial_results = run_tests_adaptive(code, task["tests"], func_name, verdict_only=True)
     initial_all_passed, _ = analyze_results(initial_results)
 
     # Case A: strategy does not use repair OR everything already passed
@@ -81,9 +129,13 @@ def run_single_task_with_strategy(task, run_id: int, strategy: dict):
             "final_passed": initial_all_passed,
             "initial_static_issues": initial_static_issues,
             "final_static_issues": final_static_issues,
+            "winning_branch": "",
+            "stop_reason": "initial_pass" if initial_all_passed else "no_repair",
+            "escalations": "",
         }
 
     # Case B: use repair and initial did NOT pass
+    repair_stats = {}
     try:
         fixed_code, fixed_results, iters = repair_code(
             description,        # problem_description
@@ -91,7 +143,13 @@ def run_single_task_with_strategy(task, run_id: int, strategy: dict):
             code,               # initial_code
             task["tests"],
             max_iters=strategy["max_iters"],
+            seed=seed,
+            speculative_k=strategy.get("speculative_k", 1),
+            stats=repair_stats,
         )
+        for i, candidate in enumerate(repair_stats["candidates"], start=1):
+            stages[f"repair{i}"] = candidate
+        stages["final"] = fixed_code
 
         final_all_passed, _ = analyze_results(fixed_results)
 
@@ -110,6 +168,9 @@ def run_single_task_with_strategy(task, run_id: int, strategy: dict):
             "final_passed": final_all_passed,
             "initial_static_issues": initial_static_issues,
             "final_static_issues": final_static_issues,
+            "winning_branch": _winning_branch(repair_stats),
+            "stop_reason": repair_stats.get("stop_reason", ""),
+            "escalations": "+".join(repair_stats.get("escalations", [])),
         }
 
     except Exception as e:
@@ -132,11 +193,255 @@ def run_single_task_with_strategy(task, run_id: int, strategy: dict):
             "final_passed": False,
             "initial_static_issues": initial_static_issues,
             "final_static_issues": initial_static_issues,
+            "winning_branch": "",
+            "stop_reason": "error",
+            "escalations": "",
+        }
+
+
+def _winning_branch(repair_stats: dict):
+    # Branch that produced the final code in speculative mode ("" otherwise)
+    rounds = repair_stats.get("speculative")
+    return rounds[-1]["winner_branch"] if rounds else ""
+
+
+def _unit_key(strategy_name, run_id, task_id):
+    return f"{strategy_name}/{run_id}/{task_id}"
+
+
+def _queue_handler(tasks_paths):
+    # Work units carry only ids; each worker reads the tasks from its own store
+    store = TaskStore(tasks_paths)
+
+    def handle(payload):
+        task = store.get(payload["task_id"])
+        return run_single_task_with_strategy(task, payload["run_id"], payload["strategy"])
+
+    return handle
+
+
+def _print_queue_unit(key, stats):
+    status = "PASS" if stats["final_passed"] else "FAIL"
+    print(f"  {key} -> Task {stats['task_id']}: {stats['title']} ({status})", flush=True)
+
+
+def _worker_command(args):
+    return [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--queue", args.queue,
+        "--worker",
+        "--concurrency", str(args.concurrency),
+        "--tasks", *args.tasks,
+    ]
+
+
+def _with_drafts(todo, concurrency):
+    """Attach a batch-generated draft to every unit (see --batch-generate)."""
+    groups = {}
+    for task, run_id, strategy in todo:
+        group = (strategy["name"], str(task["id"]))
+        if group not in groups:
+            groups[group] = (group, task["description"], [])
+        groups[group][2].append(_seed(strategy, run_id))
+    drafts = pregenerate(list(groups.values()), concurrency=concurrency)
+
+    # Reviewed drafts change before they are tested, so only test the others
+    to_test = [
+        ((strategy["name"], str(task["id"])), _seed(strategy, run_id), task["tests"], task["func_name"])
+        for task, run_id, strategy in todo
+        if not strategy.get("use_reviewer")
+    ]
+    counts = evaluate_drafts(drafts, to_test, concurrency=concurrency)
+    print(
+        f"Batch generation: {len(drafts)} drafts for {len(groups)} (strategy, task) groups; "
+        f"{counts['unique']} unique of {counts['candidates']} tested in batched sandbox runs"
+    )
+    return [
+        (task, run_id, strategy, drafts[((strategy["name"], str(task["id"])), _seed(strategy, run_id))])
+        for task, run_id, strategy in todo
+    ]
+
+
+def _run_adaptive(args, tasks, strategies, results_csv, fieldnames):
+    """
+    Run the grid in rounds chosen by an AdaptiveSampler, one cell per
+    (strategy, task), each round on the thread pool.
+    """
+    writer = ResultWriter(
+        results_csv,
+        fieldnames,
+        key_fields=["strategy", "run_id", "task_id"],
+        resume=args.resume,
+    )
+    cells = {(s["name"], str(t["id"])): (t, s) for s in strategies for t in tasks}
+    sampler = sampler_from_args(args, cells, N_RUNS)
+    for row in writer.rows():
+        cell = (row["strategy"], row["task_id"])
+        if cell in cells:
+            sampler.record(cell, row["final_passed"] == "True", int(row["run_id"]))
+    if args.resume:
+        print(f"Resuming: {writer.completed} rows already recorded")
+
+    def record(i, unit, stats):
+        task, run_id, strategy = unit
+        writer.write(stats)
+        sampler.record((strategy["name"], str(task["id"])), stats["final_passed"], run_id)
+        status = "PASS" if stats["final_passed"] else "FAIL"
+        print(
+            f"  [{i + 1}/{len(todo)}] {strategy['name']} run {run_id} "
+            f"-> Task {task['id']}: {task['title']} ({status})"
+        )
+
+    round_no = 0
+    try:
+        while True:
+            batch = sampler.next_batch()
+            if not batch:
+                break
+            round_no += 1
+            todo = [(cells[cell][0], run_id, cells[cell][1]) for cell, run_id in batch]
+            print(f"Round {round_no}: {len(todo)} units with concurrency={args.concurrency}")
+            run_units(run_single_task_with_strategy, todo, max_workers=args.concurrency, on_done=record)
+    finally:
+        writer.close()
+
+    print_sampling_summary(sampler, N_RUNS)
+    return writer
+
+
+def _run_queued(args, units, results_csv, fieldnames):
+    """
+    Put the grid on the work queue, work it off with local worker processes
+    (or this one) plus any remote workers, and merge the results.
+    """
+    queue = open_queue(args.queue)
+    added = queue.put_units(
+        {
+            _unit_key(strategy["name"], run_id, task["id"]): {
+                "task_id": task["id"],
+                "run_id": run_id,
+                "strategy": strategy,
+            }
+            for task, run_id, strategy in units
         }
+    )
+    print(f"Queued {added} new units ({len(units) - added} already in {args.queue})")
+
+    if args.workers > 0:
+        print(f"Starting {args.workers} worker processes with concurrency={args.concurrency}")
+        procs = [subprocess.Popen(_worker_command(args)) for _ in range(args.workers)]
+        for proc in procs:
+            proc.wait()
+    # Also picks up units left behind by a worker that died (once their lease runs out)
+    run_worker(queue, _queue_handler(args.tasks), concurrency=args.concurrency, on_done=_print_queue_unit)
+
+    # Results are keyed by unit, so units finished twice are merged once
+    grid = {_unit_key(strategy["name"], run_id, task["id"]) for task, run_id, strategy in units}
+    writer = ResultWriter(results_csv, fieldnames, key_fields=["strategy", "run_id", "task_id"])
+    for row in queue.results():
+        if _unit_key(row["strategy"], row["run_id"], row["task_id"]) in grid:
+            writer.write(row)
+
+    for key, error in queue.failures():
+        print(f"  !! {key} failed after {queue.max_attempts} attempts: {error}")
+    print(f"Queue: {queue.counts()}")
+    queue.close()
+    return writer
 
 
 def main():
-    tasks = load_tasks()
+    parser = argparse.ArgumentParser(description="Run the multi-strategy experiment sweep.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=MAX_CONCURRENCY,
+        help="How many (strategy, run, task) units to run at once (1 = serial).",
+    )
+    parser.add_argument(
+        "--speculative",
+        type=int,
+        default=0,
+        metavar="K",
+        help="Also run a repair_3 variant that fires K repair completions per iteration.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=f"Keep the rows already in {RESULTS_CSV} and skip those units.",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Also write every pipeline span as a Chrome trace JSON file.",
+    )
+    parser.add_argument(
+        "--parquet",
+        metavar="PATH",
+        help="Also save the finished sweep as a compact Parquet file (needs pyarrow).",
+    )
+    parser.add_argument(
+        "--batch-generate",
+        action="store_true",
+        help="Sample every run's first draft of a (task, strategy) in one request (n > 1 where the backend "
+        "supports it) and test the unique drafts in batched sandbox runs.",
+    )
+    parser.add_argument(
+        "--queue",
+        metavar="URL",
+        help="Run the sweep through a work queue (a SQLite file path by default); "
+        "rerunning with the same queue resumes it.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="With --queue: local worker processes to start (0 = work in this process).",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Only pull units from --queue until it is drained (e.g. on another machine); write no CSV.",
+    )
+    add_task_arguments(parser)
+    add_sampling_arguments(parser, N_RUNS)
+    args = parser.parse_args()
+    results_csv = shard_results_path(RESULTS_CSV, args.shard)
+
+    if args.worker:
+        if not args.queue:
+            parser.error("--worker needs --queue")
+        done = run_worker(
+            open_queue(args.queue),
+            _queue_handler(args.tasks),
+            concurrency=args.concurrency,
+            on_done=_print_queue_unit,
+        )
+        print(f"Worker finished {done} units")
+        print_cache_stats()
+        return
+
+    if args.adaptive and args.queue:
+        parser.error("--adaptive cannot be combined with --queue")
+    if args.batch_generate and (args.adaptive or args.queue):
+        parser.error("--batch-generate cannot be combined with --adaptive or --queue")
+
+    if args.trace:
+        tracing.enable_export()
+
+    strategies = list(STRATEGIES)
+    if args.speculative > 1:
+        strategies.append(
+            {
+                "name": f"speculative{args.speculative}_repair_3",
+                "use_repair": True,
+                "max_iters": 3,
+                "speculative_k": args.speculative,
+            }
+        )
+
+    tasks = tasks_from_args(args)
+    print(f"Selected {len(tasks)} tasks")
 
     fieldnames = [
         "strategy",
@@ -150,26 +455,84 @@ def main():
         "final_passed",
         "initial_static_issues",
         "final_static_issues",
+        "winning_branch",
+        "stop_reason",
+        "escalations",
+    ] + tracing.COLUMN_NAMES
+
+    # Same order as the old nested loops: strategy -> run -> task
+    units = [
+        (task, run_id, strategy)
+        for strategy in strategies
+        for run_id in range(1, N_RUNS + 1)
+        for task in tasks
     ]
 
-    rows = []
+    if args.queue:
+        writer = _run_queued(args, units, results_csv, fieldnames)
+    elif args.adaptive:
+        writer = _run_adaptive(args, tasks, strategies, results_csv, fieldnames)
+    else:
+        # Rows are streamed to disk as units finish, so an interrupted sweep
+        # can be picked up again with --resume
+        writer = ResultWriter(
+            results_csv,
+            fieldnames,
+            key_fields=["strategy", "run_id", "task_id"],
+            resume=args.resume,
+        )
+        todo = [
+            (task, run_id, strategy)
+            for task, run_id, strategy in units
+            if not writer.is_done(strategy=strategy["name"], run_id=run_id, task_id=task["id"])
+        ]
+        if args.resume:
+            print(f"Resuming: {writer.completed} rows already recorded, {len(todo)} units left")
+
+        if args.batch_generate:
+            todo = _with_drafts(todo, args.concurrency)
+
+        def record(i, unit, stats):
+            task, run_id, strategy = unit[:3]
+            writer.write(stats)
+            status = "PASS" if stats["final_passed"] else "FAIL"
+            print(
+                f"  [{i + 1}/{len(todo)}] {strategy['name']} run {run_id} "
+                f"-> Task {task['id']}: {task['title']} ({status})"
+            )
+
+        print(f"Running {len(todo)} units with concurrency={args.concurrency}")
+        try:
+            run_units(
+                run_single_task_with_strategy,
+                todo,
+                max_workers=args.concurrency,
+                on_done=record,
+            )
+        finally:
+            writer.close()
+
+    # Rewrite in grid order so the CSV does not depend on completion order
+    strategy_order = {s["name"]: i for i, s in enumerate(strategies)}
+    task_order = {str(t["id"]): i for i, t in enumerate(tasks)}
+    writer.finalize(
+        sort_key=lambda row: (
+            strategy_order.get(row["strategy"], len(strategy_order)),
+            int(row["run_id"]),
+            task_order.get(row["task_id"], len(task_order)),
+        )
+    )
 
-    for strategy in STRATEGIES:
-        print(f"\n=== STRATEGY: {strategy['name']} ===")
-        for run_id in range(1, N_RUNS + 1):
-            print(f"  RUN {run_id}")
-            for task in tasks:
-                print(f"    -> Task {task['id']}: {task['title']}")
-                stats = run_single_task_with_strategy(task, run_id, strategy)
-                rows.append(stats)
+    print(f"\n📊 Advanced multi-strategy experiment saved to {results_csv}")
+    print_cache_stats()
 
-    # Write all results to CSV
-    with open(RESULTS_CSV, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+    if args.parquet:
+        csv_to_parquet(results_csv, args.parquet)
+        print(f"🗜️  Parquet copy saved to {args.parquet}")
 
-    print(f"\n📊 Advanced multi-strategy experiment saved to {RESULTS_CSV}")
+    if args.trace:
+        tracing.write_chrome_trace(args.trace)
+        print(f"🧭 Chrome trace saved to {args.trace}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+# src/adaptive_sampling.py
+#
+# Sequential run allocation for multi-run experiments.
+#
+#   sampler = AdaptiveSampler(cells, min_runs=3, max_runs=10, ci_width=0.5, budget=5 * len(cells))
+#   while True:
+#       batch = sampler.next_batch()          # [(cell, run_id), ...]
+#       if not batch:
+#           break
+#       for cell, run_id in batch:
+#           sampler.record(cell, run(cell, run_id)["final_passed"])
+#
+# A cell is one (task, strategy) of the grid. Every cell gets min_runs runs;
+# after that it only gets more while the Wilson interval of its pass rate is
+# wider than ci_width, up to max_runs. Cells that are clearly always
+# (or never) passing stop early, and the runs they save go to the
+# uncertain ones: when the budget cannot cover every unsettled cell in a
+# round, the widest intervals are served first.
+
+import math
+
+from src.config import ADAPTIVE_CI_WIDTH, ADAPTIVE_MAX_RUNS, ADAPTIVE_MIN_RUNS
+
+# Two-sided 95% normal quantile
+Z_95 = 1.959963984540054
+
+
+def wilson_interval(successes: int, n: int, z: float = Z_95):
+    """Wilson score interval (low, high) for a binomial rate; (0, 1) if n == 0."""
+    if n <= 0:
+        return 0.0, 1.0
+    p = successes / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+class AdaptiveSampler:
+    """
+    Decides which cells get another run. Cells are any hashable keys;
+    run ids count from 1 per cell. Not thread-safe: record results from
+    the thread that calls next_batch (e.g. in a run_units on_done).
+    """
+
+    def __init__(self, cells, min_runs=ADAPTIVE_MIN_RUNS, max_runs=ADAPTIVE_MAX_RUNS, ci_width=ADAPTIVE_CI_WIDTH, budget=None):
+        self.cells = list(cells)
+        self.min_runs = max(1, min_runs)
+        self.max_runs = max(self.min_runs, max_runs)
+        self.ci_width = ci_width
+        self.budget = budget
+        self.runs = {cell: 0 for cell in self.cells}
+        self.passes = {cell: 0 for cell in self.cells}
+        self.last_run_id = {cell: 0 for cell in self.cells}
+
+    def record(self, cell, passed: bool, run_id: int = None):
+        self.runs[cell] += 1
+        self.passes[cell] += bool(passed)
+        self.last_run_id[cell] = max(self.last_run_id[cell], run_id or self.runs[cell])
+
+    def interval(self, cell):
+        return wilson_interval(self.passes[cell], self.runs[cell])
+
+    def width(self, cell) -> float:
+        low, high = self.interval(cell)
+        return high - low
+
+    def settled(self, cell) -> bool:
+        n = self.runs[cell]
+        if n >= self.max_runs:
+            return True
+        return n >= self.min_runs and self.width(cell) <= self.ci_width
+
+    @property
+    def used(self) -> int:
+        return sum(self.runs.values())
+
+    def remaining_budget(self):
+        if self.budget is None:
+            return None
+        return max(0, self.budget - self.used)
+
+    def next_batch(self) -> list:
+        """
+        The next round: one more run for every unsettled cell, widest
+        interval first, cut to the remaining budget. Cells still below
+        min_runs come first and may get several runs at once. Empty when
+        every cell is settled or the budget is spent.
+        """
+        wanted = []
+        for cell in self.cells:
+            if self.settled(cell):
+                continue
+            extra = max(1, self.min_runs - self.runs[cell])
+            wanted.append((self.runs[cell] >= self.min_runs, -self.width(cell), cell, extra))
+        wanted.sort(key=lambda w: (w[0], w[1]))
+
+        remaining = self.remaining_budget()
+        batch = []
+        for _, _, cell, extra in wanted:
+            for k in range(extra):
+                if remaining is not None and len(batch) >= remaining:
+                    break
+                batch.append((cell, self.last_run_id[cell] + k + 1))
+        return batch
+
+    def summary(self) -> dict:
+        settled_early = sum(1 for c in self.cells if self.runs[c] < self.max_runs and self.settled(c))
+        unsettled = sum(1 for c in self.cells if not self.settled(c))
+        return {
+            "cells": len(self.cells),
+            "runs": self.used,
+            "settled_early": settled_early,
+            "at_max_runs": sum(1 for c in self.cells if self.runs[c] >= self.max_runs),
+            "unsettled": unsettled,
+            "max_ci_width": max((self.width(c) for c in self.cells), default=0.0),
+        }
+
+
+def add_sampling_arguments(parser, fixed_runs: int):
+    """The --adaptive options of the experiment runners."""
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Allocate runs per cell until its pass-rate CI is narrow enough, instead of a fixed N_RUNS.",
+    )
+    parser.add_argument("--min-runs", type=int, default=ADAPTIVE_MIN_RUNS, help="With --adaptive: runs every cell gets.")
+    parser.add_argument("--max-runs", type=int, default=ADAPTIVE_MAX_RUNS, help="With --adaptive: most runs per cell.")
+    parser.add_argument(
+        "--ci-width",
+        type=float,
+        default=ADAPTIVE_CI_WIDTH,
+        help="With --adaptive: stop a cell once its 95%% Wilson interval is at most this wide.",
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=None,
+        help=f"With --adaptive: total runs across all cells (default: {fixed_runs} x cells, the fixed design's cost).",
+    )
+
+
+def sampler_from_args(args, cells, fixed_runs: int) -> AdaptiveSampler:
+    cells = list(cells)
+    budget = args.budget if args.budget is not None else fixed_runs * len(cells)
+    return AdaptiveSampler(cells, args.min_runs, args.max_runs, args.ci_width, budget)
+
+
+def print_sampling_summary(sampler: AdaptiveSampler, fixed_runs: int):
+    s = sampler.summary()
+    fixed = fixed_runs * s["cells"]
+    saved = 1 - s["runs"] / fixed if fixed else 0.0
+    print(
+        f"Adaptive sampling: {s['runs']} runs over {s['cells']} cells "
+        f"(fixed design: {fixed}, {saved:.0%} saved); "
+        f"{s['settled_early']} settled early, {s['at_max_runs']} at max runs, "
+        f"{s['unsettled']} unsettled; widest CI {s['max_ci_width']:.2f}"
+    )
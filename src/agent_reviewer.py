@@ -1,17 +1,19 @@
 # src/agent_reviewer.py
 
-from groq import Groq
-from src.config import GROQ_API_KEY, MODEL_NAME
+from src.config import MODEL_NAME
+from src.llm_client import complete
+from src.tracing import span
 from src.utils import strip_code_fences
 
-client = Groq(api_key=GROQ_API_KEY)
 
-
-def review_code(problem_description: str, func_name: str, code: str) -> str:
+def review_code(problem_description: str, func_name: str, code: str, seed=None, usage: dict = None) -> str:
     """
     LLM 'Reviewer' agent:
     - Takes the problem description + current code
     - Returns an improved version of the full code (same func_name).
+
+    seed: run identifier used to key the LLM response cache.
+    usage: optional dict the request's token counts are added to.
     """
 
     prompt = f"""
@@ -30,11 +32,14 @@ Your job:
 - Return ONLY the corrected Python code (no comments, no explanations, no markdown).
     """.strip()
 
-    resp = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-    )
+    with span("llm.review"):
+        content = complete(
+            model=MODEL_NAME,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.2,
+            seed=seed,
+            usage=usage,
+        )
 
-    improved = strip_code_fences(resp.choices[0].message.content)
+    improved = strip_code_fences(content)
     return improved
@@ -0,0 +1,372 @@
+# src/analytics.py
+#
+# Columnar (NumPy) analysis of experiment sweeps.
+#
+#   cols = load_runs(["results/advanced_experiment_runs.csv", "old_sweep.parquet"])
+#   keys, rates = group_rates(cols, ["strategy"])
+#   lo, hi = bootstrap_rate_ci(rates["final_passed"], rates["runs"])
+#
+# A sweep is held as a dict of equal-length NumPy arrays (one per CSV column)
+# instead of a list of row dicts, so aggregating millions of rows from many
+# files is a handful of vectorized bincount/unique calls. Parquet input and
+# output need the optional pyarrow package; CSV works with NumPy alone.
+
+import csv
+import math
+import os
+
+import numpy as np
+
+from src.config import PRICE_PER_M_COMPLETION_TOKENS, PRICE_PER_M_PROMPT_TOKENS
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional
+    pyarrow = None
+    pq = None
+
+BOOL_COLUMNS = ("initial_passed", "used_repair", "final_passed")
+
+
+# --- loading / saving ------------------------------------------------------
+
+
+def _convert(values):
+    """
+    Turn a column of CSV strings into the narrowest fitting NumPy array.
+    A column with no values at all (e.g. escalations in a sweep that never
+    escalated) stays text.
+    """
+    kinds = set(values)
+    if kinds and kinds <= {"True", "False", ""} and kinds != {""}:
+        return np.fromiter((v == "True" for v in values), bool, len(values))
+    arr = np.asarray(values, dtype=str)
+    if kinds == {""}:
+        return arr
+    try:
+        return arr.astype(np.int64)
+    except ValueError:
+        pass
+    try:
+        return np.where(arr == "", "nan", arr).astype(np.float64)
+    except ValueError:
+        return arr
+
+
+def _read_csv(path):
+    with open(path, "r", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return {}
+        rows = list(reader)
+
+    if not rows:
+        return {name: np.array([], dtype=str) for name in header}
+    return {name: _convert(col) for name, col in zip(header, zip(*rows))}
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise ImportError("Parquet sweep files need pyarrow (pip install pyarrow)")
+
+
+def _read_parquet(path):
+    _require_pyarrow()
+    table = pq.read_table(path)
+    cols = {}
+    for name in table.column_names:
+        arr = table.column(name).to_numpy(zero_copy_only=False)
+        cols[name] = arr.astype(str) if arr.dtype == object else arr
+    return cols
+
+
+def _fill(dtype, n):
+    """Placeholder column for files that lack a column other files have."""
+    if dtype.kind == "b":
+        return np.zeros(n, dtype=bool)
+    if dtype.kind in "iuf":
+        return np.full(n, np.nan)
+    return np.full(n, "", dtype=str)
+
+
+def load_runs(paths):
+    """
+    Load one or more sweep files (.csv or .parquet) into a single columnar
+    table: {column_name: ndarray}. A `source` column records which file each
+    row came from. Columns missing from some files are filled with NaN,
+    False or "" so older sweeps can be analyzed together with newer ones.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+
+    tables = []
+    for path in paths:
+        cols = _read_parquet(path) if path.endswith(".parquet") else _read_csv(path)
+        n = len(next(iter(cols.values()))) if cols else 0
+        cols["source"] = np.full(n, path)
+        tables.append((n, cols))
+
+    names = []
+    for _, cols in tables:
+        names += [name for name in cols if name not in names]
+
+    merged = {}
+    for name in names:
+        sample = next(cols[name] for _, cols in tables if name in cols)
+        parts = [cols[name] if name in cols else _fill(sample.dtype, n) for n, cols in tables]
+        if len(parts) > 1 and any(p.dtype != sample.dtype for p in parts):
+            # Mixed int/float (e.g. a filled-in column) -> float; anything else -> str
+            if all(p.dtype.kind in "biuf" for p in parts):
+                parts = [p.astype(np.float64) for p in parts]
+            else:
+                parts = [p.astype(str) for p in parts]
+        merged[name] = np.concatenate(parts) if parts else np.array([])
+    return merged
+
+
+def num_rows(cols) -> int:
+    return len(next(iter(cols.values()))) if cols else 0
+
+
+def write_parquet(cols, path):
+    """
+    Write a columnar table (or a sweep CSV via load_runs) as compressed,
+    dictionary-encoded Parquet; typically 5-10x smaller than the CSV.
+    """
+    _require_pyarrow()
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    cols = {name: arr for name, arr in cols.items() if name != "source"}
+    table = pyarrow.table(cols)
+    pq.write_table(table, path, compression="zstd", use_dictionary=True)
+
+
+def csv_to_parquet(csv_path, parquet_path):
+    """Convert a finished sweep CSV to Parquet."""
+    write_parquet(_read_csv(csv_path), parquet_path)
+
+
+# --- grouping ----------------------------------------------------------------
+
+
+def _factorize(values):
+    """(sorted uniques, codes) of a column; a dict pass for strings, which
+    np.unique would otherwise argsort character by character."""
+    if values.dtype.kind not in "UO":
+        uniques, codes = np.unique(values, return_inverse=True)
+        return uniques, codes.reshape(-1)
+
+    index = {}
+    codes = np.fromiter((index.setdefault(v, len(index)) for v in values.tolist()), np.int64, len(values))
+    labels = np.array(list(index), dtype=str)
+    order = np.argsort(labels)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return labels[order], rank[codes]
+
+
+def group_by(cols, keys):
+    """
+    Vectorized group-by. Returns (group_keys, inverse) where group_keys maps
+    each key column to its per-group values (groups sorted by key) and
+    inverse[i] is the group index of row i.
+    """
+    n = num_rows(cols)
+    if not keys:
+        return {}, np.zeros(n, dtype=np.int64)
+
+    uniques, codes = zip(*(_factorize(cols[key]) for key in keys))
+    # One int64 code per row, ordered like the key tuple
+    flat = np.ravel_multi_index(codes, [len(u) for u in uniques])
+    combined, inverse = np.unique(flat, return_inverse=True)
+    per_key = np.unravel_index(combined, [len(u) for u in uniques])
+    group_keys = {key: u[c] for key, u, c in zip(keys, uniques, per_key)}
+    return group_keys, inverse.reshape(-1)
+
+
+def _sum(inverse, values, n_groups):
+    return np.bincount(inverse, weights=values, minlength=n_groups)
+
+
+def group_rates(cols, keys):
+    """
+    Per-group counts and rates. Returns (group_keys, stats) where stats holds
+    arrays aligned with the groups:
+      runs, initial_passed, final_passed, used_repair (counts),
+      initial_pass_rate, final_pass_rate, repair_used_rate, repair_lift,
+      avg_iters_when_repair and, when the columns exist,
+      avg_initial_static_issues / avg_final_static_issues.
+    """
+    group_keys, inverse = group_by(cols, keys)
+    g = int(inverse.max()) + 1 if inverse.size else 0
+
+    runs = np.bincount(inverse, minlength=g).astype(np.float64)
+    stats = {"runs": runs}
+    for col in BOOL_COLUMNS:
+        stats[col] = _sum(inverse, cols[col].astype(np.float64), g)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stats["initial_pass_rate"] = stats["initial_passed"] / runs
+        stats["final_pass_rate"] = stats["final_passed"] / runs
+        stats["repair_used_rate"] = stats["used_repair"] / runs
+        stats["repair_lift"] = stats["final_pass_rate"] - stats["initial_pass_rate"]
+
+        iters = np.where(cols["used_repair"], cols["iterations"], 0).astype(np.float64)
+        iters_sum = _sum(inverse, iters, g)
+        stats["avg_iters_when_repair"] = np.where(
+            stats["used_repair"] > 0, iters_sum / np.maximum(stats["used_repair"], 1), 0.0
+        )
+
+        for col in ("initial_static_issues", "final_static_issues"):
+            if col in cols:
+                stats[f"avg_{col}"] = _sum(inverse, np.nan_to_num(cols[col].astype(np.float64)), g) / runs
+
+    return group_keys, stats
+
+
+# --- pass@k / confidence intervals -----------------------------------------
+
+
+_lgamma = np.vectorize(math.lgamma, otypes=[np.float64])
+
+
+def pass_at_k(n, c, k):
+    """
+    Unbiased pass@k estimator (Chen et al., 2021), vectorized over arrays of
+    sample counts n and correct counts c: 1 - C(n-c, k) / C(n, k).
+    Groups with fewer than k samples get NaN.
+    """
+    n = np.asarray(n, dtype=np.float64)
+    c = np.asarray(c, dtype=np.float64)
+    out = np.ones(np.broadcast(n, c).shape)
+    fail = n - c
+
+    possible = fail >= k
+    if possible.any():
+        f, m = np.broadcast_to(fail, out.shape)[possible], np.broadcast_to(n, out.shape)[possible]
+        log_ratio = _lgamma(f + 1) - _lgamma(f - k + 1) - _lgamma(m + 1) + _lgamma(m - k + 1)
+        out[possible] = 1.0 - np.exp(log_ratio)
+    out[np.broadcast_to(n, out.shape) < k] = np.nan
+    return out
+
+
+# k values reported by the analyzers, up to the runs every cell has
+PASS_AT_K_LADDER = (1, 2, 5, 10, 20, 50, 100)
+
+
+def pass_at_k_values(max_k: int) -> list:
+    max_k = max(1, int(max_k))
+    return sorted({k for k in PASS_AT_K_LADDER if k <= max_k} | {max_k})
+
+
+def group_pass_at_k(cols, keys, k_values=(1,), outcome="final_passed"):
+    """
+    pass@k per group, averaged over tasks: every (group, task) pair is one
+    problem with n = its runs and c = its passing runs. Returns
+    (group_keys, {k: ndarray}).
+    """
+    _, task_inverse = group_by(cols, list(keys) + ["task_id"])
+    t = int(task_inverse.max()) + 1 if task_inverse.size else 0
+    n = np.bincount(task_inverse, minlength=t)
+    c = _sum(task_inverse, cols[outcome].astype(np.float64), t)
+
+    # Map every (group, task) cell back to its group
+    group_keys, row_group = group_by(cols, list(keys))
+    cell_group = np.zeros(t, dtype=np.int64)
+    cell_group[task_inverse] = row_group
+    g = int(row_group.max()) + 1 if row_group.size else 0
+
+    results = {}
+    for k in k_values:
+        p = pass_at_k(n, c, k)
+        valid = ~np.isnan(p)
+        totals = _sum(cell_group[valid], p[valid], g)
+        counts = np.bincount(cell_group[valid], minlength=g)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            results[k] = np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
+    return group_keys, results
+
+
+def bootstrap_rate_ci(successes, totals, n_boot=2000, alpha=0.05, seed=0):
+    """
+    Percentile bootstrap CI for pass rates, vectorized over groups.
+
+    Resampling n pass/fail rows with replacement and counting passes is a
+    Binomial(n, p_hat) draw, so the bootstrap is done with one binomial call
+    instead of materializing n_boot x n resampled rows.
+    Returns (low, high) arrays.
+    """
+    successes = np.asarray(successes, dtype=np.float64)
+    totals = np.asarray(totals, dtype=np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p_hat = np.where(totals > 0, successes / np.maximum(totals, 1), 0.0)
+
+    rng = np.random.default_rng(seed)
+    draws = rng.binomial(totals, p_hat, size=(n_boot,) + totals.shape) / np.maximum(totals, 1)
+    low = np.quantile(draws, alpha / 2, axis=0)
+    high = np.quantile(draws, 1 - alpha / 2, axis=0)
+    empty = totals == 0
+    low, high = np.where(empty, np.nan, low), np.where(empty, np.nan, high)
+    return low, high
+
+
+def value_counts(cols, column, mask=None) -> dict:
+    """{value: rows} of a text column over the rows in `mask`, skipping ""."""
+    if column not in cols:
+        return {}
+    values = cols[column] if mask is None else cols[column][mask]
+    uniq, counts = np.unique(values[values != ""], return_counts=True)
+    return {str(v): int(c) for v, c in zip(uniq, counts)}
+
+
+# --- cost / latency ----------------------------------------------------------
+
+
+def cost_latency_columns(cols, mask=None):
+    """
+    Cost and latency of the rows selected by `mask` (all rows if None):
+    token totals, USD cost, cost/tokens per solved task and p50/p95 latency
+    (see src.metrics.format_cost_latency). None if the sweep has no tracing
+    columns.
+    """
+    if "total_s" not in cols or num_rows(cols) == 0:
+        return None
+    if mask is None:
+        mask = np.ones(num_rows(cols), dtype=bool)
+    if not mask.any():
+        return None
+
+    def col(name):
+        if name not in cols:
+            return np.zeros(int(mask.sum()))
+        return np.nan_to_num(cols[name][mask].astype(np.float64))
+
+    solved = int(cols["final_passed"][mask].sum())
+    prompt_tokens = col("prompt_tokens").sum()
+    completion_tokens = col("completion_tokens").sum()
+    cost = (
+        prompt_tokens * PRICE_PER_M_PROMPT_TOKENS
+        + completion_tokens * PRICE_PER_M_COMPLETION_TOKENS
+    ) / 1_000_000
+
+    total_s = col("total_s")
+    llm_s = col("llm_generate_s") + col("llm_review_s") + col("llm_repair_s")
+    sandbox_s = col("sandbox_spawn_s") + col("sandbox_exec_s")
+
+    return {
+        "runs": int(mask.sum()),
+        "solved": solved,
+        "prompt_tokens": int(prompt_tokens),
+        "completion_tokens": int(completion_tokens),
+        "cost_usd": cost,
+        "tokens_per_solved": (prompt_tokens + completion_tokens) / solved if solved else None,
+        "cost_per_solved": cost / solved if solved else None,
+        "p50_total_s": float(np.percentile(total_s, 50)),
+        "p95_total_s": float(np.percentile(total_s, 95)),
+        "p50_llm_s": float(np.percentile(llm_s, 50)),
+        "p95_llm_s": float(np.percentile(llm_s, 95)),
+        "p50_sandbox_s": float(np.percentile(sandbox_s, 50)),
+        "p95_sandbox_s": float(np.percentile(sandbox_s, 95)),
+    }
@@ -1,5 +1,8 @@
 # src/analyzer.py
 
+from src.verdict import describe, describe_expected, failed
+
+
 def analyze_results(results):
     """
     Takes a list of test results from run_tests and returns:
@@ -9,29 +12,12 @@ def analyze_results(results):
     Each result dict has:
       - "input"
       - "expected"
-      - ("output" OR "error")
+      - "verdict" (see src/verdict.py, which decides pass/fail for every caller)
+      - ("output" OR "error") for tests that did not pass
     """
-    all_passed = True
-    issues = []
-
-    for r in results:
-        expected = r.get("expected")
-
-        if "error" in r:
-            # Special case: if we had encoded expected error types, we'd handle them here.
-            # Currently, all tests in your advanced JSON expect normal values,
-            # so any error counts as a failure.
-            all_passed = False
-            issues.append(f"Unexpected error for input {r['input']}: {r['error']}")
-        else:
-            if r["output"] != expected:
-                all_passed = False
-                issues.append(
-                    f"Wrong output for input {r['input']}: got {r['output']}, expected {expected}"
-                )
-
+    issues = [describe(r) for r in results if failed(r)]
     summary = "\n".join(issues) if issues else "All tests passed."
-    return all_passed, summary
+    return not issues, summary
 
 
 def summarize_failures(results):
@@ -44,17 +30,16 @@ def summarize_failures(results):
     lines = []
 
     for r in results:
-        expected = r.get("expected")
-
+        if not failed(r):
+            continue
         if "error" in r:
             lines.append(
-                f"- INPUT={r['input']} | expected={expected} | ERROR={r['error']}"
+                f"- INPUT={r.get('input')} | expected={describe_expected(r)} | ERROR={r['error']}"
             )
         else:
-            if r["output"] != expected:
-                lines.append(
-                    f"- INPUT={r['input']} | expected={expected} | got={r['output']}"
-                )
+            lines.append(
+                f"- INPUT={r.get('input')} | expected={describe_expected(r)} | got={r.get('output')}"
+            )
 
     if not lines:
         return "All tests passed."
@@ -0,0 +1,172 @@
+# src/artifact_store.py
+#
+# Content-addressed store of every candidate a sweep produced, so results
+# can be re-scored later without asking the LLM again (see rescore.py).
+#
+#   store = get_store()
+#   store.record_unit("advanced", {"strategy": "repair_3", "run_id": 1, "task_id": 7},
+#                     tests, {"generated": code, "repair1": fixed, "initial": code, "final": fixed})
+#
+# Code is stored once per distinct text (sha256), zlib-compressed; units
+# only point at hashes, so the many identical drafts of a sweep cost one
+# blob. Each unit also remembers the hash of the tests it was scored
+# against, which is how rescore.py finds the units a test fix affects.
+#
+# Stage names: "generated", "reviewed", "repair<i>" (the code each repair
+# iteration produced), "initial" (the code the initial tests ran on) and
+# "final" (the code the final verdict is about).
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from src.config import ARTIFACTS_ENABLED, ARTIFACTS_PATH
+
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256((code or "").encode("utf-8")).hexdigest()
+
+
+def tests_hash(tests: list) -> str:
+    blob = json.dumps(tests, sort_keys=True, default=repr)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ArtifactStore:
+    """
+    SQLite-backed candidate store. Safe to share between threads; several
+    processes (e.g. work-queue workers) may write to the same file.
+    """
+
+    def __init__(self, path: str = ARTIFACTS_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, code BLOB, size INTEGER)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS candidates (
+                runner TEXT,
+                strategy TEXT,
+                run_id TEXT,
+                task_id TEXT,
+                stage TEXT,
+                hash TEXT,
+                tests_hash TEXT,
+                created_at REAL,
+                PRIMARY KEY (runner, strategy, run_id, task_id, stage)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _put_blob(self, code: str) -> str:
+        digest = code_hash(code)
+        data = (code or "").encode("utf-8")
+        self._conn.execute(
+            "INSERT OR IGNORE INTO blobs VALUES (?, ?, ?)",
+            (digest, zlib.compress(data, 6), len(data)),
+        )
+        return digest
+
+    def put_code(self, code: str) -> str:
+        with self._lock:
+            digest = self._put_blob(code)
+            self._conn.commit()
+        return digest
+
+    def get_code(self, digest: str) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT code FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(f"No stored candidate {digest[:12]}")
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def record_unit(self, runner: str, key: dict, tests: list, stages: dict):
+        """
+        Store the candidates of one unit. key has "run_id", "task_id" and
+        optionally "strategy"; stages maps stage name -> code. Recording a
+        unit again replaces its stages.
+        """
+        unit = (runner, str(key.get("strategy", "")), str(key["run_id"]), str(key["task_id"]))
+        t_hash = tests_hash(tests)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM candidates WHERE runner = ? AND strategy = ? AND run_id = ? AND task_id = ?",
+                unit,
+            )
+            for stage, code in stages.items():
+                if code is None:
+                    continue
+                digest = self._put_blob(code)
+                self._conn.execute(
+                    "INSERT INTO candidates VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    unit + (stage, digest, t_hash, now),
+                )
+            self._conn.commit()
+
+    def units(self, runner: str) -> list:
+        """
+        Every unit recorded for `runner`: dicts with "strategy", "run_id",
+        "task_id" (as text), "tests_hash" and "stages" {stage: hash}.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT strategy, run_id, task_id, stage, hash, tests_hash FROM candidates "
+                "WHERE runner = ? ORDER BY strategy, run_id, task_id",
+                (runner,),
+            ).fetchall()
+        units = {}
+        for strategy, run_id, task_id, stage, digest, t_hash in rows:
+            unit = units.setdefault(
+                (strategy, run_id, task_id),
+                {"strategy": strategy, "run_id": run_id, "task_id": task_id, "tests_hash": t_hash, "stages": {}},
+            )
+            unit["stages"][stage] = digest
+        return list(units.values())
+
+    def set_tests_hash(self, runner: str, unit: dict, t_hash: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE candidates SET tests_hash = ? "
+                "WHERE runner = ? AND strategy = ? AND run_id = ? AND task_id = ?",
+                (t_hash, runner, unit["strategy"], unit["run_id"], unit["task_id"]),
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            blobs, raw = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            stored = self._conn.execute("SELECT COALESCE(SUM(LENGTH(code)), 0) FROM blobs").fetchone()[0]
+            refs = self._conn.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+        return {"candidates": refs, "blobs": blobs, "raw_bytes": raw, "stored_bytes": stored}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ArtifactStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
+
+
+def record_unit(runner: str, key: dict, tests: list, stages: dict):
+    """record_unit on the shared store; a no-op unless ARTIFACTS_ENABLED."""
+    if ARTIFACTS_ENABLED:
+        get_store().record_unit(runner, key, tests, stages)
@@ -0,0 +1,94 @@
+# src/batch_generation.py
+#
+# Batched first drafts for multi-run sweeps (--batch-generate).
+#
+#   drafts = pregenerate([(group, description, seeds), ...], concurrency=8)
+#   evaluate_drafts(drafts, [(group, seed, tests, func_name), ...])
+#   drafts[(group, seed)]  # {"code", "share", "initial_results"}
+#
+# Instead of one generation request per run, every run of a (task,
+# strategy) group is sampled at once with generate_codes (one n > 1
+# request where the backend supports it). The drafts' initial tests then
+# run as a few large sandbox batches in which identical candidates (same
+# normalized code) are evaluated once. Each run's unit later picks
+# up its draft, its results and its share of the request's time and tokens.
+
+from src import tracing
+from src.code_generator import generate_codes
+from src.result_cache import test_results_key
+from src.scheduler import run_units
+from src.test_history import test_history
+from src.test_runner import run_tests_batch
+
+
+def pregenerate(groups: list, concurrency: int = 1) -> dict:
+    """
+    groups: (group, problem_description, seeds) tuples; seeds are the
+    per-run seeds generate_code would have been called with.
+    Returns {(group, seed): draft} where draft has "code" and "share", the
+    (seconds, prompt_tokens, completion_tokens) of its group's request
+    divided by the number of samples.
+    """
+    def sample(group, description, seeds):
+        with tracing.trace() as tracer:
+            codes = generate_codes(description, list(seeds))
+        n = max(1, len(seeds))
+        share = (
+            tracer.seconds.get("llm.generate", 0.0) / n,
+            tracer.prompt_tokens // n,
+            tracer.completion_tokens // n,
+        )
+        return {(group, seed): {"code": code, "share": share} for seed, code in zip(seeds, codes)}
+
+    drafts = {}
+    for part in run_units(sample, groups, max_workers=concurrency):
+        drafts.update(part)
+    return drafts
+
+
+def run_tests_deduplicated(candidates: list, concurrency: int = 1, fail_fast: bool = False):
+    """
+    run_tests_batch over (code, tests, func_name) candidates, evaluating
+    identical ones (same normalized code on the same tests) once and
+    spreading the unique ones over `concurrency` batches, one sandbox
+    worker each. Returns (one result list per candidate, unique count).
+    """
+    keys = [test_results_key(*candidate) for candidate in candidates]
+    first = {}
+    for i, key in enumerate(keys):
+        first.setdefault(key, i)
+    unique = list(first.values())
+
+    def run_chunk(chunk):
+        return run_tests_batch([candidates[i] for i in chunk], fail_fast=fail_fast)
+
+    n_chunks = max(1, min(concurrency, len(unique)))
+    chunks = [unique[c::n_chunks] for c in range(n_chunks)]
+    by_index = {}
+    for chunk, chunk_results in zip(chunks, run_units(run_chunk, [(c,) for c in chunks], max_workers=n_chunks)):
+        by_index.update(zip(chunk, chunk_results))
+
+    return [[dict(r) for r in by_index[first[key]]] for key in keys], len(unique)
+
+
+def evaluate_drafts(drafts: dict, items: list, concurrency: int = 1) -> dict:
+    """
+    Run the initial tests of the drafts named by items, (group, seed,
+    tests, func_name) tuples, with fail_fast (only the verdict is needed)
+    and store them as draft["initial_results"]. Identical drafts are
+    tested once (see run_tests_deduplicated). Results are recorded in the
+    shared test history as run_tests_adaptive would. Returns
+    {"candidates", "unique"} counts.
+    """
+    candidates = [(drafts[(group, seed)]["code"], tests, func_name) for group, seed, tests, func_name in items]
+    results, unique = run_tests_deduplicated(candidates, concurrency, fail_fast=True)
+    for (group, seed, tests, func_name), entries in zip(items, results):
+        drafts[(group, seed)]["initial_results"] = entries
+        test_history.record(func_name, tests, entries)
+    return {"candidates": len(candidates), "unique": unique}
+
+
+def charge_draft(draft: dict):
+    """Account a draft's share of its batched request to the active unit."""
+    seconds, prompt_tokens, completion_tokens = draft["share"]
+    tracing.record_span("llm.generate", seconds, prompt_tokens, completion_tokens)
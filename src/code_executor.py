@@ -1,19 +1,62 @@
+import os
+import resource
 import subprocess
 import tempfile
 
-def run_python_code(code, timeout=3):
+from src.config import SANDBOX_MEMORY_MB, SANDBOX_MODE
+
+
+def _limit_resources(cpu_limit_s, memory_limit_mb):
+    # Runs in the child between fork and exec
+    if cpu_limit_s > 0:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit_s, cpu_limit_s + 1))
+    if memory_limit_mb > 0:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def run_python_code(code, timeout=3, cpu_limit_s=None, memory_limit_mb=SANDBOX_MEMORY_MB):
+    """
+    Run a standalone script and return (stdout, stderr).
+
+    timeout:         wall-clock limit in seconds
+    cpu_limit_s:     CPU-time limit (RLIMIT_CPU), defaults to the wall timeout
+    memory_limit_mb: address-space limit (RLIMIT_AS)
+
+    On a wall-clock timeout returns (None, "Timeout Error"); a CPU or
+    memory overrun shows up as the child's own error in stderr.
+
+    In the "forkserver" SANDBOX_MODE the script runs in a forked child of a
+    sandbox zygote (stdlib pre-imported, restricted like test candidates)
+    instead of a fresh python3 process.
+    """
+    if cpu_limit_s is None:
+        cpu_limit_s = max(1, int(timeout))
+
+    if SANDBOX_MODE == "forkserver":
+        from src.sandbox import get_pool
+
+        result = get_pool().run_script(code, timeout, cpu_limit_s, memory_limit_mb)
+        if result["timed_out"]:
+            return None, "Timeout Error"
+        return result["stdout"], result["stderr"]
+
     # Create temp file
     with tempfile.NamedTemporaryFile(suffix=".py", delete=False) as temp:
         temp.write(code.encode())
         temp.flush()
 
-        try:
-            result = subprocess.run(
-                ["python3", temp.name],
-                capture_output=True,
-                text=True,
-                timeout=timeout
-            )
-            return result.stdout, result.stderr
-        except subprocess.TimeoutExpired:
-            return None, "Timeout Error"
+    try:
+        result = subprocess.run(
+            ["python3", temp.name],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            preexec_fn=lambda: _limit_resources(cpu_limit_s, memory_limit_mb),
+        )
+        return result.stdout, result.stderr
+    except subprocess.TimeoutExpired:
+        return None, "Timeout Error"
+    finally:
+        os.unlink(temp.name)
@@ -1,10 +1,10 @@
-from groq import Groq
-from src.config import GROQ_API_KEY, MODEL_NAME
+from src.config import MODEL_NAME
+from src.llm_client import complete, complete_n
+from src.tracing import span
 
-client = Groq(api_key=GROQ_API_KEY)
 
-def generate_code(problem_description: str) -> str:
-    prompt = f"""
+def _generation_prompt(problem_description: str) -> str:
+    return f"""
 You are an expert Python developer.
 
 Write a correct, complete Python function for the following problem:
@@ -16,10 +16,27 @@ Requirements:
 - Return ONLY valid Python code. No explanations, no markdown, no comments.
 """.strip()
 
-    resp = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-    )
 
-    return resp.choices[0].message.content
+def generate_code(problem_description: str, seed=None) -> str:
+    with span("llm.generate"):
+        return complete(
+            model=MODEL_NAME,
+            messages=[{"role": "user", "content": _generation_prompt(problem_description)}],
+            temperature=0.2,
+            seed=seed,
+        )
+
+
+def generate_codes(problem_description: str, seeds: list, usage: dict = None) -> list:
+    """
+    One candidate per seed, fetched together (see llm_client.complete_n).
+    generate_codes(d, [s])[0] is the same sample as generate_code(d, seed=s).
+    """
+    with span("llm.generate", samples=len(seeds)):
+        return complete_n(
+            [{"role": "user", "content": _generation_prompt(problem_description)}],
+            seeds,
+            model=MODEL_NAME,
+            temperature=0.2,
+            usage=usage,
+        )
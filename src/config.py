@@ -1,7 +1,129 @@
 import os
 
+# Checked lazily by the Groq backend in src/llm_client.py, so offline
+# backends (fake, replay-only cache) work without a key
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+MODEL_NAME = "llama-3.1-8b-instant"
 
-if not GROQ_API_KEY:
-    raise RuntimeError("GROQ_API_KEY environment variable is not set")
-MODEL_NAME = "llama-3.1-8b-instant"
\ No newline at end of file
+# LLM backend: "groq", "openai_compat" (any OpenAI-style server at
+# LLM_BASE_URL, e.g. a local stand-in) or "fake" (offline, see llm_client)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+LLM_API_KEY = os.getenv("LLM_API_KEY")
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "16"))
+# Retries on 429 / 5xx / connection errors, with full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", "1"))
+LLM_BACKOFF_CAP_S = float(os.getenv("LLM_BACKOFF_CAP_S", "30"))
+
+# How many (task, run, strategy) units the experiment runners execute at once
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "4"))
+
+# Requests per minute allowed per LLM provider (0 = unlimited)
+PROVIDER_RATE_LIMITS = {
+    "groq": int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30")),
+    "openai_compat": int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")),
+}
+
+# Sandbox worker pool used by test_runner.run_tests
+SANDBOX_POOL_SIZE = int(os.getenv("SANDBOX_POOL_SIZE", str(MAX_CONCURRENCY)))
+# Wall-clock budget for one candidate (import + all of its tests)
+SANDBOX_TIMEOUT_S = float(os.getenv("SANDBOX_TIMEOUT_S", "10"))
+# Wall-clock and CPU-time limits for a single test call
+SANDBOX_TEST_TIMEOUT_S = float(os.getenv("SANDBOX_TEST_TIMEOUT_S", "2"))
+SANDBOX_TEST_CPU_S = float(os.getenv("SANDBOX_TEST_CPU_S", "2"))
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "512"))
+# Hard RLIMIT_CPU backstop per candidate; exceeding it kills the worker
+SANDBOX_CPU_S = int(os.getenv("SANDBOX_CPU_S", "10"))
+SANDBOX_MAX_JOBS_PER_WORKER = int(os.getenv("SANDBOX_MAX_JOBS_PER_WORKER", "100"))
+# "pool": each worker runs candidates itself (recycled every
+# SANDBOX_MAX_JOBS_PER_WORKER candidates, and after any candidate that timed
+# out or left threads or signal handlers behind). "forkserver": each worker is a
+# zygote that pre-imports SANDBOX_PRELOAD and forks a restricted
+# copy-on-write child per candidate, also used by code_executor.run_python_code
+SANDBOX_MODE = os.getenv("SANDBOX_MODE", "pool")
+SANDBOX_PRELOAD = [
+    m for m in os.getenv(
+        "SANDBOX_PRELOAD",
+        "collections,re,itertools,math,functools,heapq,bisect,string,operator,typing,"
+        "json,random,statistics,fractions,decimal,datetime,copy,dataclasses,enum",
+    ).split(",") if m
+]
+# Fork-server children also get a seccomp syscall filter when a binding
+# (python3-seccomp or pyseccomp) is installed; only that filter stops them
+# from starting processes, threads, programs or network connections.
+# Rlimits, no_new_privs and killing the child's process group always apply
+SANDBOX_SECCOMP = os.getenv("SANDBOX_SECCOMP", "1") == "1"
+# Large suites stream results back in chunks of this many tests (and at
+# least every SANDBOX_PROGRESS_INTERVAL_S when a progress callback is set)
+SANDBOX_TEST_CHUNK_SIZE = int(os.getenv("SANDBOX_TEST_CHUNK_SIZE", "256"))
+SANDBOX_PROGRESS_INTERVAL_S = float(os.getenv("SANDBOX_PROGRESS_INTERVAL_S", "0.5"))
+
+# run_tests_adaptive: run a task's historically failing tests first (at most
+# this many) and the rest of the suite only if they all pass
+ADAPTIVE_TEST_ORDER = os.getenv("ADAPTIVE_TEST_ORDER", "1") == "1"
+ADAPTIVE_FAST_SUBSET_MAX = int(os.getenv("ADAPTIVE_FAST_SUBSET_MAX", "32"))
+
+# --adaptive sampling in the experiment runners (src/adaptive_sampling.py):
+# runs every (task, strategy) cell gets, the most it may get, and the 95%
+# CI width of its pass rate at which it stops
+ADAPTIVE_MIN_RUNS = int(os.getenv("ADAPTIVE_MIN_RUNS", "3"))
+ADAPTIVE_MAX_RUNS = int(os.getenv("ADAPTIVE_MAX_RUNS", "10"))
+ADAPTIVE_CI_WIDTH = float(os.getenv("ADAPTIVE_CI_WIDTH", "0.5"))
+
+# Repair prompts (src/prompt_builder.py): estimated-token budget, how many
+# distinct failures / lint issues to show, and whether to ask for a unified
+# diff instead of the full code
+REPAIR_PROMPT_BUDGET_TOKENS = int(os.getenv("REPAIR_PROMPT_BUDGET_TOKENS", "1500"))
+REPAIR_TOP_K_FAILURES = int(os.getenv("REPAIR_TOP_K_FAILURES", "5"))
+REPAIR_MAX_LINT_ISSUES = int(os.getenv("REPAIR_MAX_LINT_ISSUES", "8"))
+REPAIR_DIFF_MODE = os.getenv("REPAIR_DIFF_MODE", "0") == "1"
+
+# Default task file(s) for the runners, and how many lazily loaded test
+# lists a TaskStore keeps in memory (src/task_loader.py)
+TASKS_PATH = os.getenv("TASKS_PATH", "tasks/sample_tasks.json")
+TASK_TESTS_CACHE_MAX = int(os.getenv("TASK_TESTS_CACHE_MAX", "256"))
+
+# Distributed sweeps (src/work_queue.py): lease length (renewed while a
+# unit runs), leases per unit before it is marked failed, idle poll interval
+WORK_QUEUE_LEASE_S = float(os.getenv("WORK_QUEUE_LEASE_S", "120"))
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))
+WORK_QUEUE_POLL_S = float(os.getenv("WORK_QUEUE_POLL_S", "1.0"))
+
+# Repair-loop convergence (src/repair_loop.py): a candidate seen before
+# (cycle) or the same failure set this many iterations in a row
+# (stagnation) triggers the next escalation step, and once they are used
+# up the loop stops early. Steps: "temperature", "reviewer", "model".
+# "model" is opt-in: it switches to REPAIR_ESCALATION_MODEL, whose tokens
+# the cost columns still price at the MODEL_NAME rates, and mixes a second
+# model into a sweep
+REPAIR_DETECT_CONVERGENCE = os.getenv("REPAIR_DETECT_CONVERGENCE", "1") == "1"
+REPAIR_STAGNATION_PATIENCE = int(os.getenv("REPAIR_STAGNATION_PATIENCE", "1"))
+REPAIR_ESCALATION = [s for s in os.getenv("REPAIR_ESCALATION", "temperature,reviewer").split(",") if s]
+REPAIR_ESCALATION_TEMPERATURE = float(os.getenv("REPAIR_ESCALATION_TEMPERATURE", "0.8"))
+REPAIR_ESCALATION_MODEL = os.getenv("REPAIR_ESCALATION_MODEL", "llama-3.3-70b-versatile")
+
+# Artifact store (src/artifact_store.py): every generated, reviewed and
+# repaired candidate of the experiment runners, for re-scoring (rescore.py)
+ARTIFACTS_ENABLED = os.getenv("ARTIFACTS_ENABLED", "1") == "1"
+ARTIFACTS_PATH = os.getenv("ARTIFACTS_PATH", "results/artifacts.sqlite")
+
+# LLM response cache: "off", "read_through", "record" or "replay"
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "off")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "results/llm_cache.sqlite")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "256"))
+
+# In-memory cache of test / static-analysis results keyed by normalized code
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "4096"))
+
+# Temperatures cycled across branches of speculative repair (repair_code speculative_k > 1)
+SPECULATIVE_TEMPERATURES = [
+    float(t) for t in os.getenv("SPECULATIVE_TEMPERATURES", "0.2,0.5,0.8").split(",")
+]
+
+# USD per million tokens, used by the analyzers for cost-per-solved-task
+# (defaults: Groq list price for llama-3.1-8b-instant)
+PRICE_PER_M_PROMPT_TOKENS = float(os.getenv("PRICE_PER_M_PROMPT_TOKENS", "0.05"))
+PRICE_PER_M_COMPLETION_TOKENS = float(os.getenv("PRICE_PER_M_COMPLETION_TOKENS", "0.08"))
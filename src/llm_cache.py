@@ -0,0 +1,139 @@
+# src/llm_cache.py
+#
+# Disk-backed store of chat completions used by src/llm_client.py.
+# Modes (LLM_CACHE_MODE):
+#   - "off":          always call the API, never touch the cache
+#   - "read_through": serve hits from the cache, call the API and store on a miss
+#   - "record":       always call the API and overwrite the stored response
+#   - "replay":       serve only from the cache; a miss raises CacheMiss
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.config import (
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_MAX_MB,
+    LLM_CACHE_PATH,
+)
+
+CACHE_MODES = ("off", "read_through", "record", "replay")
+
+
+class CacheMiss(RuntimeError):
+    """Raised in replay mode when a prompt has no recorded response."""
+
+
+def cache_key(model: str, messages: list, temperature: float, seed=None) -> str:
+    """
+    Content address of one chat completion request.
+    `seed` is usually the experiment run_id, so independent runs of the
+    same prompt get independent cache entries.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "seed": seed},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed store of chat completions with LRU eviction.
+
+    Entries are evicted least-recently-used first once the cache holds more
+    than `max_entries` rows or more than `max_mb` megabytes of responses.
+    Safe to share between threads; several processes may open the same file.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES, max_mb: int = LLM_CACHE_MAX_MB):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                content TEXT,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                size INTEGER,
+                created_at REAL,
+                last_used REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON completions(last_used)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        """Return the cached entry dict for `key`, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, prompt_tokens, completion_tokens FROM completions WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+        content, prompt_tokens, completion_tokens = row
+        return {
+            "content": content,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        }
+
+    def put(self, key: str, model: str, content: str, prompt_tokens=None, completion_tokens=None):
+        now = time.time()
+        size = len(content.encode("utf-8")) if content else 0
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, content, prompt_tokens, completion_tokens, size, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+        ).fetchone()
+
+        while count > self.max_entries or total > self.max_bytes:
+            # Drop the oldest 10% (at least one row) per round
+            batch = max(1, count // 10)
+            self._conn.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY last_used ASC LIMIT ?)",
+                (batch,),
+            )
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+            ).fetchone()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> LLMCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
@@ -0,0 +1,527 @@
+# src/llm_client.py
+#
+# Single shared entry point for every chat completion in the pipeline.
+#
+#   complete(messages, ...)        sync, used by generate/review/repair
+#   await acomplete(messages, ...) async twin for callers with an event loop
+#   complete_n(messages, seeds)    one sample per seed in a single request
+#                                  (n > 1) or concurrent ones
+#
+# Both go through the same steps: response cache (src/llm_cache.py) ->
+# per-provider rate limiter -> backend call with jittered-backoff retries.
+# The backend is created lazily on first use, so importing the pipeline no
+# longer needs an API key or network access.
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+import weakref
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from src.config import (
+    GROQ_API_KEY,
+    LLM_API_KEY,
+    LLM_BACKEND,
+    LLM_BACKOFF_BASE_S,
+    LLM_BACKOFF_CAP_S,
+    LLM_BASE_URL,
+    LLM_CACHE_MODE,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_RETRIES,
+    LLM_TIMEOUT_S,
+    MODEL_NAME,
+)
+from src.llm_cache import CACHE_MODES, CacheMiss, cache_key, get_cache
+from src.scheduler import get_rate_limiter
+from src.tracing import add_tokens
+
+Completion = namedtuple("Completion", ["content", "prompt_tokens", "completion_tokens"])
+
+
+class LLMBackend:
+    """
+    Interface every backend implements.
+
+    name is also the rate-limiter provider key (see PROVIDER_RATE_LIMITS).
+    Subclasses implement complete(); acomplete() defaults to running
+    complete() in a worker thread. Backends whose API can return several
+    samples per request set supports_n and implement complete_n().
+    """
+
+    name = "base"
+    supports_n = False
+
+    def complete(self, model: str, messages: list, temperature: float) -> Completion:
+        raise NotImplementedError
+
+    def complete_n(self, model: str, messages: list, temperature: float, n: int) -> list:
+        """Up to n Completions from one request (the server may return fewer)."""
+        raise NotImplementedError
+
+    async def acomplete(self, model: str, messages: list, temperature: float) -> Completion:
+        return await asyncio.to_thread(self.complete, model, messages, temperature)
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return False
+
+    def close(self):
+        pass
+
+
+def _is_retryable_status(status_code) -> bool:
+    return status_code == 429 or (status_code is not None and status_code >= 500)
+
+
+def _completion_from_openai_json(data) -> Completion:
+    usage = data.get("usage") or {}
+    return Completion(
+        content=data["choices"][0]["message"]["content"],
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+    )
+
+
+def _split_tokens(total, n):
+    # Spread one request's token count over its n samples (remainder to the first)
+    if total is None:
+        return [None] * n
+    return [total // n + (total % n if i == 0 else 0) for i in range(n)]
+
+
+def _completions_from_openai_json(data) -> list:
+    # Usage covers the whole request: the prompt is billed once for all n choices
+    usage = data.get("usage") or {}
+    choices = data["choices"]
+    prompt = _split_tokens(usage.get("prompt_tokens"), len(choices))
+    completion = _split_tokens(usage.get("completion_tokens"), len(choices))
+    return [
+        Completion(choice["message"]["content"], prompt[i], completion[i])
+        for i, choice in enumerate(choices)
+    ]
+
+
+def _httpx_limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+    )
+
+
+class _PerLoopAsyncClients:
+    # httpx async clients are bound to the event loop they were first used on
+    def __init__(self, factory):
+        self._factory = factory
+        self._clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._clients:
+                self._clients[loop] = self._factory()
+            return self._clients[loop]
+
+
+class GroqBackend(LLMBackend):
+    """
+    Groq chat completions over one pooled keep-alive HTTP connection set.
+    Groq only accepts n=1, so complete_n() callers get concurrent requests.
+    """
+
+    name = "groq"
+
+    def __init__(self, api_key: str = GROQ_API_KEY, base_url: str = None):
+        if not api_key:
+            raise RuntimeError("GROQ_API_KEY environment variable is not set")
+
+        import groq
+        import httpx
+
+        self._groq = groq
+        # Retries are handled by llm_client so they share one backoff policy
+        self._client = groq.Groq(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            timeout=LLM_TIMEOUT_S,
+            http_client=httpx.Client(limits=_httpx_limits(), timeout=LLM_TIMEOUT_S),
+        )
+        self._async_clients = _PerLoopAsyncClients(
+            lambda: groq.AsyncGroq(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=0,
+                timeout=LLM_TIMEOUT_S,
+                http_client=httpx.AsyncClient(limits=_httpx_limits(), timeout=LLM_TIMEOUT_S),
+            )
+        )
+
+    @staticmethod
+    def _to_completion(resp) -> Completion:
+        usage = getattr(resp, "usage", None)
+        return Completion(
+            content=resp.choices[0].message.content,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+        )
+
+    def complete(self, model, messages, temperature):
+        resp = self._client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+        )
+        return self._to_completion(resp)
+
+    async def acomplete(self, model, messages, temperature):
+        resp = await self._async_clients.get().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+        )
+        return self._to_completion(resp)
+
+    def is_retryable(self, exc):
+        if isinstance(exc, (self._groq.APIConnectionError, self._groq.APITimeoutError)):
+            return True
+        if isinstance(exc, self._groq.APIStatusError):
+            return _is_retryable_status(exc.status_code)
+        return False
+
+    def close(self):
+        self._client.close()
+
+
+class OpenAICompatBackend(LLMBackend):
+    """
+    Any server speaking the OpenAI /chat/completions API (vLLM, llama.cpp,
+    Ollama, a local stand-in for benchmarking, ...), at LLM_BASE_URL.
+    """
+
+    name = "openai_compat"
+    supports_n = True
+
+    def __init__(self, base_url: str = LLM_BASE_URL, api_key: str = LLM_API_KEY):
+        if not base_url:
+            raise RuntimeError("LLM_BASE_URL must be set for the openai_compat backend")
+
+        import httpx
+
+        self._httpx = httpx
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._client = httpx.Client(limits=_httpx_limits(), timeout=LLM_TIMEOUT_S)
+        self._async_clients = _PerLoopAsyncClients(
+            lambda: httpx.AsyncClient(limits=_httpx_limits(), timeout=LLM_TIMEOUT_S)
+        )
+
+    def _payload(self, model, messages, temperature, n=1):
+        payload = {"model": model, "messages": messages, "temperature": temperature}
+        if n > 1:
+            payload["n"] = n
+        return payload
+
+    def complete(self, model, messages, temperature):
+        resp = self._client.post(self.url, json=self._payload(model, messages, temperature), headers=self.headers)
+        resp.raise_for_status()
+        return _completion_from_openai_json(resp.json())
+
+    def complete_n(self, model, messages, temperature, n):
+        resp = self._client.post(self.url, json=self._payload(model, messages, temperature, n), headers=self.headers)
+        resp.raise_for_status()
+        return _completions_from_openai_json(resp.json())
+
+    async def acomplete(self, model, messages, temperature):
+        client = self._async_clients.get()
+        resp = await client.post(self.url, json=self._payload(model, messages, temperature), headers=self.headers)
+        resp.raise_for_status()
+        return _completion_from_openai_json(resp.json())
+
+    def is_retryable(self, exc):
+        if isinstance(exc, self._httpx.TransportError):
+            return True
+        if isinstance(exc, self._httpx.HTTPStatusError):
+            return _is_retryable_status(exc.response.status_code)
+        return False
+
+    def close(self):
+        self._client.close()
+
+
+class FakeBackend(LLMBackend):
+    """
+    Offline backend for tests and benchmarks.
+
+    responder(model, messages, temperature) -> str decides each reply; the
+    default echoes a trivial function so the pipeline runs end to end.
+    Token counts are estimated at ~4 characters per token. complete_n()
+    counts as one call and bills the prompt once, like a real n > 1 request.
+    """
+
+    name = "fake"
+    supports_n = True
+
+    def __init__(self, responder=None, latency_s: float = 0.0):
+        self.responder = responder or (lambda model, messages, temperature: "def solution(*args):\n    return None\n")
+        self.latency_s = latency_s
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _reply(self, model, messages, temperature) -> Completion:
+        with self._lock:
+            self.calls += 1
+        content = self.responder(model, messages, temperature)
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        return Completion(content, prompt_chars // 4, len(content or "") // 4)
+
+    def complete(self, model, messages, temperature):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return self._reply(model, messages, temperature)
+
+    async def acomplete(self, model, messages, temperature):
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        return self._reply(model, messages, temperature)
+
+    def complete_n(self, model, messages, temperature, n):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        with self._lock:
+            self.calls += 1
+        contents = [self.responder(model, messages, temperature) for _ in range(n)]
+        prompt = _split_tokens(sum(len(m.get("content") or "") for m in messages) // 4, n)
+        return [Completion(c, prompt[i], len(c or "") // 4) for i, c in enumerate(contents)]
+
+
+BACKENDS = {
+    "groq": GroqBackend,
+    "openai_compat": OpenAICompatBackend,
+    "fake": FakeBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def register_backend(name: str, factory):
+    """Make a backend selectable via LLM_BACKEND=<name>."""
+    BACKENDS[name] = factory
+
+
+def set_backend(backend: LLMBackend):
+    """Swap the shared backend (e.g. install a FakeBackend for offline runs)."""
+    global _backend
+    with _backend_lock:
+        old, _backend = _backend, backend
+    if old is not None and old is not backend:
+        old.close()
+
+
+def get_backend() -> LLMBackend:
+    """Return the shared backend, creating it from LLM_BACKEND on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if LLM_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}; expected one of {sorted(BACKENDS)}")
+            _backend = BACKENDS[LLM_BACKEND]()
+        return _backend
+
+
+def _backoff_delay(attempt: int) -> float:
+    # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(LLM_BACKOFF_CAP_S, LLM_BACKOFF_BASE_S * (2 ** attempt)))
+
+
+_usage_lock = threading.Lock()
+
+
+def _add_usage(usage, **counts):
+    if usage is None:
+        return
+    with _usage_lock:
+        for name, value in counts.items():
+            usage[name] = usage.get(name, 0) + value
+
+
+def _check_mode(mode):
+    mode = mode or LLM_CACHE_MODE
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown LLM cache mode {mode!r}; expected one of {CACHE_MODES}")
+    return mode
+
+
+def _cache_lookup(mode, key, model, usage):
+    if mode not in ("read_through", "replay"):
+        return None
+    hit = get_cache().get(key)
+    if hit is not None:
+        _add_usage(usage, calls=1, cache_hits=1)
+        return hit["content"]
+    if mode == "replay":
+        raise CacheMiss(f"No recorded response for request {key[:12]} (model={model})")
+    return None
+
+
+def _cache_store(mode, key, model, completion, usage):
+    add_tokens(completion.prompt_tokens, completion.completion_tokens)
+    _add_usage(
+        usage,
+        calls=1,
+        prompt_tokens=completion.prompt_tokens or 0,
+        completion_tokens=completion.completion_tokens or 0,
+    )
+    if mode != "off":
+        get_cache().put(
+            key,
+            model,
+            completion.content,
+            prompt_tokens=completion.prompt_tokens,
+            completion_tokens=completion.completion_tokens,
+        )
+
+
+def complete(
+    messages: list,
+    model: str = MODEL_NAME,
+    temperature: float = 0.2,
+    seed=None,
+    cache_mode: str = None,
+    usage: dict = None,
+) -> str:
+    """
+    Run one chat completion and return its text.
+
+    seed:       run identifier; part of the cache key so independent runs
+                keep independent samples (it is not sent to the API)
+    cache_mode: "off", "read_through", "record" or "replay"
+                (LLM_CACHE_MODE by default, see src/llm_cache.py)
+    usage:      optional dict; "prompt_tokens", "completion_tokens", "calls"
+                and "cache_hits" are added to it (cache hits buy no tokens)
+
+    Retries 429 / 5xx / connection errors up to LLM_MAX_RETRIES times.
+    """
+    mode = _check_mode(cache_mode)
+    key = cache_key(model, messages, temperature, seed)
+    cached = _cache_lookup(mode, key, model, usage)
+    if cached is not None:
+        return cached
+
+    backend = get_backend()
+    completion = _call_with_retries(backend, lambda: backend.complete(model, messages, temperature))
+    _cache_store(mode, key, model, completion, usage)
+    return completion.content
+
+
+def _call_with_retries(backend, call):
+    limiter = get_rate_limiter(backend.name)
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            return call()
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not backend.is_retryable(e):
+                raise
+            time.sleep(_backoff_delay(attempt))
+            attempt += 1
+
+
+def complete_n(
+    messages: list,
+    seeds: list,
+    model: str = MODEL_NAME,
+    temperature: float = 0.2,
+    cache_mode: str = None,
+    usage: dict = None,
+) -> list:
+    """
+    One completion per seed for the same messages, in seed order. Each
+    sample is cached under the same key complete() uses for that seed, so
+    the two are interchangeable (replay works either way).
+
+    The samples that are not cached are fetched together: backends with
+    supports_n get one request with n = number of misses (repeated if the
+    server returns fewer), the others get concurrent single requests. Either
+    way the prompt is sent once per request instead of once per sample
+    where the API allows it.
+    """
+    mode = _check_mode(cache_mode)
+    keys = [cache_key(model, messages, temperature, seed) for seed in seeds]
+    out = [_cache_lookup(mode, key, model, usage) for key in keys]
+    missing = [i for i, content in enumerate(out) if content is None]
+    if not missing:
+        return out
+
+    backend = get_backend()
+    if backend.supports_n and len(missing) > 1:
+        while missing:
+            completions = _call_with_retries(
+                backend, lambda: backend.complete_n(model, messages, temperature, len(missing))
+            )
+            if not completions:
+                raise RuntimeError(f"{backend.name} returned no choices for an n={len(missing)} request")
+            for i, completion in zip(missing, completions):
+                _cache_store(mode, keys[i], model, completion, usage)
+                out[i] = completion.content
+            missing = missing[len(completions):]
+        return out
+
+    # One request per sample, in flight together; each thread runs in a copy
+    # of this context so token usage lands in the caller's tracer span
+    with ThreadPoolExecutor(max_workers=min(len(missing), LLM_MAX_CONNECTIONS)) as pool:
+        futures = {
+            i: pool.submit(
+                contextvars.copy_context().run,
+                complete,
+                messages,
+                model,
+                temperature,
+                seeds[i],
+                mode,
+                usage,
+            )
+            for i in missing
+        }
+        for i, fut in futures.items():
+            out[i] = fut.result()
+    return out
+
+
+async def acomplete(
+    messages: list,
+    model: str = MODEL_NAME,
+    temperature: float = 0.2,
+    seed=None,
+    cache_mode: str = None,
+    usage: dict = None,
+) -> str:
+    """Async twin of complete(); same cache, rate limiting and retries."""
+    mode = _check_mode(cache_mode)
+    key = cache_key(model, messages, temperature, seed)
+    cached = _cache_lookup(mode, key, model, usage)
+    if cached is not None:
+        return cached
+
+    backend = get_backend()
+    limiter = get_rate_limiter(backend.name)
+    attempt = 0
+    while True:
+        await limiter.acquire_async()
+        try:
+            completion = await backend.acomplete(model, messages, temperature)
+            break
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not backend.is_retryable(e):
+                raise
+            await asyncio.sleep(_backoff_delay(attempt))
+            attempt += 1
+
+    _cache_store(mode, key, model, completion, usage)
+    return completion.content
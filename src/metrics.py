@@ -1,6 +1,8 @@
 import json
 import os
 
+from src.verdict import all_passed, verdict_codes
+
 
 def save_experiment_log(log, path="results/experiment_log.json"):
     # Make sure results directory exists
@@ -12,32 +14,36 @@ def save_experiment_log(log, path="results/experiment_log.json"):
 
 def summarize_task_results(task, initial_results, final_results=None, iterations=0):
     """
-    Build a compact dict summarizing one task run.
+    Build a compact dict summarizing one task run. The *_verdicts fields
+    hold one verdict letter per test (src/verdict.py), e.g. "PPWE".
     """
-    def all_passed(results):
-        for r in results:
-            expected = r.get("expected")
-            if "error" in r:
-                # Special case: expected division-by-zero
-                if expected == "error_div_zero" and "division by zero" in r["error"]:
-                    continue
-                else:
-                    return False
-            else:
-                if expected == "error_div_zero":
-                    return False
-                if r["output"] != expected:
-                    return False
-        return True
-
     summary = {
         "task_id": task["id"],
         "title": task["title"],
         "func_name": task["func_name"],
         "initial_passed": all_passed(initial_results),
+        "initial_verdicts": verdict_codes(initial_results),
         "used_repair": final_results is not None,
         "iterations": iterations if final_results is not None else 0,
         "final_passed": all_passed(final_results) if final_results is not None else None,
+        "final_verdicts": verdict_codes(final_results) if final_results is not None else None,
     }
 
     return summary
+
+
+def format_cost_latency(summary, indent="  "):
+    """Printable lines for a src.analytics.cost_latency_columns() dict."""
+    def per_solved(value, fmt):
+        return fmt.format(value) if value is not None else "n/a (nothing solved)"
+
+    return [
+        f"{indent}Runs / solved     : {summary['runs']} / {summary['solved']}",
+        f"{indent}Tokens (in / out) : {summary['prompt_tokens']} / {summary['completion_tokens']}",
+        f"{indent}Cost              : ${summary['cost_usd']:.4f}",
+        f"{indent}Tokens per solved : {per_solved(summary['tokens_per_solved'], '{:.0f}')}",
+        f"{indent}Cost per solved   : {per_solved(summary['cost_per_solved'], '${:.5f}')}",
+        f"{indent}Unit latency p50/p95   : {summary['p50_total_s']:.2f}s / {summary['p95_total_s']:.2f}s",
+        f"{indent}LLM latency p50/p95    : {summary['p50_llm_s']:.2f}s / {summary['p95_llm_s']:.2f}s",
+        f"{indent}Sandbox time p50/p95   : {summary['p50_sandbox_s']:.3f}s / {summary['p95_sandbox_s']:.3f}s",
+    ]
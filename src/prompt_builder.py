@@ -0,0 +1,359 @@
+# src/prompt_builder.py
+#
+# Repair prompts under a token budget.
+#
+#   prompt, info = build_repair_prompt(problem, func_name, code, results, static_issues)
+#   info["tokens_saved"]  # vs. the untrimmed prompt repair_code used to send
+#
+# Failures are deduplicated (same error / same kind of wrong answer) and
+# ranked so the top-k most informative ones are shown; lint issues are
+# ranked the same way. If the prompt is still over budget, lint issues go
+# first, then failures, then long input/output reprs are shortened. The
+# current code is never cut. With diff=True the model is asked for a unified
+# diff, which apply_unified_diff() turns back into full code.
+
+import ast
+import re
+
+from src.analyzer import summarize_failures
+from src.config import (
+    REPAIR_MAX_LINT_ISSUES,
+    REPAIR_PROMPT_BUDGET_TOKENS,
+    REPAIR_TOP_K_FAILURES,
+)
+from src.static_analyzer import format_issues
+from src.utils import strip_code_fences
+from src.verdict import describe_expected, failed
+
+# Average characters per token for code and English with BPE tokenizers
+CHARS_PER_TOKEN = 4
+
+# Longest input/output repr shown per failure, and the shortest it may be
+# cut down to when the prompt is over budget
+MAX_REPR_CHARS = 200
+MIN_REPR_CHARS = 40
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (no tokenizer dependency); good enough for budgets."""
+    return -(-len(text or "") // CHARS_PER_TOKEN)
+
+
+def _short(value, limit):
+    text = repr(value)
+    if limit and len(text) > limit:
+        return text[: limit - 3] + "..."
+    return text
+
+
+def _error_signature(error: str) -> str:
+    # Last traceback line with numbers and quoted values blanked, so
+    # "KeyError: 'a'" and "KeyError: 'b'" count as the same failure
+    last = error.strip().splitlines()[-1] if error and error.strip() else ""
+    last = re.sub(r"'[^']*'|\"[^\"]*\"", "'...'", last)
+    return re.sub(r"\d+", "N", last)
+
+
+def rank_failures(results: list) -> list:
+    """
+    Group failing entries by signature and rank the groups, most informative
+    first. Returns a list of (representative entry, group size).
+
+    Ranking: errors before wrong answers (an exception names its cause);
+    within each kind, bigger groups first (one fix covers more tests),
+    then smaller inputs (easier edge cases to reason about).
+    """
+    groups = {}
+    for r in results:
+        if not failed(r):
+            continue
+        if "error" in r:
+            kind = 0
+            sig = ("error", _error_signature(r["error"]))
+        else:
+            kind = 1
+            sig = ("wrong", type(r.get("output")).__name__, type(r.get("expected")).__name__)
+
+        size = len(repr(r.get("input")))
+        if sig not in groups:
+            groups[sig] = [kind, 0, size, r]
+        group = groups[sig]
+        group[1] += 1
+        if size < group[2]:
+            group[2], group[3] = size, r
+
+    ranked = sorted(groups.values(), key=lambda g: (g[0], -g[1], g[2]))
+    return [(entry, count) for _, count, _, entry in ranked]
+
+
+def _failure_line(entry, count, repr_limit):
+    expected = describe_expected(entry) if entry.get("raises") else _short(entry.get("expected"), repr_limit)
+    line = f"- INPUT={_short(entry.get('input'), repr_limit)} | expected={expected}"
+    if "error" in entry:
+        error = entry["error"].strip()
+        if repr_limit and len(error) > repr_limit * 4:
+            # Keep the end of a traceback; that is where the cause is
+            error = "..." + error[-repr_limit * 4:]
+        line += f" | ERROR={error}"
+    else:
+        line += f" | got={_short(entry.get('output'), repr_limit)}"
+    if count > 1:
+        line += f"  (+{count - 1} similar failing tests)"
+    return line
+
+
+def rank_lint_issues(issues: list) -> list:
+    """
+    Deduplicate lint issues by code (keeping the first occurrence and a
+    count) and put pyflakes (F*) and syntax (E9*) problems before style.
+    """
+    by_code = {}
+    for issue in issues:
+        by_code.setdefault(issue["code"], [issue, 0])[1] += 1
+
+    def priority(code):
+        if code.startswith("F") or code.startswith("E9"):
+            return 0
+        if code.startswith("E"):
+            return 1
+        return 2
+
+    ranked = sorted(by_code.values(), key=lambda item: (priority(item[0]["code"]), item[0]["line"]))
+    return [(issue, count) for issue, count in ranked]
+
+
+def _lint_line(issue, count):
+    line = format_issues([issue])
+    if count > 1:
+        line += f"  (+{count - 1} more {issue['code']})"
+    return line
+
+
+def _render(problem_description, func_name, code, failure_details, static_summary, diff):
+    if diff:
+        numbered = "\n".join(f"{n:4d} | {line}" for n, line in enumerate(code.splitlines(), start=1))
+        return f"""
+You are an expert Python developer.
+
+You wrote the following code for this problem:
+
+Problem:
+{problem_description}
+
+Current code (line numbers are for reference only):
+{numbered}
+
+The unit tests produced the following failing cases (if any):
+{failure_details}
+
+The static analysis (flake8) reported:
+{static_summary}
+
+Fix the code by replying with a unified diff against the current code.
+
+Requirements:
+- Keep the function name exactly `{func_name}`.
+- Fix ALL failing tests.
+- Address any static-analysis issues if possible (e.g., unused variables, obvious style problems).
+- Reply with ONLY the diff: `--- a/solution.py`, `+++ b/solution.py`, then `@@` hunks with
+  a few unchanged context lines. No explanations, no markdown.
+        """.strip()
+
+    return f"""
+You are an expert Python developer.
+
+You wrote the following code for this problem:
+
+Problem:
+{problem_description}
+
+Current code:
+{code}
+
+The unit tests produced the following failing cases (if any):
+{failure_details}
+
+The static analysis (flake8) reported:
+{static_summary}
+
+Please provide a corrected version of the full Python code.
+
+Requirements:
+- Keep the function name exactly `{func_name}`.
+- Fix ALL failing tests.
+- Address any static-analysis issues if possible (e.g., unused variables, obvious style problems).
+- Return ONLY valid Python code. No explanations, no markdown, no comments.
+        """.strip()
+
+
+def build_repair_prompt(
+    problem_description: str,
+    func_name: str,
+    code: str,
+    results: list,
+    static_issues: list,
+    budget_tokens: int = REPAIR_PROMPT_BUDGET_TOKENS,
+    top_k: int = REPAIR_TOP_K_FAILURES,
+    max_lint: int = REPAIR_MAX_LINT_ISSUES,
+    diff: bool = False,
+):
+    """
+    Build the repair prompt for `code` within `budget_tokens` (estimated).
+
+    Returns (prompt, info) where info has:
+      - tokens:          estimated tokens of the returned prompt
+      - full_tokens:     estimated tokens of the untrimmed full-code prompt
+                         (every failure and lint issue, as before)
+      - tokens_saved:    full_tokens - tokens (never negative)
+      - failures_shown / failures_total, lint_shown / lint_total
+      - over_budget:     True if even the minimal prompt exceeds the budget
+    """
+    failures = rank_failures(results)
+    lint = rank_lint_issues(static_issues or [])
+
+    full_prompt = _render(
+        problem_description,
+        func_name,
+        code,
+        summarize_failures(results),
+        format_issues(static_issues) if static_issues else "No static-analysis issues found.",
+        diff=False,
+    )
+
+    n_failures = min(len(failures), max(1, top_k)) if failures else 0
+    n_lint = min(len(lint), max_lint)
+    repr_limit = MAX_REPR_CHARS
+
+    def render():
+        failure_details = (
+            "\n".join(_failure_line(e, c, repr_limit) for e, c in failures[:n_failures])
+            if failures
+            else "All tests passed."
+        )
+        hidden = len(failures) - n_failures
+        if hidden > 0:
+            failure_details += f"\n- ... {hidden} more distinct failures not shown"
+
+        if n_lint:
+            static_summary = "\n".join(_lint_line(i, c) for i, c in lint[:n_lint])
+        elif lint:
+            static_summary = f"{len(static_issues)} minor issues (not shown)."
+        else:
+            static_summary = "No static-analysis issues found."
+        return _render(problem_description, func_name, code, failure_details, static_summary, diff)
+
+    prompt = render()
+    # Shed detail until the prompt fits: lint first, then failures, then reprs
+    while estimate_tokens(prompt) > budget_tokens:
+        if n_lint > 0:
+            n_lint -= 1
+        elif n_failures > 1:
+            n_failures -= 1
+        elif repr_limit > MIN_REPR_CHARS:
+            repr_limit = max(MIN_REPR_CHARS, repr_limit // 2)
+        else:
+            break
+        prompt = render()
+
+    tokens = estimate_tokens(prompt)
+    full_tokens = estimate_tokens(full_prompt)
+    return prompt, {
+        "tokens": tokens,
+        "full_tokens": full_tokens,
+        "tokens_saved": max(0, full_tokens - tokens),
+        "failures_shown": n_failures,
+        "failures_total": len(failures),
+        "lint_shown": n_lint,
+        "lint_total": len(lint),
+        "over_budget": tokens > budget_tokens,
+    }
+
+
+# --- unified diffs -----------------------------------------------------------
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class DiffError(ValueError):
+    """The model's reply is not a unified diff that applies to the code."""
+
+
+def _parse_hunks(diff_text):
+    hunks = []
+    current = None
+    for line in diff_text.splitlines():
+        m = _HUNK_RE.match(line)
+        if m:
+            current = {"start": int(m.group(1)), "old": [], "new": []}
+            hunks.append(current)
+            continue
+        if current is None or line.startswith(("--- ", "+++ ")):
+            continue
+        if line.startswith("\\"):  # "\ No newline at end of file"
+            continue
+        tag, text = (line[:1], line[1:]) if line else (" ", "")
+        if tag == " ":
+            current["old"].append(text)
+            current["new"].append(text)
+        elif tag == "-":
+            current["old"].append(text)
+        elif tag == "+":
+            current["new"].append(text)
+        else:
+            raise DiffError(f"Unexpected diff line: {line[:60]!r}")
+    if not hunks:
+        raise DiffError("No @@ hunks found")
+    return hunks
+
+
+def _find(lines, block, hint):
+    """Position of `block` in `lines`, searching outward from `hint`."""
+    if not block:
+        return min(max(hint, 0), len(lines))
+    stripped = [b.rstrip() for b in block]
+    for distance in range(max(hint, len(lines) - hint) + 1):
+        for pos in (hint - distance, hint + distance):
+            if 0 <= pos <= len(lines) - len(block):
+                if [l.rstrip() for l in lines[pos:pos + len(block)]] == stripped:
+                    return pos
+    return None
+
+
+def apply_unified_diff(code: str, diff_text: str) -> str:
+    """
+    Apply a unified diff to `code`. Hunks are located by their context and
+    removed lines (the line numbers are only a starting hint, since models
+    often get them slightly wrong); trailing whitespace is ignored when
+    matching. Raises DiffError if a hunk does not apply.
+    """
+    lines = code.splitlines()
+    offset = 0
+    for hunk in _parse_hunks(strip_code_fences(diff_text)):
+        pos = _find(lines, hunk["old"], hunk["start"] - 1 + offset)
+        if pos is None:
+            raise DiffError(f"Hunk at line {hunk['start']} does not match the current code")
+        lines[pos:pos + len(hunk["old"])] = hunk["new"]
+        offset += len(hunk["new"]) - len(hunk["old"])
+    return "\n".join(lines) + "\n"
+
+
+def code_from_reply(reply: str, current_code: str, diff: bool):
+    """
+    Turn a repair reply into code. In diff mode the reply is applied as a
+    unified diff; a reply that is not a diff but parses as Python and
+    defines a function is taken as full code. Returns None if a diff-mode reply is unusable.
+    """
+    if not diff:
+        return reply
+    try:
+        return apply_unified_diff(current_code, reply)
+    except DiffError:
+        pass
+    candidate = strip_code_fences(reply)
+    try:
+        tree = ast.parse(candidate)
+    except (SyntaxError, ValueError):
+        return None
+    if not any(isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) for node in tree.body):
+        return None  # prose that happens to parse, e.g. a single word
+    return candidate
@@ -1,14 +1,53 @@
 # src/repair_loop.py
 
-from groq import Groq
+import contextvars
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from src.config import GROQ_API_KEY, MODEL_NAME
-from src.test_runner import run_tests
-from src.analyzer import analyze_results, summarize_failures
+from src.config import (
+    MODEL_NAME,
+    REPAIR_DETECT_CONVERGENCE,
+    REPAIR_DIFF_MODE,
+    REPAIR_ESCALATION,
+    REPAIR_ESCALATION_MODEL,
+    REPAIR_ESCALATION_TEMPERATURE,
+    REPAIR_STAGNATION_PATIENCE,
+    SPECULATIVE_TEMPERATURES,
+)
+from src.llm_client import _add_usage, complete
+from src import tracing
+from src.tracing import span
+from src.result_cache import code_fingerprint
+from src.test_runner import run_tests, run_tests_adaptive
+from src.analyzer import analyze_results
+from src.prompt_builder import build_repair_prompt, code_from_reply
 from src.static_analyzer import run_static_analysis
+from src.agent_reviewer import review_code
+from src.test_history import entry_failed, test_history
 
+# Values of stats["stop_reason"]
+STOP_REASONS = ("passed", "max_iters", "cycle", "stagnation")
 
-client = Groq(api_key=GROQ_API_KEY)
+
+def failure_signature(results: list, static_issues: list) -> str:
+    """
+    Hash of what is wrong with a candidate: which tests fail and how (error
+    type or wrong output), plus the lint codes. Two candidates with the same
+    signature give the model the same feedback.
+    """
+    parts = []
+    for r in results:
+        if not entry_failed(r):
+            continue
+        if "error" in r:
+            last = r["error"].strip().splitlines()[-1] if r["error"].strip() else ""
+            outcome = "error:" + last.split(":", 1)[0]
+        else:
+            outcome = "output:" + repr(r.get("output"))
+        parts.append(f"{r.get('input')!r}->{outcome}")
+    parts += sorted(issue["code"] for issue in static_issues or [])
+    return hashlib.sha256("\n".join(sorted(parts)).encode("utf-8")).hexdigest()
 
 
 def repair_code(
@@ -17,6 +56,12 @@ def repair_code(
     initial_code: str,
     tests: list,
     max_iters: int = 3,
+    seed=None,
+    speculative_k: int = 1,
+    temperatures: list = None,
+    stats: dict = None,
+    diff: bool = None,
+    escalation: list = None,
 ):
     """
     Iteratively repairs code using BOTH test feedback and static-analysis feedback.
@@ -27,68 +72,263 @@ def repair_code(
         initial_code: First version of the code from the LLM.
         tests: List of test-case dicts (input/expected/etc.).
         max_iters: Maximum number of repair iterations.
+        seed: Run identifier used to key the LLM response cache.
+        speculative_k: Repair completions fired concurrently per iteration.
+            With k > 1 each branch is tested as soon as it arrives and the
+            first one that passes all tests wins; otherwise the branch with
+            the fewest failing tests is carried into the next iteration.
+        temperatures: Sampling temperature per branch (cycled); defaults to
+            SPECULATIVE_TEMPERATURES. Branch 0 always matches the normal
+            single-completion request.
+        stats: Optional dict filled in with token usage ("prompt_tokens",
+            "completion_tokens", "calls", "cache_hits") and, in speculative
+            mode, one "speculative" entry per iteration naming the winning
+            branch. "prompt_tokens_saved" adds up what the prompt budgeter
+            trimmed compared with the untrimmed prompt.
+        diff: Ask the model for a unified diff instead of the full code
+            (defaults to REPAIR_DIFF_MODE). A reply that is neither a diff
+            that applies nor valid Python falls back to a full-code request.
+        escalation: What to try, in order, when the loop stops converging
+            (defaults to REPAIR_ESCALATION): "temperature" (sample hotter,
+            fresh cache key), "reviewer" (one review_code pass instead of a
+            repair) and "model" (REPAIR_ESCALATION_MODEL for the remaining
+            repairs). The loop is not converging when a candidate repeats an
+            earlier one (cycle) or keeps the same failure signature for
+            REPAIR_STAGNATION_PATIENCE iterations (stagnation); with no
+            escalation step left it stops early. stats["stop_reason"] is one
+            of STOP_REASONS and stats["escalations"] lists the steps taken.
+            stats["candidates"] lists the code each iteration produced, in
+            order (kept by the artifact store, see src/artifact_store.py).
 
     Returns:
         (final_code: str, final_results: list[dict], iterations_used: int)
+        final_results has one entry per test (iterations may test only the
+        historically failing ones, see run_tests_adaptive).
     """
+    if stats is None:
+        stats = {}
+    if diff is None:
+        diff = REPAIR_DIFF_MODE
+    ladder = list(REPAIR_ESCALATION if escalation is None else escalation)
+    stats["escalations"] = []
+    stats["candidates"] = []
+    model = MODEL_NAME
+    temperature = 0.2
+    repair_seed = seed
     current_code = initial_code
     iterations = 0
+    previous_fingerprint = None
+    results = None
+    seen = set()  # fingerprints of every candidate tested so far
+    previous_signature = None
+    stagnant = 0
 
     for i in range(max_iters):
         iterations = i + 1
 
-        # 1) Run tests on current version
-        results = run_tests(current_code, tests, func_name)
+        # 1) Run tests on current version, historically failing tests first
+        #    (the full suite only runs once those pass). If the model handed
+        #    back the same program as last iteration (modulo formatting),
+        #    reuse its results.
+        fingerprint = code_fingerprint(current_code)
+        if fingerprint != previous_fingerprint:
+            results = run_tests_adaptive(current_code, tests, func_name)
+        previous_fingerprint = fingerprint
         all_passed, _ = analyze_results(results)
 
-        # 2) Collect detailed failure info (even if we might stop)
-        failure_details = summarize_failures(results)
-
-        # 3) Run static analysis (flake8) on current version
+        # 2) Run static analysis (pyflakes/pycodestyle, in-process) on current version
         static_issues = run_static_analysis(current_code)
-        static_summary = (
-            "\n".join(static_issues) if static_issues else "No static-analysis issues found."
-        )
 
-        # 4) If tests pass and no static issues, we are done
+        # 3) If tests pass and no static issues, we are done
         if all_passed and not static_issues:
+            stats["stop_reason"] = "passed"
             return current_code, results, iterations
 
-        # 5) Build a rich repair prompt using both sources
-        prompt = f"""
-You are an expert Python developer.
+        # 4) Convergence: a repeated candidate or an unchanged failure set
+        #    means another identical request is unlikely to help
+        use_reviewer = False
+        if REPAIR_DETECT_CONVERGENCE:
+            signature = failure_signature(results, static_issues)
+            stagnant = stagnant + 1 if signature == previous_signature else 0
+            previous_signature = signature
+            event = None
+            if fingerprint in seen:
+                event = "cycle"
+            elif stagnant >= REPAIR_STAGNATION_PATIENCE:
+                event = "stagnation"
+            seen.add(fingerprint)
 
-You wrote the following code for this problem:
+            if event:
+                if not ladder:
+                    stats["stop_reason"] = event
+                    return current_code, _full_suite(current_code, tests, func_name, results), iterations
+                step = ladder.pop(0)
+                stats["escalations"].append(step)
+                stagnant = 0
+                if step == "temperature":
+                    temperature = REPAIR_ESCALATION_TEMPERATURE
+                    repair_seed = f"{seed}/escalated"
+                elif step == "reviewer":
+                    use_reviewer = True
+                elif step == "model":
+                    model = REPAIR_ESCALATION_MODEL
+                    repair_seed = f"{seed}/{model}"
 
-Problem:
-{problem_description}
+        if use_reviewer:
+            current_code = review_code(problem_description, func_name, current_code, seed=f"{seed}/escalated", usage=stats)
+            stats["candidates"].append(current_code)
+            continue
 
-Current code:
-{current_code}
+        # 5) Build the repair prompt from both sources, within the token
+        #    budget (deduplicated, top-k failures; see src/prompt_builder.py)
+        prompt, prompt_info = build_repair_prompt(
+            problem_description, func_name, current_code, results, static_issues, diff=diff
+        )
+        fallback_prompt = None
+        if diff:
+            fallback_prompt, _ = build_repair_prompt(
+                problem_description, func_name, current_code, results, static_issues
+            )
+        stats["prompt_tokens_saved"] = stats.get("prompt_tokens_saved", 0) + prompt_info["tokens_saved"]
+        tracing.add_count("prompt_tokens_saved", prompt_info["tokens_saved"])
 
-The unit tests produced the following failing cases (if any):
-{failure_details}
+        if speculative_k > 1:
+            current_code, branch_info = _speculative_repair(
+                prompt, fallback_prompt, current_code, diff, func_name, tests,
+                speculative_k, temperatures, repair_seed, stats, model, temperature,
+            )
+            branch_info["iteration"] = iterations
+            stats.setdefault("speculative", []).append(branch_info)
+            stats["candidates"].append(current_code)
+            continue
 
-The static analysis (flake8) reported:
-{static_summary}
+        with span("llm.repair", iteration=iterations):
+            current_code = _request_repair(
+                prompt, fallback_prompt, current_code, diff, temperature=temperature, seed=repair_seed,
+                usage=stats, model=model,
+            )
+        stats["candidates"].append(current_code)
 
-Please provide a corrected version of the full Python code.
+    # After max_iters, run the whole suite one more time and return whatever we have
+    final_results = run_tests(current_code, tests, func_name)
+    test_history.record(func_name, tests, final_results)
+    stats["stop_reason"] = "max_iters"
+    return current_code, final_results, iterations
 
-Requirements:
-- Keep the function name exactly `{func_name}`.
-- Fix ALL failing tests.
-- Address any static-analysis issues if possible (e.g., unused variables, obvious style problems).
-- Return ONLY valid Python code. No explanations, no markdown, no comments.
-        """.strip()
 
-        resp = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
+def _request_repair(prompt, fallback_prompt, current_code, diff, temperature, seed, usage, model=MODEL_NAME):
+    # One repair completion turned into code; in diff mode an unusable
+    # reply is followed by a single full-code request
+    reply = complete(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        seed=seed,
+        usage=usage,
+    )
+    code = code_from_reply(reply, current_code, diff)
+    if code is None:
+        code = complete(
+            model=model,
+            messages=[{"role": "user", "content": fallback_prompt}],
+            temperature=temperature,
+            seed=seed,
+            usage=usage,
         )
+    return code
 
-        current_code = resp.choices[0].message.content
 
-    # After max_iters, run tests one more time and return whatever we have
-    final_results = run_tests(current_code, tests, func_name)
-    return current_code, final_results, iterations
+def _full_suite(code, tests, func_name, results):
+    # run_tests_adaptive returns only the failing-first subset when that
+    # fails; the results handed back to callers cover every test
+    if len(results) == len(tests):
+        return results
+    return run_tests(code, tests, func_name)
+
+
+def _speculative_repair(
+    prompt, fallback_prompt, current_code, diff, func_name, tests, k, temperatures, seed, usage,
+    model=MODEL_NAME, base_temperature=0.2,
+):
+    """
+    Run k repair branches concurrently. Each branch requests a completion
+    and runs the full test suite on it; the first branch whose tests all
+    pass wins. The other branches are then cancelled: a branch checks for
+    that before its LLM request and before its sandbox run, and one already
+    inside either finishes it and stops. Otherwise the branch with the
+    fewest failing tests wins. The winner returns without waiting for the
+    others; every branch's token usage, abandoned ones included, is added
+    to `usage` when that branch finishes, which may be after this returns.
+    Returns (code, info) where info names the winning branch.
+    """
+    temperatures = temperatures or SPECULATIVE_TEMPERATURES
+    temps = [base_temperature] + [temperatures[b % len(temperatures)] for b in range(1, k)]
+    stop = threading.Event()
+    branch_usage = [{} for _ in range(k)]
+
+    def branch(b):
+        if stop.is_set():
+            return None
+        with span("llm.repair", branch=b):
+            code = _request_repair(
+                prompt,
+                fallback_prompt,
+                current_code,
+                diff,
+                temperature=temps[b],
+                seed=seed if b == 0 else f"{seed}/branch{b}",
+                usage=branch_usage[b],
+                model=model,
+            )
+        if stop.is_set():
+            return None
+        # Full suite (not the failing-first subset) so failure counts are comparable
+        results = run_tests(code, tests, func_name)
+        test_history.record(func_name, tests, results)
+        passed, _ = analyze_results(results)
+        failures = sum(1 for r in results if entry_failed(r))
+        return code, passed, failures
+
+    pool = ThreadPoolExecutor(max_workers=k)
+    # Each branch runs in a copy of this context so its spans reach our tracer
+    futures = {pool.submit(contextvars.copy_context().run, branch, b): b for b in range(k)}
+    for fut, b in futures.items():
+        fut.add_done_callback(lambda _, spent=branch_usage[b]: _add_usage(usage, **spent))
+    best = None  # (failures, branch, code)
+    passed_branch = None
+    completed = 0
+    last_error = None
+
+    try:
+        for fut in as_completed(futures):
+            b = futures[fut]
+            try:
+                outcome = fut.result()
+            except Exception as e:
+                last_error = e
+                continue
+            if outcome is None:
+                continue
+            code, passed, failures = outcome
+            completed += 1
+            if best is None or (failures, b) < best[:2]:
+                best = (failures, b, code)
+            if passed:
+                passed_branch = b
+                best = (failures, b, code)
+                break
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if best is None:
+        raise last_error
+
+    _, winner, code = best
+    return code, {
+        "winner_branch": winner,
+        "winner_temperature": temps[winner],
+        "passed": passed_branch is not None,
+        "branches_completed": completed,
+        "branches_abandoned": k - completed,
+    }
@@ -0,0 +1,99 @@
+# src/result_cache.py
+
+import ast
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from src.config import RESULT_CACHE_MAX_ENTRIES
+
+
+def normalize_code(code: str) -> str:
+    """
+    Canonical form of a candidate for caching: the AST dump, so formatting,
+    comments and blank lines do not matter. Code that does not parse is
+    used as-is (stripped).
+    """
+    try:
+        return ast.dump(ast.parse(code or ""))
+    except (SyntaxError, ValueError):
+        return (code or "").strip()
+
+
+def code_fingerprint(code: str) -> str:
+    """Hash of the normalized code; equal for whitespace/comment-only changes."""
+    return hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+
+
+def test_results_key(code: str, tests: list, func_name: str) -> str:
+    tests_blob = json.dumps(tests, sort_keys=True, default=repr)
+    payload = "\0".join([code_fingerprint(code), func_name, tests_blob])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def lint_key(code: str) -> str:
+    # flake8 reports whitespace/style issues, so lint results key on the exact text
+    return hashlib.sha256((code or "").encode("utf-8")).hexdigest()
+
+
+class BoundedCache:
+    """
+    Thread-safe LRU mapping with a fixed maximum size and hit/miss counters.
+    Values are deep-copied in and out so callers can mutate what they get.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return copy.deepcopy(self._data[key])
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = copy.deepcopy(value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+test_results_cache = BoundedCache()
+lint_cache = BoundedCache()
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters for both result caches."""
+    return {"tests": test_results_cache.stats(), "lint": lint_cache.stats()}
+
+
+def print_cache_stats():
+    """One summary line with the hit rates of this process's result caches."""
+    parts = []
+    for name, s in cache_stats().items():
+        lookups = s["hits"] + s["misses"]
+        rate = s["hits"] / lookups if lookups else 0.0
+        parts.append(f"{name} {s['hits']}/{lookups} hits ({rate:.0%})")
+    print("Result caches: " + ", ".join(parts))
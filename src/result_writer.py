@@ -0,0 +1,120 @@
+# src/result_writer.py
+
+import csv
+import os
+import threading
+
+
+class ResultWriter:
+    """
+    Append-only CSV writer for experiment sweeps.
+
+    Every row is flushed and fsync'd as soon as it is written, so a crash or
+    Ctrl-C loses at most the unit that was in flight. The rows already on
+    disk double as the checkpoint index: with resume=True the writer loads
+    the (key_fields) of every recorded row and callers skip those units via
+    is_done().
+
+    Rows are appended in completion order; call finalize() at the end of a
+    sweep to rewrite the file in a deterministic order.
+    """
+
+    def __init__(self, path: str, fieldnames: list, key_fields: list, resume: bool = False):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.key_fields = list(key_fields)
+        self._done = set()
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if resume and os.path.exists(path) and self._load_existing():
+            self._file = open(path, "a", newline="")
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+        else:
+            self._file = open(path, "w", newline="")
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+            self._writer.writeheader()
+            self._sync()
+
+    def _load_existing(self) -> bool:
+        # Drop a half-written last line left behind by a crash
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+            if b"\n" not in data:
+                return False
+
+        with open(self.path, "r", newline="") as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames != self.fieldnames:
+                raise ValueError(
+                    f"Cannot resume {self.path}: its columns {reader.fieldnames} "
+                    f"do not match the current ones {self.fieldnames}"
+                )
+            for row in reader:
+                self._done.add(self._key(row))
+        return True
+
+    def _key(self, row) -> tuple:
+        # CSV round-trips everything as text, so compare keys as strings
+        return tuple(str(row[k]) for k in self.key_fields)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def is_done(self, **key) -> bool:
+        return self._key(key) in self._done
+
+    @property
+    def completed(self) -> int:
+        return len(self._done)
+
+    def rows(self) -> list:
+        """Every row on disk so far (values as CSV strings)."""
+        with self._lock:
+            self._file.flush()
+            with open(self.path, "r", newline="") as f:
+                return list(csv.DictReader(f))
+
+    def write(self, row: dict):
+        with self._lock:
+            self._writer.writerow(row)
+            self._sync()
+            self._done.add(self._key(row))
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def finalize(self, sort_key=None):
+        """
+        Close the writer and, if sort_key is given, atomically rewrite the
+        file with its rows sorted by sort_key(row) (rows are CSV strings).
+        """
+        self.close()
+        if sort_key is None:
+            return
+
+        with open(self.path, "r", newline="") as f:
+            rows = list(csv.DictReader(f))
+        rows.sort(key=sort_key)
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,369 @@
+# src/sandbox.py
+
+import atexit
+import os
+import pickle
+import queue
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from src.config import (
+    SANDBOX_CPU_S,
+    SANDBOX_MAX_JOBS_PER_WORKER,
+    SANDBOX_MEMORY_MB,
+    SANDBOX_MODE,
+    SANDBOX_POOL_SIZE,
+    SANDBOX_PRELOAD,
+    SANDBOX_SECCOMP,
+    SANDBOX_PROGRESS_INTERVAL_S,
+    SANDBOX_TEST_CHUNK_SIZE,
+    SANDBOX_TEST_CPU_S,
+    SANDBOX_TEST_TIMEOUT_S,
+    SANDBOX_TIMEOUT_S,
+)
+from src.result_protocol import dumps, encode_frame, safe_loads, split_frame
+from src.tracing import span
+from src.verdict import CANDIDATE_ERROR, restore_entries
+
+WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+
+
+class SandboxError(Exception):
+    """Raised when a sandbox worker dies or stops answering."""
+
+
+class SandboxTimeout(SandboxError):
+    pass
+
+
+class SandboxWorker:
+    """
+    One pre-warmed `python3 sandbox_worker.py` process.
+    Jobs go in and replies come back as length-prefixed pickle frames
+    (src/result_protocol.py) on the worker's stdin/stdout pipes.
+
+    fork_server: start it as a zygote that pre-imports `preload` and forks
+    a child per candidate (see Zygote in src/sandbox_worker.py).
+    """
+
+    def __init__(
+        self,
+        memory_limit_mb: int = SANDBOX_MEMORY_MB,
+        start_timeout: float = 10.0,
+        fork_server: bool = False,
+        preload: list = (),
+        seccomp: bool = False,
+    ):
+        args = [sys.executable, WORKER_PATH, str(memory_limit_mb)]
+        if fork_server:
+            args.append("--fork-server")
+            if preload:
+                args += ["--preload", ",".join(preload)]
+            if seccomp:
+                args.append("--seccomp")
+        self.fork_server = fork_server
+        with span("sandbox.spawn"):
+            self.proc = subprocess.Popen(
+                args,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            self.jobs_done = 0
+            self.retire = False  # set when a candidate left state behind
+            self._buffer = bytearray()
+            self.read_reply(time.monotonic() + start_timeout)
+
+    def send(self, job: dict):
+        try:
+            self.proc.stdin.write(encode_frame(dumps(job)))
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError):
+            raise SandboxError(self._death_reason())
+
+    def read_reply(self, deadline: float) -> dict:
+        fd = self.proc.stdout.fileno()
+        while True:
+            payload, self._buffer = split_frame(self._buffer)
+            if payload is not None:
+                # Replies may carry arbitrary candidate outputs; only plain
+                # data types are allowed through
+                try:
+                    return safe_loads(payload)
+                except (pickle.UnpicklingError, EOFError, ValueError) as e:
+                    raise SandboxError(f"Malformed reply from sandbox worker: {e}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise SandboxTimeout("Timeout: sandbox worker did not answer in time")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 1 << 20)
+            if not chunk:
+                raise SandboxError(self._death_reason())
+            self._buffer += chunk
+
+    def _death_reason(self) -> str:
+        try:
+            code = self.proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            return "Sandbox worker stopped responding"
+        if code < 0:
+            try:
+                name = signal.Signals(-code).name
+            except ValueError:
+                name = str(-code)
+            return f"Sandbox worker killed by {name} (CPU/memory limit or crash)"
+        return f"Sandbox worker exited with code {code}"
+
+    def kill(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        for stream in (self.proc.stdin, self.proc.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+class SandboxPool:
+    """
+    Fixed-size pool of reusable sandbox workers.
+
+    Each candidate runs in a fresh module namespace inside a warm interpreter,
+    under a per-test wall/CPU limit and a total per-candidate `timeout`
+    budget; tests that hit a limit come back as entries with a "timeout"
+    key ("wall", "cpu" or "budget") instead of sinking the whole run.
+    A worker that crashes, hits its CPU/memory rlimit or stops answering is
+    killed and replaced; so is a worker after a candidate that timed out or
+    left threads or signal handlers behind, before the next candidate runs
+    on it. Workers are also recycled after `max_jobs_per_worker` candidates
+    so state leaked through sys.modules cannot build up. Thread-safe.
+
+    mode "forkserver" (SANDBOX_MODE) makes every worker a zygote: each
+    candidate runs in its own forked child with the common stdlib already
+    imported, so there is nothing to recycle and a child that hits a hard
+    limit only fails its own candidate. It also serves run_script.
+    """
+
+    # Extra wall time the pool waits past the in-worker candidate budget
+    # before it assumes the worker is wedged (e.g. stuck in C code) and kills it
+    KILL_GRACE_S = 2.0
+
+    def __init__(
+        self,
+        size: int = SANDBOX_POOL_SIZE,
+        timeout: float = SANDBOX_TIMEOUT_S,
+        test_timeout_s: float = SANDBOX_TEST_TIMEOUT_S,
+        test_cpu_s: float = SANDBOX_TEST_CPU_S,
+        memory_limit_mb: int = SANDBOX_MEMORY_MB,
+        cpu_limit_s: int = SANDBOX_CPU_S,
+        max_jobs_per_worker: int = SANDBOX_MAX_JOBS_PER_WORKER,
+        chunk_size: int = SANDBOX_TEST_CHUNK_SIZE,
+        progress_interval_s: float = SANDBOX_PROGRESS_INTERVAL_S,
+        mode: str = SANDBOX_MODE,
+        preload: list = SANDBOX_PRELOAD,
+        seccomp: bool = SANDBOX_SECCOMP,
+    ):
+        if mode not in ("pool", "forkserver"):
+            raise ValueError(f"Unknown sandbox mode {mode!r}")
+        self.timeout = timeout
+        self.test_timeout_s = test_timeout_s
+        self.test_cpu_s = test_cpu_s
+        self.memory_limit_mb = memory_limit_mb
+        self.cpu_limit_s = cpu_limit_s
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.chunk_size = chunk_size
+        self.progress_interval_s = progress_interval_s
+        self.fork_server = mode == "forkserver"
+        self.preload = list(preload)
+        self.seccomp = seccomp
+        self._idle = queue.Queue()
+
+        for _ in range(max(1, size)):
+            self._idle.put(self._new_worker())
+
+    def _new_worker(self) -> SandboxWorker:
+        return SandboxWorker(
+            self.memory_limit_mb,
+            fork_server=self.fork_server,
+            preload=self.preload,
+            seccomp=self.seccomp,
+        )
+
+    def run_tests(self, code: str, tests: list, func_name: str, fail_fast: bool = False, on_progress=None) -> list:
+        def report(i, done, total):
+            on_progress(done, total)
+
+        return self.run_batch(
+            [(code, tests, func_name)],
+            fail_fast=fail_fast,
+            on_progress=report if on_progress else None,
+        )[0]
+
+    def run_batch(self, candidates: list, fail_fast: bool = False, on_progress=None) -> list:
+        """
+        Evaluate many (code, tests, func_name) candidates in one worker.
+
+        Each candidate gets its own namespace and its own `timeout`, so an
+        infinite loop only fails that candidate. Returns one result list per
+        candidate, in input order. If the worker dies mid-batch, the
+        candidate it was running is charged with the error and the rest
+        continue on a fresh worker.
+
+        fail_fast: stop each candidate at its first failing test; use it when
+        only the pass/fail verdict is needed.
+
+        on_progress: optional callback(candidate_index, tests_done, tests_total),
+        called from this thread each time the worker streams back a chunk of
+        finished tests (every `chunk_size` tests or `progress_interval_s`
+        seconds) and once when a candidate completes.
+        """
+        outcomes = [None] * len(candidates)
+        pending = list(range(len(candidates)))
+        partial = {}  # candidate index -> entries streamed so far
+
+        while pending:
+            try:
+                worker = self._acquire()
+            except SandboxError as e:
+                for i in pending:
+                    outcomes[i] = _sandbox_error(str(e))
+                break
+
+            job = {
+                "candidates": [
+                    {"code": code, "tests": tests, "func_name": func_name}
+                    for code, tests, func_name in (candidates[i] for i in pending)
+                ],
+                "limits": {
+                    "budget_s": self.timeout,
+                    "test_timeout_s": self.test_timeout_s,
+                    "test_cpu_s": self.test_cpu_s,
+                    "cpu_limit_s": self.cpu_limit_s,
+                    "fail_fast": fail_fast,
+                    "chunk_size": self.chunk_size,
+                    "progress_interval_s": self.progress_interval_s if on_progress else 0,
+                },
+            }
+
+            try:
+                with span("sandbox.exec", candidates=len(pending)):
+                    self._exchange(worker, job, pending, outcomes, partial, candidates, on_progress)
+            except SandboxError as e:
+                worker.kill()
+                self._idle.put(None)  # replaced lazily by the next caller
+                unanswered = [i for i in pending if outcomes[i] is None]
+                # Keep whatever tests the failed candidate finished before the error
+                outcomes[unanswered[0]] = partial.pop(unanswered[0], []) + _sandbox_error(str(e))
+                pending = unanswered[1:]
+                continue
+            except BaseException:
+                worker.kill()
+                self._idle.put(None)
+                raise
+
+            self._release(worker)
+            # A worker that retires ends the batch early; the rest start over
+            pending = [i for i in pending if outcomes[i] is None]
+
+        return outcomes
+
+    def run_script(self, code: str, timeout: float, cpu_limit_s: int = 0, memory_limit_mb: int = 0) -> dict:
+        """
+        Run a standalone script in a forked child of a zygote (forkserver
+        mode only). Returns {"stdout", "stderr", "timed_out", "returncode"}.
+        """
+        if not self.fork_server:
+            raise SandboxError("run_script needs the forkserver sandbox mode")
+        worker = self._acquire()
+        job = {
+            "script": code,
+            "limits": {"timeout_s": timeout, "cpu_limit_s": cpu_limit_s, "memory_limit_mb": memory_limit_mb},
+        }
+        try:
+            with span("sandbox.exec", script=True):
+                worker.send(job)
+                reply = worker.read_reply(time.monotonic() + timeout + self.KILL_GRACE_S)
+        except BaseException:
+            worker.kill()
+            self._idle.put(None)
+            raise
+        self._release(worker)
+        return reply
+
+    def _exchange(self, worker, job, pending, outcomes, partial, candidates, on_progress):
+        # Send one batch job and collect streamed chunks and per-candidate
+        # results until "done". Chunks do not extend a candidate's deadline.
+        worker.send(job)
+        deadline = time.monotonic() + self.timeout + self.KILL_GRACE_S
+        while True:
+            reply = worker.read_reply(deadline)
+            if reply.get("done"):
+                worker.retire = reply.get("retire", False)
+                return
+
+            i = pending[reply["index"]]
+            # Passing tests arrive compacted to their verdict; their input
+            # and expected value come back from the test list
+            done = len(partial.get(i, ()))
+            if "chunk" in reply:
+                partial.setdefault(i, []).extend(restore_entries(reply["chunk"], candidates[i][1], done))
+                if on_progress is not None:
+                    on_progress(i, len(partial[i]), len(candidates[i][1]))
+                continue
+
+            outcomes[i] = partial.pop(i, []) + restore_entries(reply["results"], candidates[i][1], done)
+            worker.jobs_done += 1
+            deadline = time.monotonic() + self.timeout + self.KILL_GRACE_S
+            if on_progress is not None:
+                on_progress(i, len(outcomes[i]), len(candidates[i][1]))
+
+    def _acquire(self) -> SandboxWorker:
+        worker = self._idle.get()
+        if worker is not None:
+            return worker
+        try:
+            return self._new_worker()
+        except (OSError, SandboxError) as e:
+            self._idle.put(None)
+            raise SandboxError(f"Could not start sandbox worker: {e}")
+
+    def _release(self, worker: SandboxWorker):
+        # A zygote never runs candidate code itself, so it never needs recycling
+        if not worker.fork_server and (worker.retire or worker.jobs_done >= self.max_jobs_per_worker):
+            worker.kill()
+            worker = None
+        self._idle.put(worker)
+
+    def close(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.kill()
+
+
+def _sandbox_error(message: str) -> list:
+    return [{"error": message, "input": None, "expected": None, "sandbox_error": True, "verdict": CANDIDATE_ERROR}]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SandboxPool:
+    """Return the process-wide sandbox pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+            atexit.register(_pool.close)
+        return _pool
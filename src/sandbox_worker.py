@@ -0,0 +1,667 @@
+# src/sandbox_worker.py
+#
+# Long-lived sandbox process started by src/sandbox.py.
+# Runs as a standalone script (no `src.` imports) so it starts fast and
+# does not depend on the caller's environment; result_protocol and verdict
+# are imported from this file's own directory.
+#
+# Protocol: length-prefixed pickle frames (src/result_protocol.py) on the
+# original stdin/stdout. A job carries a batch of candidates; the worker
+# streams each candidate's entries back in chunks ({"index": i, "chunk": [...]})
+# while its tests run and ends it with {"index": i, "results": [...rest]};
+# after the last candidate it sends {"done": True}. Outputs keep their Python type
+# and every entry carries its wall time in "duration_s".
+# Each test is judged here (src/verdict.py): entries carry a "verdict" code
+# and passing tests are sent as just that code and their duration.
+# fds 0/1/2 are pointed at /dev/null before any candidate code runs, so
+# prints or input() in generated code cannot corrupt the channel.
+#
+# Limits, innermost first:
+#   - per-test wall clock (SIGALRM) and CPU time (SIGPROF)
+#   - per-candidate wall-clock budget shared by import + all tests
+#   - per-candidate RLIMIT_CPU and per-process RLIMIT_AS as hard backstops
+#     (exceeding those kills the worker; the pool reports and replaces it)
+#
+# A candidate that timed out or left state behind (threads still running,
+# replaced signal handlers) ends the batch early: the "done" frame then
+# carries "retire": True and the pool replaces the worker before the rest
+# of the batch runs.
+#
+# With --fork-server the worker is a zygote instead (see Zygote): it never
+# runs candidate code itself but forks a copy-on-write child per candidate
+# (or per run_python_code script) from a state with the common stdlib
+# modules already imported. The child leads its own process group, which
+# is killed as a whole once the candidate is done, and gets its own
+# rlimits and no_new_privs; a child that hits a hard limit only costs
+# that candidate, not the worker. Only a seccomp binding (python3-seccomp
+# or pyseccomp) stops candidates from starting processes or threads,
+# opening sockets or running programs; without one, rlimits and the
+# process-group kill are all there is (RLIMIT_NPROC does not bind root).
+
+import copy
+import errno
+import gc
+import importlib
+import os
+import pickle
+import resource
+import select
+import signal
+import sys
+import threading
+import time
+import traceback
+
+from result_protocol import dumps, encode_frame, read_frame, safe_loads, split_frame
+from verdict import CANDIDATE_ERROR, PASS, TIMEOUT, UNEXPECTED_ERROR, compact_entry, compile_check
+
+
+class CandidateTimeout(BaseException):
+    """
+    Raised from a timer signal when candidate code runs too long.
+    Derives from BaseException so `except Exception` in generated code
+    cannot swallow it.
+    """
+
+    def __init__(self, kind):
+        super().__init__(kind)
+        self.kind = kind
+
+
+def _on_alarm(signum, frame):
+    raise CandidateTimeout("wall")
+
+
+def _on_prof(signum, frame):
+    raise CandidateTimeout("cpu")
+
+
+def _arm(wall_s, cpu_s=0):
+    if wall_s > 0:
+        signal.setitimer(signal.ITIMER_REAL, wall_s)
+    if cpu_s > 0:
+        signal.setitimer(signal.ITIMER_PROF, cpu_s)
+
+
+def _disarm():
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    signal.setitimer(signal.ITIMER_PROF, 0)
+
+
+def apply_memory_limit(memory_limit_mb):
+    if memory_limit_mb <= 0:
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def apply_cpu_limit(cpu_limit_s):
+    """
+    RLIMIT_CPU counts CPU time for the whole process, so each job gets
+    `cpu_limit_s` seconds on top of what the worker has already used.
+    Exceeding it raises SIGXCPU, which kills the worker; the pool then
+    reports the job as crashed and replaces the worker.
+    """
+    if cpu_limit_s <= 0:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + cpu_limit_s
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def timeout_entry(kind, limit_s, input_value=None, expected_value=None):
+    messages = {
+        "wall": f"Timeout: test exceeded {limit_s}s wall-clock limit",
+        "cpu": f"Timeout: test exceeded {limit_s}s CPU limit",
+        "budget": f"Timeout: candidate time budget of {limit_s}s exhausted",
+    }
+    return {
+        "error": messages[kind],
+        "input": input_value,
+        "expected": expected_value,
+        "timeout": kind,
+        "verdict": TIMEOUT,
+    }
+
+
+def run_candidate(candidate, limits, on_chunk=None):
+    """
+    Execute candidate code in a fresh module namespace and run every test
+    against `func_name`. Mirrors the result dicts the old generated test
+    script produced, plus structured timeout entries.
+
+    With `on_chunk`, finished entries are handed over in order every
+    `chunk_size` tests or `progress_interval_s` seconds, whichever comes
+    first, so large suites never pile up in one reply; the return value
+    is then only the entries not yet handed over.
+
+    limits:
+      - budget_s:       wall-clock budget for import + all tests
+      - test_timeout_s: wall-clock limit per test
+      - test_cpu_s:     CPU-time limit per test
+      - fail_fast:      stop after the first test whose verdict is not a pass
+      - chunk_size, progress_interval_s: see on_chunk above
+    """
+    func_name = candidate["func_name"]
+    budget_s = limits.get("budget_s", 0)
+    test_timeout_s = limits.get("test_timeout_s", 0)
+    test_cpu_s = limits.get("test_cpu_s", 0)
+    deadline = time.monotonic() + budget_s if budget_s > 0 else None
+    chunk_size = limits.get("chunk_size", 0)
+    progress_interval_s = limits.get("progress_interval_s", 0)
+    last_flush = time.monotonic()
+
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+
+    try:
+        _arm(budget_s)
+        exec(compile(candidate["code"], "<candidate>", "exec"), namespace)
+    except CandidateTimeout:
+        # No test ran: the budget went on importing the candidate
+        entry = timeout_entry("budget", budget_s)
+        entry["verdict"] = CANDIDATE_ERROR
+        return [entry]
+    except BaseException:
+        return [{"error": traceback.format_exc(), "input": None, "expected": None, "verdict": CANDIDATE_ERROR}]
+    finally:
+        _disarm()
+
+    results = []
+    tests = candidate["tests"]
+    for n, t in enumerate(tests):
+        input_value = t["input"]
+        expected_value = t.get("expected")
+
+        wall_s = test_timeout_s
+        capped_by_budget = False
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                results.extend(
+                    timeout_entry("budget", budget_s, rest["input"], rest.get("expected"))
+                    for rest in tests[n:]
+                )
+                break
+            if wall_s <= 0 or remaining < wall_s:
+                wall_s = remaining
+                capped_by_budget = True
+
+        try:
+            check = compile_check(t)
+        except Exception as e:
+            results.append(
+                {"error": f"Invalid test spec: {e}", "input": input_value, "expected": expected_value,
+                 "verdict": UNEXPECTED_ERROR, "duration_s": 0.0}
+            )
+            if limits.get("fail_fast"):
+                break
+            continue
+
+        started = time.perf_counter()
+        try:
+            _arm(wall_s, test_cpu_s)
+            func = namespace.get(func_name)
+            if func is None:
+                raise NameError(f"name '{func_name}' is not defined")
+            args = copy.deepcopy(input_value)
+            if t.get("multi_args", False) and isinstance(args, list):
+                output = func(*args)
+            else:
+                output = func(args)
+            # Judged under the same limits: the output's __eq__ is candidate code too
+            verdict = check.returned(output)
+            _disarm()
+            entry = {"input": input_value, "output": output, "expected": expected_value, "verdict": verdict}
+        except CandidateTimeout as e:
+            _disarm()
+            if e.kind == "cpu":
+                entry = timeout_entry("cpu", test_cpu_s, input_value, expected_value)
+            elif capped_by_budget:
+                entry = timeout_entry("budget", budget_s, input_value, expected_value)
+            else:
+                entry = timeout_entry("wall", test_timeout_s, input_value, expected_value)
+        except BaseException as e:
+            _disarm()
+            entry = {
+                "error": str(e),
+                "error_type": type(e).__name__,
+                "input": input_value,
+                "expected": expected_value,
+                "verdict": check.raised(e),
+            }
+
+        entry["duration_s"] = time.perf_counter() - started
+        if check.raises and entry["verdict"] != PASS:
+            entry["raises"] = list(check.raises)
+        results.append(entry)
+
+        if limits.get("fail_fast") and entry["verdict"] != PASS:
+            break
+
+        if on_chunk is not None and n + 1 < len(tests):
+            now = time.monotonic()
+            if (chunk_size > 0 and len(results) >= chunk_size) or (
+                progress_interval_s > 0 and now - last_flush >= progress_interval_s
+            ):
+                on_chunk(results)
+                results = []
+                last_flush = now
+
+    return results
+
+
+# prctl option that stops the child (and anything it could exec) from
+# gaining privileges, e.g. through setuid binaries
+PR_SET_NO_NEW_PRIVS = 38
+
+# Syscalls a fork-server child gets EPERM for when a seccomp binding is
+# installed: no network, no new programs, processes or threads, no leaving
+# its process group, no signals to other processes, no tracing, mounts or
+# namespaces
+SECCOMP_DENY = (
+    "socket", "socketpair", "connect", "bind", "listen", "accept", "accept4",
+    "execve", "execveat", "fork", "vfork", "clone", "clone3", "setsid", "setpgid",
+    "kill", "tkill", "tgkill", "ptrace",
+    "mount", "umount2", "unshare", "setns", "chroot", "pivot_root", "reboot",
+    "swapon", "swapoff", "init_module", "finit_module", "delete_module",
+)
+
+# Most stdout/stderr kept from one script (the rest is read and dropped)
+MAX_SCRIPT_OUTPUT = 16 * 1024 * 1024
+
+
+def _load_prctl():
+    try:
+        import ctypes
+
+        return ctypes.CDLL(None, use_errno=True).prctl
+    except (ImportError, OSError, AttributeError):
+        return None
+
+
+def _load_seccomp():
+    # libseccomp's own bindings, or the pip-installable pyseccomp (same API)
+    for name in ("seccomp", "pyseccomp"):
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            continue
+    return None
+
+
+def _install_seccomp(module):
+    syscall_filter = module.SyscallFilter(defaction=module.ALLOW)
+    for name in SECCOMP_DENY:
+        try:
+            syscall_filter.add_rule(module.ERRNO(errno.EPERM), name)
+        except Exception:
+            pass  # not a syscall on this architecture
+    syscall_filter.load()
+
+
+def _exit_reason(status) -> str:
+    if os.WIFSIGNALED(status):
+        try:
+            name = signal.Signals(os.WTERMSIG(status)).name
+        except ValueError:
+            name = str(os.WTERMSIG(status))
+        return f"Sandbox child killed by {name} (CPU/memory limit or crash)"
+    return f"Sandbox child exited with code {os.waitstatus_to_exitcode(status)} without results"
+
+
+class Zygote:
+    """
+    Fork server: pre-imports `preload`, then runs every candidate or script
+    in a fresh fork of itself. Children inherit the warm interpreter and the
+    imported modules copy-on-write, so starting one costs a fork instead of
+    an interpreter start plus imports, and nothing a candidate does to
+    sys.modules or its process outlives it.
+    """
+
+    # Extra wall time a child gets past its candidate budget before it is killed
+    GRACE_S = 1.0
+    # How often a wait on a child's pipes checks whether the child has exited
+    POLL_S = 0.05
+
+    def __init__(self, preload, seccomp: bool, channels):
+        self.preloaded = []
+        for name in preload:
+            try:
+                importlib.import_module(name)
+                self.preloaded.append(name)
+            except Exception:
+                pass
+        self.channels = channels
+        self.prctl = _load_prctl()
+        self.seccomp = _load_seccomp() if seccomp else None
+        # Keep the preloaded heap out of the children's GC, so collecting
+        # in a child does not touch (and copy) every shared page
+        gc.freeze()
+
+    def _restrict(self, cpu_limit_s, memory_limit_mb=0):
+        # In the child, before any candidate code runs. Its own process
+        # group, so _reap also kills anything the candidate forked
+        os.setsid()
+        for handle in self.channels:
+            os.close(handle.fileno())
+        apply_cpu_limit(cpu_limit_s)
+        if memory_limit_mb > 0:
+            limit = memory_limit_mb * 1024 * 1024
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            if hard != resource.RLIM_INFINITY:
+                limit = min(limit, hard)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        try:
+            # No processes or threads of its own (not enforced for root)
+            resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+        except (ValueError, OSError):
+            pass
+        if self.prctl is not None:
+            self.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0)
+        if self.seccomp is not None:
+            _install_seccomp(self.seccomp)
+
+    def _reap(self, pid, status=None):
+        # Kill the child's whole process group (it may have exited already
+        # and left forked processes behind), then collect the child
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        if status is None:
+            _, status = os.waitpid(pid, 0)
+        return status
+
+    def _exit_status(self, pid):
+        # The child's wait status once it has exited, else None
+        done, status = os.waitpid(pid, os.WNOHANG)
+        return status if done else None
+
+    def run_candidate(self, index, candidate, limits, reply):
+        """
+        Run one candidate in a child and relay its frames to the harness
+        unchanged; the same messages a pool worker would send.
+        """
+        budget_s = limits.get("budget_s", 0)
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            self._candidate_child(w, index, candidate, limits)
+        os.close(w)
+
+        deadline = time.monotonic() + budget_s + self.GRACE_S if budget_s > 0 else None
+        finished, timed_out, status = self._relay(r, pid, index, deadline, reply)
+        os.close(r)
+        status = self._reap(pid, status)
+        if not finished:
+            if timed_out:
+                entry = timeout_entry("budget", budget_s)
+            else:
+                entry = {"error": _exit_reason(status), "input": None, "expected": None, "verdict": CANDIDATE_ERROR}
+            reply(encode_results(index, [entry]))
+
+    def _candidate_child(self, w, index, candidate, limits):
+        exit_code = 1
+        try:
+            out = os.fdopen(w, "wb")
+            self._restrict(limits.get("cpu_limit_s", 0))
+
+            def send(entries, key="results"):
+                out.write(encode_frame(encode_results(index, entries, key)))
+                out.flush()
+
+            try:
+                results = run_candidate(candidate, limits, on_chunk=lambda entries: send(entries, "chunk"))
+            except CandidateTimeout:
+                _disarm()
+                results = [timeout_entry("budget", limits.get("budget_s", 0))]
+            send(results)
+            exit_code = 0
+        finally:
+            os._exit(exit_code)
+
+    def _relay(self, fd, pid, index, deadline, reply):
+        # Forward the child's frames until its final results frame, the end
+        # of the pipe or the child's exit (a process it forked may hold the
+        # pipe open); returns (got its final results, ran out of time, the
+        # child's wait status if it was collected here)
+        buffer = b""
+        status = None
+        while True:
+            remaining = self.POLL_S
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False, True, status
+                remaining = min(remaining, self.POLL_S)
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                if status is not None:
+                    return False, False, status  # exited and nothing left to read
+                status = self._exit_status(pid)
+                continue
+            data = os.read(fd, 1 << 20)
+            if not data:
+                return False, False, status
+            buffer += data
+            while True:
+                payload, buffer = split_frame(buffer)
+                if payload is None:
+                    break
+                try:
+                    message = safe_loads(payload)
+                except Exception:
+                    continue  # not from our driver
+                if not isinstance(message, dict) or message.get("index") != index:
+                    continue
+                reply(payload)
+                if "results" in message:
+                    return True, False, status
+
+    def run_script(self, code, limits) -> dict:
+        """
+        Run a standalone script in a child, like `python3 script.py` with
+        stdin at /dev/null; returns its stdout, stderr and exit status.
+        """
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(out_r)
+            os.close(err_r)
+            self._script_child(code, limits, out_w, err_w)
+        os.close(out_w)
+        os.close(err_w)
+
+        timeout_s = limits.get("timeout_s", 0)
+        deadline = time.monotonic() + timeout_s if timeout_s > 0 else None
+        output = {out_r: bytearray(), err_r: bytearray()}
+        open_fds = [out_r, err_r]
+        timed_out = False
+        status = None
+        while open_fds:
+            remaining = self.POLL_S
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                remaining = min(remaining, self.POLL_S)
+            ready, _, _ = select.select(open_fds, [], [], remaining)
+            if not ready:
+                if status is not None:
+                    break  # the script exited; only processes it forked hold the pipes
+                status = self._exit_status(pid)
+                continue
+            for fd in ready:
+                data = os.read(fd, 1 << 16)
+                if not data:
+                    open_fds.remove(fd)
+                elif len(output[fd]) < MAX_SCRIPT_OUTPUT:
+                    output[fd] += data
+        for fd in (out_r, err_r):
+            os.close(fd)
+        status = self._reap(pid, status)
+        return {
+            "stdout": output[out_r].decode("utf-8", "replace"),
+            "stderr": output[err_r].decode("utf-8", "replace"),
+            "timed_out": timed_out,
+            "returncode": None if timed_out else os.waitstatus_to_exitcode(status),
+        }
+
+    def _script_child(self, code, limits, out_w, err_w):
+        exit_code = 1
+        try:
+            os.dup2(out_w, 1)
+            os.dup2(err_w, 2)
+            os.close(out_w)
+            os.close(err_w)
+            self._restrict(limits.get("cpu_limit_s", 0), limits.get("memory_limit_mb", 0))
+            sys.argv = ["<script>"]
+            try:
+                exec(compile(code, "<script>", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+                exit_code = 0
+            except SystemExit as e:
+                if e.code is None or isinstance(e.code, int):
+                    exit_code = e.code or 0
+                else:
+                    print(e.code, file=sys.stderr)
+            except BaseException:
+                traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(exit_code)
+
+
+def _parse_args(argv):
+    # sandbox_worker.py MEMORY_MB [--fork-server] [--preload a,b,c] [--seccomp]
+    options = {"memory_limit_mb": int(argv[1]) if len(argv) > 1 else 0, "fork_server": False, "preload": [], "seccomp": False}
+    rest = argv[2:]
+    while rest:
+        arg = rest.pop(0)
+        if arg == "--fork-server":
+            options["fork_server"] = True
+        elif arg == "--preload" and rest:
+            options["preload"] = [m for m in rest.pop(0).split(",") if m]
+        elif arg == "--seccomp":
+            options["seccomp"] = True
+    return options
+
+
+def main():
+    options = _parse_args(sys.argv)
+    apply_memory_limit(options["memory_limit_mb"])
+
+    # Keep private handles on the real pipes, then detach fds 0/1/2
+    jobs_in = os.fdopen(os.dup(0), "rb")
+    replies_out = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+
+    def reply(payload: bytes):
+        replies_out.write(encode_frame(payload))
+        replies_out.flush()
+
+    zygote = None
+    if options["fork_server"]:
+        zygote = Zygote(options["preload"], options["seccomp"], channels=(jobs_in, replies_out))
+
+    reply(dumps({"ready": True}))
+
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.signal(signal.SIGPROF, _on_prof)
+
+    while True:
+        frame = read_frame(jobs_in)
+        if frame is None:
+            break
+        job = pickle.loads(frame)  # jobs come from the trusted harness
+        limits = job.get("limits", {})
+
+        if "script" in job:
+            reply(dumps(zygote.run_script(job["script"], limits)))
+            continue
+
+        retire = False
+        for index, candidate in enumerate(job["candidates"]):
+            if zygote is not None:
+                zygote.run_candidate(index, candidate, limits, reply)
+                continue
+
+            apply_cpu_limit(limits.get("cpu_limit_s", 0))
+
+            def send_chunk(entries, index=index):
+                reply(encode_results(index, entries, key="chunk"))
+
+            try:
+                results = run_candidate(candidate, limits, on_chunk=send_chunk)
+            except CandidateTimeout:
+                # A timer that fired between two guarded regions
+                _disarm()
+                results = [timeout_entry("budget", limits.get("budget_s", 0))]
+
+            reply(encode_results(index, results))
+            if leaves_state(results):
+                # The rest of the batch goes to a fresh worker
+                retire = True
+                break
+
+        reply(dumps({"done": True, "retire": retire}))
+
+
+def leaves_state(results) -> bool:
+    """
+    True if the candidate that produced `results` may have changed this
+    worker for the next one: a test timed out (the interrupted code may
+    have left anything half done), a thread it started is still running,
+    or it replaced the timer signal handlers.
+    """
+    return (
+        any(entry.get("timeout") for entry in results)
+        or threading.active_count() > 1
+        or signal.getsignal(signal.SIGALRM) is not _on_alarm
+        or signal.getsignal(signal.SIGPROF) is not _on_prof
+    )
+
+
+def encode_results(index, results, key="results") -> bytes:
+    """
+    Pickle one candidate's results (or a chunk of them) for the harness. An output the harness
+    may not load (a function, a class defined by the candidate, ...) turns
+    only that test into an error entry instead of failing the candidate.
+    Passing tests are sent compacted (verdict.compact_entry).
+    """
+    results = [compact_entry(entry) for entry in results]
+    try:
+        return dumps({"index": index, key: results}, safe=True)
+    except Exception:
+        pass
+
+    for entry in results:
+        if "output" not in entry:
+            continue
+        try:
+            dumps(entry["output"], safe=True)
+        except Exception as e:
+            output = entry.pop("output")
+            entry["error"] = f"Unsupported test output of type {type(output).__name__}: {e}"
+
+    try:
+        return dumps({"index": index, key: results}, safe=True)
+    except Exception as e:
+        error = {"error": f"Unserializable test results: {e}", "input": None, "expected": None, "verdict": CANDIDATE_ERROR}
+        return dumps({"index": index, key: [error]})
+
+
+if __name__ == "__main__":
+    main()
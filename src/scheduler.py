@@ -0,0 +1,106 @@
+# src/scheduler.py
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.config import MAX_CONCURRENCY, PROVIDER_RATE_LIMITS
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces calls evenly so that at most
+    `requests_per_minute` calls start in any one-minute window.
+    A limit of 0 (or None) disables limiting.
+    """
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def _reserve(self) -> float:
+        # Reserve the next free slot and return how long to wait for it
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        return slot - now
+
+    def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """
+    Return the shared RateLimiter for an LLM provider (e.g. "groq").
+    Every thread calling the same provider goes through the same limiter.
+    """
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = RateLimiter(PROVIDER_RATE_LIMITS.get(provider, 0))
+        return _limiters[provider]
+
+
+def run_units(fn, units, max_workers: int = MAX_CONCURRENCY, on_done=None):
+    """
+    Call fn(*unit) for every unit in `units` on a bounded thread pool.
+
+    Work is I/O bound (LLM round-trips and sandbox subprocesses), so threads
+    overlap it fine. Results are returned in the same order as `units`,
+    regardless of completion order, so output files stay deterministic.
+
+    on_done(index, unit, result) is called from the calling thread as each
+    unit finishes. If any unit raises, pending units are cancelled, units
+    already in flight are allowed to finish (and reported via on_done, so
+    their work is not lost), and the first exception is re-raised.
+    """
+    units = list(units)
+    results = [None] * len(units)
+
+    if max_workers <= 1:
+        for i, unit in enumerate(units):
+            results[i] = fn(*unit)
+            if on_done:
+                on_done(i, unit, results[i])
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fn, *unit): i for i, unit in enumerate(units)}
+        reported = set()
+        try:
+            for fut in as_completed(futures):
+                i = futures[fut]
+                results[i] = fut.result()
+                reported.add(fut)
+                if on_done:
+                    on_done(i, units[i], results[i])
+        except BaseException:
+            for fut in futures:
+                fut.cancel()
+            for fut, i in futures.items():
+                if fut in reported or fut.cancelled():
+                    continue
+                try:
+                    results[i] = fut.result()
+                except BaseException:
+                    continue
+                if on_done:
+                    on_done(i, units[i], results[i])
+            raise
+
+    return results
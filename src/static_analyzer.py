@@ -1,54 +1,128 @@
 # src/static_analyzer.py
 
-import subprocess
-import tempfile
+import ast
 from typing import List, Dict
 
+from src.result_cache import lint_cache, lint_key
+from src.tracing import span
+
+try:
+    import pycodestyle
+    from pyflakes import checker as pyflakes_checker
+except ImportError:  # flake8 (which ships both) is not installed
+    pycodestyle = None
+    pyflakes_checker = None
+
+MAX_LINE_LENGTH = 79
+
+# pyflakes message class -> flake8 code (same table flake8 uses)
+PYFLAKES_CODES = {
+    "UnusedImport": "F401",
+    "ImportShadowedByLoopVar": "F402",
+    "ImportStarUsed": "F403",
+    "LateFutureImport": "F404",
+    "ImportStarUsage": "F405",
+    "ImportStarNotPermitted": "F406",
+    "FutureFeatureNotDefined": "F407",
+    "PercentFormatInvalidFormat": "F501",
+    "StringDotFormatInvalidFormat": "F521",
+    "FStringMissingPlaceholders": "F541",
+    "MultiValueRepeatedKeyLiteral": "F601",
+    "MultiValueRepeatedKeyVariable": "F602",
+    "AssertTuple": "F631",
+    "IsLiteral": "F632",
+    "IfTuple": "F634",
+    "BreakOutsideLoop": "F701",
+    "ContinueOutsideLoop": "F702",
+    "YieldOutsideFunction": "F704",
+    "ReturnOutsideFunction": "F706",
+    "DefaultExceptNotLast": "F707",
+    "RedefinedWhileUnused": "F811",
+    "UndefinedName": "F821",
+    "UndefinedExport": "F822",
+    "UndefinedLocal": "F823",
+    "DuplicateArgument": "F831",
+    "UnusedVariable": "F841",
+    "UnusedAnnotation": "F842",
+    "RaiseNotImplemented": "F901",
+}
+
 
 def run_static_analysis(code: str) -> List[Dict]:
     """
-    Run flake8 on the given Python code string.
-    Returns a list of issue dicts:
+    Lint the given Python code string in-process (no flake8 subprocess,
+    no temp file). Returns a list of flake8-style issue dicts:
       { "code": str, "line": int, "col": int, "message": str }
 
-    If flake8 is not installed, returns an empty list.
+    Uses pyflakes + pycodestyle, flake8's own checkers with its default
+    settings. If flake8 is not installed, returns an empty list. Results
+    are cached by the exact source text.
     """
+    key = lint_key(code)
+    cached = lint_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with span("lint"):
+        issues = _analyze(code or "")
+    lint_cache.put(key, issues)
+    return issues
+
+
+def format_issues(issues: List[Dict]) -> str:
+    """One `CODE line:col message` line per issue, for prompts and logs."""
+    return "\n".join(f"{i['code']} line {i['line']}:{i['col']} {i['message']}" for i in issues)
+
+
+def _issue(code, line, col, message):
+    return {"code": code, "line": line, "col": col, "message": message}
+
+
+def _analyze(code: str) -> List[Dict]:
+    if pyflakes_checker is None:
+        return []
     try:
-        with tempfile.NamedTemporaryFile(suffix=".py", delete=False, mode="w") as tmp:
-            tmp.write(code)
-            tmp.flush()
-            tmp_name = tmp.name
-
-        # Use simple, parseable format: CODE:LINE:COL:MESSAGE
-        result = subprocess.run(
-            ["flake8", tmp_name, "--format=%(code)s:%(line)d:%(col)d:%(text)s"],
-            capture_output=True,
-            text=True,
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return [_issue("E999", e.lineno or 1, (e.offset or 0) + 1, f"SyntaxError: {e.msg}")]
+    except ValueError as e:  # e.g. null bytes in source
+        return [_issue("E999", 1, 1, f"ValueError: {e}")]
+
+    issues = _pyflakes_issues(tree) + _pycodestyle_issues(code)
+    issues.sort(key=lambda i: (i["line"], i["col"], i["code"]))
+    return issues
+
+
+def _pyflakes_issues(tree):
+    w = pyflakes_checker.Checker(tree, filename="<candidate>")
+    issues = []
+    for m in w.messages:
+        name = type(m).__name__
+        issues.append(
+            _issue(PYFLAKES_CODES.get(name, "F999"), m.lineno, m.col + 1, m.message % m.message_args)
         )
+    return issues
 
-        if result.returncode not in (0, 1):  # 0 = no issues, 1 = issues, others = errors
-            return []
-
-        issues = []
-        for line in result.stdout.splitlines():
-            parts = line.split(":", 3)
-            if len(parts) != 4:
-                continue
-            code_str, line_str, col_str, message = parts
-            try:
-                issues.append(
-                    {
-                        "code": code_str.strip(),
-                        "line": int(line_str),
-                        "col": int(col_str),
-                        "message": message.strip(),
-                    }
-                )
-            except ValueError:
-                continue
-
-        return issues
-
-    except FileNotFoundError:
-        # flake8 not installed
-        return []
+
+if pycodestyle is not None:
+
+    class _CollectingReport(pycodestyle.BaseReport):
+        def __init__(self, options):
+            super().__init__(options)
+            self.issues = []
+
+        def error(self, line_number, offset, text, check):
+            code = super().error(line_number, offset, text, check)
+            if code:
+                self.issues.append(_issue(code, line_number, offset + 1, text[5:]))
+            return code
+
+    _style_options = pycodestyle.StyleGuide(quiet=True, max_line_length=MAX_LINE_LENGTH).options
+
+
+def _pycodestyle_issues(code):
+    report = _CollectingReport(_style_options)
+    lines = code.splitlines(True)
+    checker = pycodestyle.Checker(filename="<candidate>", lines=lines, options=_style_options, report=report)
+    checker.check_all()
+    return report.issues
@@ -1,5 +1,305 @@
+# src/task_loader.py
+#
+# Task files and the task store.
+#
+#   tasks = load_tasks()                         # whole file, as before
+#
+#   store = TaskStore(["tasks/corpus/"])         # .json, .jsonl, directories, globs
+#   tasks = store.select(tags=["strings"], shard=(0, 4))
+#   task["tests"]                                # read from disk only now
+#
+# A task file is either a JSON list (the original format) or JSONL with one
+# task object per line; a directory stands for every such file in it, in
+# name order, so a corpus can be split into shard files. Opening a store
+# only indexes the tasks: for JSONL it keeps each task's metadata (every
+# field except "tests") and the byte range of its line, and the test list
+# is read back when a task is actually scheduled. The index of a JSONL file
+# is saved next to it (<file>.index.json) and reused while the file is
+# unchanged.
+
+import glob
 import json
+import os
+import threading
+
+from src.config import TASK_TESTS_CACHE_MAX, TASKS_PATH
+from src.result_cache import BoundedCache
+
+INDEX_SUFFIX = ".index.json"
+
+
+def load_tasks(path=TASKS_PATH):
+    """Every task in `path` (file, directory or glob), tests included."""
+    return [task.materialize() for task in TaskStore(path)]
+
+
+class Task(dict):
+    """
+    A task's metadata as a dict; task["tests"] (and .get("tests")) reads
+    the tests from the store on demand. Pickles as a plain dict with the
+    tests included.
+    """
+
+    def __init__(self, meta, store):
+        super().__init__(meta)
+        self._store = store
+
+    def __missing__(self, key):
+        if key == "tests" and self._store is not None:
+            return self._store.tests(self["id"])
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key == "tests" or super().__contains__(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def materialize(self) -> dict:
+        """Plain dict copy with the tests loaded."""
+        return dict(self, tests=self["tests"])
+
+    def __reduce__(self):
+        return (dict, (self.materialize(),))
+
+
+def _expand(paths):
+    if isinstance(paths, str):
+        paths = [paths]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(os.listdir(path))
+            files += [
+                os.path.join(path, n)
+                for n in names
+                if n.endswith((".json", ".jsonl")) and not n.endswith(INDEX_SUFFIX)
+            ]
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            matched = sorted(glob.glob(path))
+            if not matched:
+                raise FileNotFoundError(f"No task files match {path!r}")
+            files += [p for p in matched if not p.endswith(INDEX_SUFFIX)]
+    return files
+
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _index_jsonl(path):
+    """[(meta, offset, length)] for every task line of a JSONL file."""
+    index_path = path + INDEX_SUFFIX
+    stamp = _file_stamp(path)
+    try:
+        with open(index_path, "r") as f:
+            saved = json.load(f)
+        if saved.get("stamp") == stamp:
+            return [tuple(entry) for entry in saved["tasks"]]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    entries = []
+    offset = 0
+    with open(path, "rb") as f:
+        for line_no, line in enumerate(f, start=1):
+            if line.strip():
+                try:
+                    task = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{line_no}: invalid task line: {e}") from None
+                task.pop("tests", None)
+                entries.append((task, offset, len(line)))
+            offset += len(line)
+
+    # Best effort: a read-only corpus is simply indexed again next time
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"stamp": stamp, "tasks": entries}, f)
+        os.replace(tmp_path, index_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    return entries
+
+
+class TaskStore:
+    """
+    Index over one or more task files (see the module comment). Tasks are
+    kept in file order and looked up by id, tag or difficulty; test lists
+    are loaded lazily and the most recent TASK_TESTS_CACHE_MAX are cached.
+    Thread-safe.
+    """
+
+    def __init__(self, paths=TASKS_PATH):
+        self.files = _expand(paths)
+        self._meta = []       # task metadata, in store order
+        self._where = {}      # str(id) -> ("inline", tests) or ("jsonl", path, offset, length)
+        self._by_id = {}      # str(id) -> position
+        self._by_tag = {}     # tag -> [positions]
+        self._by_difficulty = {}  # difficulty -> [positions]
+        self._tests_cache = BoundedCache(TASK_TESTS_CACHE_MAX)
+        self._lock = threading.Lock()
+
+        for path in self.files:
+            if path.endswith(".jsonl"):
+                for meta, offset, length in _index_jsonl(path):
+                    self._add(meta, ("jsonl", path, offset, length))
+            else:
+                with open(path, "r") as f:
+                    tasks = json.load(f)
+                for task in tasks:
+                    meta = dict(task)
+                    self._add(meta, ("inline", meta.pop("tests", [])))
+
+    def _add(self, meta, where):
+        key = str(meta["id"])
+        if key in self._by_id:
+            raise ValueError(f"Duplicate task id {meta['id']!r}")
+        pos = len(self._meta)
+        self._meta.append(meta)
+        self._where[key] = where
+        self._by_id[key] = pos
+        for tag in meta.get("tags") or []:
+            self._by_tag.setdefault(tag, []).append(pos)
+        if meta.get("difficulty") is not None:
+            self._by_difficulty.setdefault(str(meta["difficulty"]), []).append(pos)
+
+    def __len__(self):
+        return len(self._meta)
+
+    def __iter__(self):
+        return (Task(meta, self) for meta in self._meta)
+
+    def ids(self) -> list:
+        return [meta["id"] for meta in self._meta]
+
+    def tags(self) -> list:
+        return sorted(self._by_tag)
+
+    def get(self, task_id) -> Task:
+        return Task(self._meta[self._by_id[str(task_id)]], self)
+
+    def tests(self, task_id) -> list:
+        """Test list of one task, read from its file unless cached."""
+        key = str(task_id)
+        where = self._where[key]
+        if where[0] == "inline":
+            return where[1]
+        tests = self._tests_cache.get(key)
+        if tests is None:
+            _, path, offset, length = where
+            with open(path, "rb") as f:
+                f.seek(offset)
+                tests = json.loads(f.read(length)).get("tests", [])
+            self._tests_cache.put(key, tests)
+        return tests
+
+    def select(self, ids=None, tags=None, difficulty=None, shard=None) -> list:
+        """
+        Tasks matching every given filter, in store order:
+          - ids:        iterable of task ids
+          - tags:       iterable of tags; a task needs at least one of them
+          - difficulty: iterable of difficulty values
+          - shard:      (index, count); keeps every count-th remaining task
+                        starting at index, so count workers with the same
+                        filters split the selection without overlap
+        """
+        positions = range(len(self._meta))
+        if ids is not None:
+            wanted = {str(i) for i in ids}
+            missing = wanted - set(self._by_id)
+            if missing:
+                raise KeyError(f"Unknown task ids: {', '.join(sorted(missing))}")
+            positions = [p for p in positions if str(self._meta[p]["id"]) in wanted]
+        if tags:
+            tagged = set()
+            for tag in tags:
+                tagged.update(self._by_tag.get(tag, []))
+            positions = [p for p in positions if p in tagged]
+        if difficulty:
+            graded = set()
+            for level in difficulty:
+                graded.update(self._by_difficulty.get(str(level), []))
+            positions = [p for p in positions if p in graded]
+        positions = list(positions)
+        if shard is not None:
+            index, count = shard
+            positions = positions[index::count]
+        return [Task(self._meta[p], self) for p in positions]
+
+
+# --- command-line selection ---------------------------------------------------
+
+def parse_ids(spec: str) -> list:
+    """'1,4,7-9' -> [1, 4, 7, 8, 9]; ids that are not numbers are kept as strings."""
+    ids = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, sep, hi = part.partition("-")
+        if sep and lo.isdigit() and hi.isdigit():
+            ids += list(range(int(lo), int(hi) + 1))
+        else:
+            ids.append(int(part) if part.isdigit() else part)
+    return ids
+
+
+def parse_shard(spec: str):
+    """'2/8' -> (2, 8): shard 2 of 8, counting from 0."""
+    try:
+        index, count = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like INDEX/COUNT, got {spec!r}") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be in 0..{count - 1}, got {spec!r}")
+    return index, count
+
+
+def add_task_arguments(parser):
+    """The --tasks/--ids/--tags/--difficulty/--shard options of the runners."""
+    parser.add_argument(
+        "--tasks",
+        nargs="+",
+        default=[TASKS_PATH],
+        metavar="PATH",
+        help="Task files (.json or .jsonl), directories of shard files, or globs.",
+    )
+    parser.add_argument("--ids", help="Only these task ids, e.g. 1,4,7-9.")
+    parser.add_argument("--tags", help="Only tasks with at least one of these comma-separated tags.")
+    parser.add_argument("--difficulty", help="Only tasks with one of these comma-separated difficulties.")
+    parser.add_argument(
+        "--shard",
+        metavar="I/N",
+        help="Run only shard I of N (0-based) of the selected tasks, for splitting a sweep across workers.",
+    )
+
+
+def tasks_from_args(args) -> list:
+    """Tasks selected by the add_task_arguments options (tests load lazily)."""
+    store = TaskStore(args.tasks)
+    return store.select(
+        ids=parse_ids(args.ids) if args.ids else None,
+        tags=[t.strip() for t in args.tags.split(",") if t.strip()] if args.tags else None,
+        difficulty=[d.strip() for d in args.difficulty.split(",") if d.strip()] if args.difficulty else None,
+        shard=parse_shard(args.shard) if args.shard else None,
+    )
+
 
-def load_tasks(path="tasks/sample_tasks.json"):
-    with open(path, "r") as f:
-        return json.load(f)
+def shard_results_path(path: str, shard_spec: str) -> str:
+    """results/x.csv -> results/x.shard2of8.csv, so shards never share a file."""
+    if not shard_spec:
+        return path
+    index, count = parse_shard(shard_spec)
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{index}of{count}{ext}"
@@ -0,0 +1,67 @@
+# src/test_history.py
+
+import hashlib
+import json
+import threading
+
+from src.verdict import CANDIDATE_ERROR, failed, verdict_of
+
+
+def test_key(test: dict) -> str:
+    """Stable identity of one test case (its input/expected/flags)."""
+    blob = json.dumps(test, sort_keys=True, default=repr)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def entry_failed(entry: dict) -> bool:
+    return failed(entry)
+
+
+def is_candidate_error(entry: dict) -> bool:
+    """
+    True for entries that belong to no single test: the code failed to
+    import, ran out of budget while importing, or the worker crashed.
+    """
+    return verdict_of(entry) == CANDIDATE_ERROR
+
+
+class TestHistory:
+    """
+    Per-task failure counts for individual tests, shared by every run,
+    strategy and repair iteration of a sweep. Tasks are identified by a
+    caller-chosen key (run_tests_adaptive uses func_name). Thread-safe.
+    """
+
+    def __init__(self):
+        self._failures = {}  # task_key -> {test_key: failure count}
+        self._lock = threading.Lock()
+
+    def record(self, task_key: str, tests: list, results: list):
+        """Count failures from `results`, aligned with `tests` by position."""
+        with self._lock:
+            counts = self._failures.setdefault(task_key, {})
+            for test, entry in zip(tests, results):
+                if is_candidate_error(entry):
+                    break
+                if entry.get("timeout") == "budget":
+                    continue  # the candidate ran out of time, not this test's fault
+                if entry_failed(entry):
+                    key = test_key(test)
+                    counts[key] = counts.get(key, 0) + 1
+
+    def failure_counts(self, task_key: str, tests: list) -> list:
+        with self._lock:
+            counts = self._failures.get(task_key, {})
+            return [counts.get(test_key(t), 0) for t in tests]
+
+    def failing_first(self, task_key: str, tests: list) -> list:
+        """Indices of the `tests` this task has failed before, most often failed first."""
+        counts = self.failure_counts(task_key, tests)
+        return sorted((i for i, c in enumerate(counts) if c > 0), key=lambda i: (-counts[i], i))
+
+    def clear(self):
+        with self._lock:
+            self._failures.clear()
+
+
+test_history = TestHistory()
@@ -1,8 +1,10 @@
-import subprocess
-import tempfile
-import json
+from src.config import ADAPTIVE_FAST_SUBSET_MAX, ADAPTIVE_TEST_ORDER
+from src.result_cache import test_results_cache, test_results_key
+from src.sandbox import get_pool
+from src.test_history import entry_failed, is_candidate_error, test_history
 
-def run_tests(code: str, tests: list, func_name: str):
+
+def run_tests(code: str, tests: list, func_name: str, fail_fast: bool = False, on_progress=None):
     """
     Executes generated python code and runs the provided tests on the specified function.
 
@@ -10,54 +12,149 @@ def run_tests(code: str, tests: list, func_name: str):
       - "input": JSON-serializable value or list/tuple of args
       - "expected": JSON-serializable value, or special string for errors (e.g. "error_div_zero")
       - optional "multi_args": bool, if True then input list is expanded as *args
+      - optional verdict options ("raises", "match", "tolerance", "unordered",
+        "comparator"), see src/verdict.py
+
+    fail_fast: stop at the first failing test. The returned list then only
+    covers the tests that ran, which is enough for analyze_results.
+
+    on_progress: optional callback(tests_done, tests_total). Tests are sent
+    to a fixed driver in the worker as data; for large suites the results
+    stream back in chunks (SANDBOX_TEST_CHUNK_SIZE) and the callback fires
+    per chunk, at least every SANDBOX_PROGRESS_INTERVAL_S seconds.
+
+    Each test runs under a wall-clock and CPU limit and the candidate as a
+    whole under a time budget (see SANDBOX_* in src/config.py). A test that
+    hits a limit is returned as a normal entry with an "error" message and a
+    "timeout" key of "wall", "cpu" or "budget".
+
+    Every test is judged inside the sandbox: each entry has a "verdict"
+    code (src/verdict.py) and a "duration_s" wall time, and failing entries
+    keep their output (with its Python type) or error. Use verdict.failed /
+    analyze_results rather than comparing outputs. Anything the code
+    prints is discarded and cannot affect the results.
+
+    The code runs in a warm, rlimited worker from the shared sandbox pool
+    (see src/sandbox.py) instead of a fresh python3 process per call.
+    Results are cached by normalized code + tests, so re-running code that
+    only differs in whitespace or comments costs no sandbox run.
     """
+    def report(i, done, total):
+        on_progress(done, total)
+
+    return run_tests_batch(
+        [(code, tests, func_name)],
+        fail_fast=fail_fast,
+        on_progress=report if on_progress else None,
+    )[0]
+
+
+def run_tests_batch(candidates: list, fail_fast: bool = False, on_progress=None):
+    """
+    Batched form of run_tests for many candidates at once.
+
+    candidates: list of (code, tests, func_name) tuples.
+    Returns one result list per candidate, in the same order.
+
+    Cache hits are answered directly; the remaining unique candidates are
+    evaluated together in a single sandbox worker, each in its own namespace
+    and with its own timeout.
+
+    on_progress: optional callback(candidate_index, tests_done, tests_total);
+    cache hits report once, as complete.
+    """
+    outcomes = [None] * len(candidates)
+    keys = [
+        test_results_key(code, tests, func_name) + (":fail_fast" if fail_fast else "")
+        for code, tests, func_name in candidates
+    ]
+
+    to_run = {}  # key -> index of the first candidate with that key
+    for i, key in enumerate(keys):
+        if key in to_run:
+            continue
+        cached = test_results_cache.get(key)
+        if cached is not None:
+            outcomes[i] = cached
+            if on_progress is not None:
+                on_progress(i, len(cached), len(candidates[i][1]))
+        else:
+            to_run[key] = i
 
-    test_script = code + "\n\n" + """
-import json
-results = []
-"""
-
-    for t in tests:
-        input_value = t["input"]
-        expected_value = t["expected"]
-        multi_args = t.get("multi_args", False)
-
-        input_literal = json.dumps(input_value)
-        expected_literal = json.dumps(expected_value)
-        multi_literal = "True" if multi_args else "False"
-
-        test_script += f"""
-try:
-    args = {input_literal}
-    if {multi_literal} and isinstance(args, list):
-        output = {func_name}(*args)
-    else:
-        output = {func_name}(args)
-    results.append({{"input": {input_literal}, "output": output, "expected": {expected_literal}}})
-except Exception as e:
-    results.append({{"error": str(e), "input": {input_literal}, "expected": {expected_literal}}})
-"""
-
-    test_script += """
-print(json.dumps(results))
-"""
-
-    with tempfile.NamedTemporaryFile(suffix=".py", delete=False) as temp:
-        temp.write(test_script.encode())
-        temp.flush()
-
-        result = subprocess.run(
-            ["python3", temp.name],
-            capture_output=True,
-            text=True
+    if to_run:
+        run_indices = list(to_run.values())
+
+        def report(j, done, total):
+            on_progress(run_indices[j], done, total)
+
+        fresh_results = get_pool().run_batch(
+            [candidates[i] for i in run_indices],
+            fail_fast=fail_fast,
+            on_progress=report if on_progress else None,
         )
+        fresh = dict(zip(to_run, fresh_results))
+        for key, results in fresh.items():
+            # Timeouts and worker crashes may be transient, so they are not cached
+            if not any(r.get("sandbox_error") or r.get("timeout") for r in results):
+                test_results_cache.put(key, results)
+        for i, key in enumerate(keys):
+            if outcomes[i] is None:
+                outcomes[i] = fresh[key]
+                if on_progress is not None and i != to_run[key]:
+                    on_progress(i, len(outcomes[i]), len(candidates[i][1]))
+
+    # Duplicates of a candidate share one result list; hand out copies
+    return [[dict(r) for r in results] for results in outcomes]
+
+
+def run_tests_adaptive(code: str, tests: list, func_name: str, verdict_only: bool = False, task_key: str = None):
+    """
+    run_tests with failure-first ordering across calls.
+
+    Every result is recorded in the shared per-task test history (task_key
+    defaults to func_name). Tests this task has failed before are run first,
+    as a fast subset of at most ADAPTIVE_FAST_SUBSET_MAX tests:
+      - if any of them fails, only the subset's results are returned (the
+        candidate is already known to fail; its failures feed the repair
+        prompt);
+      - otherwise the rest of the suite runs and the merged results are
+        returned.
+
+    verdict_only: stop at the first failure everywhere (like fail_fast).
+
+    Results come back in suite order but only cover the tests that ran, so
+    use analyze_results for the verdict rather than counting entries.
+    """
+    task_key = task_key or func_name
+    hot = test_history.failing_first(task_key, tests) if ADAPTIVE_TEST_ORDER else []
+    hot = hot[:ADAPTIVE_FAST_SUBSET_MAX]
+
+    if not hot:
+        results = run_tests(code, tests, func_name, fail_fast=verdict_only)
+        test_history.record(task_key, tests, results)
+        return results
+
+    paired, extra = _run_subset(code, tests, hot, func_name, verdict_only, task_key)
+    if not extra and not any(entry_failed(entry) for _, entry in paired):
+        hot_set = set(hot)
+        rest = [i for i in range(len(tests)) if i not in hot_set]
+        if rest:
+            more, extra = _run_subset(code, tests, rest, func_name, verdict_only, task_key)
+            paired += more
+
+    return [entry for _, entry in sorted(paired, key=lambda p: p[0])] + extra
+
+
+def _run_subset(code, tests, indices, func_name, fail_fast, task_key):
+    # Run tests[indices]; return ([(suite index, entry)], candidate-level entries)
+    subset = [tests[i] for i in indices]
+    results = run_tests(code, subset, func_name, fail_fast=fail_fast)
+    test_history.record(task_key, subset, results)
 
-    try:
-        parsed = json.loads(result.stdout)
-        # If parsed is a dict, wrap into list
-        if isinstance(parsed, dict):
-            return [parsed]
-        return parsed
-    except Exception:
-        # On total failure, return a single-error list
-        return [{"error": result.stderr, "input": None, "expected": None}]
+    paired, extra = [], []
+    for pos, entry in enumerate(results):
+        if pos < len(indices) and not is_candidate_error(entry):
+            paired.append((indices[pos], entry))
+        else:
+            extra.append(entry)
+    return paired, extra
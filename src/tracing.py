@@ -0,0 +1,181 @@
+# src/tracing.py
+#
+# Lightweight per-unit tracing for the experiment pipeline.
+#
+#   with trace(task_id=..., run_id=..., strategy=...) as tracer:
+#       ...                      # pipeline code opens span("llm.generate") etc.
+#   row.update(tracer.columns())
+#
+# The active tracer lives in a context variable, so concurrent units on the
+# scheduler's threads never see each other's spans. Code that hands work to
+# its own threads should submit `contextvars.copy_context().run` so the
+# spans land in the right tracer. Without an active tracer every call here
+# is a no-op.
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_current_tracer = contextvars.ContextVar("tracer", default=None)
+_current_span = contextvars.ContextVar("span", default=None)
+
+# Every finished span is also kept here when a trace export was requested
+_exported_events = []
+_export_lock = threading.Lock()
+_export_enabled = False
+
+# Per-row columns, in CSV order: (column, span name, what is summed)
+COLUMNS = [
+    ("llm_generate_s", "llm.generate", "seconds"),
+    ("llm_review_s", "llm.review", "seconds"),
+    ("llm_repair_s", "llm.repair", "seconds"),
+    ("generate_tokens", "llm.generate", "tokens"),
+    ("review_tokens", "llm.review", "tokens"),
+    ("repair_tokens", "llm.repair", "tokens"),
+    ("sandbox_spawn_s", "sandbox.spawn", "seconds"),
+    ("sandbox_exec_s", "sandbox.exec", "seconds"),
+    ("lint_s", "lint", "seconds"),
+]
+# Plain per-unit counters reported through add_count()
+COUNTERS = ["prompt_tokens_saved"]
+COLUMN_NAMES = [name for name, _, _ in COLUMNS] + ["prompt_tokens", "completion_tokens"] + COUNTERS + ["total_s"]
+
+
+class Tracer:
+    """Collects spans and token counts for one (task, run, strategy) unit."""
+
+    def __init__(self, **attrs):
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.total_s = None
+        self.seconds = {}
+        self.tokens = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start, duration, args=None):
+        with self._lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + duration
+
+        if _export_enabled:
+            event = {
+                "name": name,
+                "cat": name.split(".")[0],
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": duration * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {**self.attrs, **(args or {})},
+            }
+            with _export_lock:
+                _exported_events.append(event)
+
+    def add_tokens(self, span_name, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.tokens[span_name] = self.tokens.get(span_name, 0) + prompt_tokens + completion_tokens
+
+    def add_count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self):
+        self.total_s = time.perf_counter() - self.started
+
+    def columns(self) -> dict:
+        """Metrics for this unit as CSV columns (see COLUMN_NAMES)."""
+        row = {}
+        with self._lock:
+            for column, span_name, kind in COLUMNS:
+                if kind == "seconds":
+                    row[column] = round(self.seconds.get(span_name, 0.0), 4)
+                else:
+                    row[column] = self.tokens.get(span_name, 0)
+            row["prompt_tokens"] = self.prompt_tokens
+            row["completion_tokens"] = self.completion_tokens
+            for name in COUNTERS:
+                row[name] = self.counters.get(name, 0)
+        total = self.total_s if self.total_s is not None else time.perf_counter() - self.started
+        row["total_s"] = round(total, 4)
+        return row
+
+
+@contextmanager
+def trace(**attrs):
+    """Activate a fresh Tracer for the enclosed block and yield it."""
+    tracer = Tracer(**attrs)
+    token = _current_tracer.set(tracer)
+    try:
+        with span("unit"):
+            yield tracer
+    finally:
+        tracer.finish()
+        _current_tracer.reset(token)
+
+
+@contextmanager
+def span(name, **args):
+    """Time the enclosed block as `name` in the active tracer (if any)."""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        yield
+        return
+
+    token = _current_span.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.add_span(name, start, time.perf_counter() - start, args)
+        _current_span.reset(token)
+
+
+def add_tokens(prompt_tokens, completion_tokens):
+    """Attribute LLM token usage to the innermost open span."""
+    tracer = _current_tracer.get()
+    if tracer is not None:
+        tracer.add_tokens(_current_span.get(), prompt_tokens or 0, completion_tokens or 0)
+
+
+def record_span(name, seconds, prompt_tokens=0, completion_tokens=0):
+    """
+    Charge work done outside the active unit to it as span `name`, e.g.
+    this unit's share of a batched request made for several units.
+    """
+    tracer = _current_tracer.get()
+    if tracer is not None:
+        tracer.add_span(name, time.perf_counter(), seconds, {"shared": True})
+        tracer.add_tokens(name, prompt_tokens, completion_tokens)
+
+
+def add_count(name, value):
+    """Add `value` to one of the per-unit COUNTERS of the active tracer."""
+    tracer = _current_tracer.get()
+    if tracer is not None:
+        tracer.add_count(name, value)
+
+
+def enable_export():
+    """Start keeping every span for write_chrome_trace()."""
+    global _export_enabled
+    _export_enabled = True
+
+
+def write_chrome_trace(path):
+    """
+    Write all recorded spans as a Chrome trace (open in chrome://tracing or
+    https://ui.perfetto.dev). Requires enable_export() before the sweep.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _export_lock:
+        events = list(_exported_events)
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
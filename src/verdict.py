@@ -0,0 +1,308 @@
+# src/verdict.py
+#
+# The one pass/fail rule for test results. No `src.` imports: the sandbox
+# worker imports this module directly from its own directory and judges
+# every test where it ran, so each result entry arrives with a one-letter
+# "verdict" and passing tests cross the process boundary as just
+# {"verdict": "P", "duration_s": ...} (restore_entries puts their input and
+# expected value back from the test list).
+#
+# A test is a dict from the task file. Besides "input" and "expected" it
+# may carry:
+#   "raises":     exception class name (or list of names) the call must raise;
+#                 subclasses count, e.g. "ArithmeticError" accepts ZeroDivisionError
+#   "match":      regex the exception message must contain (with "raises")
+#   "tolerance":  float tolerance, a number (absolute and relative) or
+#                 {"abs": ..., "rel": ...}; applies inside lists/tuples/dicts
+#   "unordered":  compare a list/tuple/set output ignoring order
+#   "comparator": a name from COMPARATORS or a "lambda output, expected: ..."
+#                 source string (compiled in the sandbox)
+# "expected": "error_div_zero" is the legacy spelling of "raises": "ZeroDivisionError".
+#
+#   check = compile_check(test)       # cached per distinct spec
+#   check.returned(output) / check.raised(exc)  -> verdict code
+#   all_passed(results), failed(entry), describe(entry), verdict_codes(results)
+
+import math
+import numbers
+import re
+
+PASS = "P"
+WRONG_OUTPUT = "W"       # returned a value that does not match
+UNEXPECTED_ERROR = "E"   # raised although no exception was expected
+MISSING_ERROR = "M"      # returned although an exception was expected
+WRONG_ERROR = "R"        # raised, but not the expected exception
+TIMEOUT = "T"            # hit a wall/CPU/budget limit
+CANDIDATE_ERROR = "C"    # no single test: import failed, worker crashed, ...
+
+LEGACY_EXPECTED_ERRORS = {"error_div_zero": ("ZeroDivisionError",)}
+
+# Spec fields that change how a test is judged (everything but the input)
+SPEC_FIELDS = ("expected", "raises", "match", "tolerance", "unordered", "comparator")
+
+
+def _json_like(value):
+    # What a value looked like after the old json.dumps/json.loads round
+    # trip: tuples became lists and dict keys became strings
+    if isinstance(value, (list, tuple)):
+        return [_json_like(v) for v in value]
+    if isinstance(value, dict):
+        return {_json_key(k): _json_like(v) for k, v in value.items()}
+    return value
+
+
+def _json_key(key):
+    if isinstance(key, bool):
+        return "true" if key else "false"
+    if key is None:
+        return "null"
+    if isinstance(key, (int, float)):
+        return str(key)
+    return key
+
+
+def outputs_match(output, expected) -> bool:
+    """
+    Compare a typed test output with the expected value from tasks.json.
+    Tuples match lists and non-string dict keys match their JSON string
+    form, so answers that passed under the old JSON protocol still pass.
+    """
+    try:
+        if output == expected:
+            return True
+        return _json_like(output) == expected
+    except Exception:
+        # e.g. a returned object whose __eq__ raises
+        return False
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def _close(output, expected, abs_tol, rel_tol) -> bool:
+    if _is_number(output) and _is_number(expected):
+        return math.isclose(float(output), float(expected), rel_tol=rel_tol, abs_tol=abs_tol)
+    if isinstance(output, (list, tuple)) and isinstance(expected, (list, tuple)):
+        return len(output) == len(expected) and all(
+            _close(o, e, abs_tol, rel_tol) for o, e in zip(output, expected)
+        )
+    if isinstance(output, dict) and isinstance(expected, dict):
+        output = {_json_key(k): v for k, v in output.items()}
+        return output.keys() == expected.keys() and all(
+            _close(output[k], expected[k], abs_tol, rel_tol) for k in expected
+        )
+    return outputs_match(output, expected)
+
+
+def _unordered(output, expected, equal) -> bool:
+    # Multiset comparison under `equal`, so it also works with tolerances
+    # and unhashable elements
+    if not isinstance(output, (list, tuple, set, frozenset)) or not isinstance(expected, (list, tuple, set, frozenset)):
+        return equal(output, expected)
+    remaining = list(expected)
+    if len(output) != len(remaining):
+        return False
+    for item in output:
+        for j, candidate in enumerate(remaining):
+            if equal(item, candidate):
+                del remaining[j]
+                break
+        else:
+            return False
+    return True
+
+
+def _strip(output, expected):
+    return isinstance(output, str) and isinstance(expected, str) and output.strip() == expected.strip()
+
+
+def _casefold(output, expected):
+    return isinstance(output, str) and isinstance(expected, str) and output.casefold() == expected.casefold()
+
+
+# Named comparators a test can pick with "comparator"; each takes
+# (output, expected) and returns a bool. They run in the sandbox worker,
+# so new ones belong in this module.
+COMPARATORS = {
+    "default": outputs_match,
+    "exact": lambda output, expected: type(output) is type(expected) and output == expected,
+    "strip": _strip,
+    "casefold": _casefold,
+    "approx": lambda output, expected: _close(output, expected, 1e-9, 1e-6),
+}
+
+
+def _comparator(spec):
+    if spec is None:
+        return outputs_match
+    if spec in COMPARATORS:
+        return COMPARATORS[spec]
+    if isinstance(spec, str) and spec.lstrip().startswith("lambda"):
+        return eval(compile(spec, "<comparator>", "eval"), {"__builtins__": __builtins__, "math": math})
+    raise ValueError(f"Unknown comparator {spec!r}")
+
+
+class Check:
+    """The compiled verdict rule of one test spec."""
+
+    __slots__ = ("expected", "raises", "match", "equal")
+
+    def __init__(self, test: dict):
+        self.expected = test.get("expected")
+        raises = test.get("raises")
+        if raises is None and isinstance(self.expected, str):
+            raises = LEGACY_EXPECTED_ERRORS.get(self.expected)
+        if isinstance(raises, str):
+            raises = (raises,)
+        self.raises = tuple(raises) if raises else None
+        self.match = re.compile(test["match"]) if test.get("match") else None
+
+        equal = _comparator(test.get("comparator"))
+        tolerance = test.get("tolerance")
+        if tolerance is not None:
+            if isinstance(tolerance, dict):
+                abs_tol, rel_tol = float(tolerance.get("abs", 0.0)), float(tolerance.get("rel", 0.0))
+            else:
+                abs_tol = rel_tol = float(tolerance)
+            equal = _tolerant(equal, abs_tol, rel_tol)
+        if test.get("unordered"):
+            equal = _unordering(equal)
+        self.equal = equal
+
+    def returned(self, output) -> str:
+        if self.raises:
+            return MISSING_ERROR
+        try:
+            return PASS if self.equal(output, self.expected) else WRONG_OUTPUT
+        except Exception:
+            # A custom comparator or the output's __eq__ blew up
+            return WRONG_OUTPUT
+
+    def raised(self, exc: BaseException) -> str:
+        names = [cls.__name__ for cls in type(exc).__mro__]
+        return self.raised_name(names, str(exc))
+
+    def raised_name(self, type_names, message: str) -> str:
+        """raised() for an exception known only by its class name(s) and message."""
+        if not self.raises:
+            return UNEXPECTED_ERROR
+        if not any(name in self.raises for name in type_names):
+            return WRONG_ERROR
+        if self.match is not None and not self.match.search(message or ""):
+            return WRONG_ERROR
+        return PASS
+
+
+def _tolerant(equal, abs_tol, rel_tol):
+    def close(output, expected):
+        return _close(output, expected, abs_tol, rel_tol) or equal(output, expected)
+    return close
+
+
+def _unordering(equal):
+    def unordered(output, expected):
+        return _unordered(output, expected, equal)
+    return unordered
+
+
+_checks = {}
+
+
+def _spec_key(test: dict):
+    return repr([(field, test.get(field)) for field in SPEC_FIELDS if field in test])
+
+
+def compile_check(test: dict) -> Check:
+    """Check for `test`, compiled once per distinct spec."""
+    key = _spec_key(test)
+    check = _checks.get(key)
+    if check is None:
+        if len(_checks) >= 4096:
+            _checks.clear()
+        check = _checks[key] = Check(test)
+    return check
+
+
+def verdict_of(entry: dict) -> str:
+    """
+    The verdict code of a result entry. Entries from the sandbox carry it;
+    for any other entry (e.g. built by hand) it is worked out from the
+    entry's expected value, output and error.
+    """
+    code = entry.get("verdict")
+    if code is not None:
+        return code
+    if entry.get("timeout"):
+        return TIMEOUT
+    if entry.get("sandbox_error") or ("error" in entry and entry.get("input") is None and entry.get("expected") is None):
+        return CANDIDATE_ERROR
+    check = compile_check({"expected": entry.get("expected")})
+    if "error" in entry:
+        names = [entry["error_type"]] if entry.get("error_type") else []
+        if check.raises and not names and "division by zero" in entry["error"]:
+            # Old entries without an error_type: the legacy message rule
+            names = list(check.raises)
+        return check.raised_name(names, entry["error"])
+    return check.returned(entry.get("output"))
+
+
+def failed(entry: dict) -> bool:
+    return verdict_of(entry) != PASS
+
+
+def all_passed(results) -> bool:
+    return all(verdict_of(entry) == PASS for entry in results)
+
+
+def verdict_codes(results) -> str:
+    """One letter per entry, e.g. "PPWE"."""
+    return "".join(verdict_of(entry) for entry in results)
+
+
+def describe_expected(entry: dict) -> str:
+    if entry.get("raises"):
+        return "raises " + " or ".join(entry["raises"])
+    return f"{entry.get('expected')}"
+
+
+def describe(entry: dict) -> str:
+    """One-line account of a failing entry, for summaries and prompts."""
+    code = verdict_of(entry)
+    where = f"input {entry.get('input')}"
+    if code == WRONG_OUTPUT:
+        return f"Wrong output for {where}: got {entry.get('output')}, expected {describe_expected(entry)}"
+    if code == MISSING_ERROR:
+        return f"No exception for {where}: got {entry.get('output')}, expected {describe_expected(entry)}"
+    if code == WRONG_ERROR:
+        return f"Wrong exception for {where}: {entry.get('error')}, expected {describe_expected(entry)}"
+    if code == TIMEOUT:
+        return f"Timeout for {where}: {entry.get('error')}"
+    if code == CANDIDATE_ERROR:
+        return f"Candidate error: {entry.get('error')}"
+    if code == UNEXPECTED_ERROR:
+        return f"Unexpected error for {where}: {entry.get('error')}"
+    return f"Passed for {where}"
+
+
+def compact_entry(entry: dict) -> dict:
+    """What the worker sends for an entry: passing tests shrink to their verdict."""
+    if entry.get("verdict") == PASS:
+        return {"verdict": PASS, "duration_s": entry.get("duration_s", 0.0)}
+    return entry
+
+
+def restore_entries(entries: list, tests: list, start: int = 0) -> list:
+    """
+    Undo compact_entry for entries[i], the result of tests[start + i]:
+    compacted entries get their "input" and "expected" (and "raises") back.
+    """
+    for pos, entry in enumerate(entries, start):
+        if "input" not in entry and pos < len(tests):
+            test = tests[pos]
+            entry["input"] = test.get("input")
+            entry["expected"] = test.get("expected")
+            if test.get("raises"):
+                raises = test["raises"]
+                entry["raises"] = [raises] if isinstance(raises, str) else list(raises)
+    return entries
@@ -0,0 +1,324 @@
+# src/work_queue.py
+#
+# Work queue for sweeps split across processes or machines.
+#
+#   queue = open_queue("results/sweep.queue")      # SQLite file (default broker)
+#   queue.put_units({"repair_3/1/7": {...}, ...})  # idempotent
+#   run_worker(queue, handler, concurrency=4)      # in any number of processes
+#   rows = queue.results()                         # one row per finished unit
+#
+# A worker leases a unit for WORK_QUEUE_LEASE_S and renews the lease while
+# the handler runs. A unit whose lease ran out (worker killed, machine
+# gone) goes back to the queue and is retried, up to WORK_QUEUE_MAX_ATTEMPTS
+# leases; a handler exception also counts as an attempt. Results are
+# stored per unit key and the first one wins, so a unit that ends up
+# finished twice (a slow worker whose lease had expired) is merged once.
+#
+# Several processes may share one SQLite file on a local disk. For other
+# storage (a network queue, a database server) implement WorkQueue and
+# register_broker() it under a URL scheme.
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from src.config import WORK_QUEUE_LEASE_S, WORK_QUEUE_MAX_ATTEMPTS, WORK_QUEUE_POLL_S
+
+
+class WorkQueue:
+    """Broker interface; see SQLiteQueue for the semantics of each call."""
+
+    def put_units(self, units: dict) -> int:
+        raise NotImplementedError
+
+    def lease(self, worker_id: str, lease_s: float = WORK_QUEUE_LEASE_S):
+        raise NotImplementedError
+
+    def renew(self, key: str, worker_id: str, lease_s: float = WORK_QUEUE_LEASE_S) -> bool:
+        raise NotImplementedError
+
+    def complete(self, key: str, worker_id: str, row: dict) -> bool:
+        raise NotImplementedError
+
+    def fail(self, key: str, worker_id: str, error: str):
+        raise NotImplementedError
+
+    def counts(self) -> dict:
+        raise NotImplementedError
+
+    def results(self) -> list:
+        raise NotImplementedError
+
+    def failures(self) -> list:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteQueue(WorkQueue):
+    """
+    Work queue in one SQLite file. Every state change is a single
+    BEGIN IMMEDIATE transaction, so concurrent workers (threads or
+    processes) never lease the same live unit twice.
+
+    Unit states: queued -> leased -> done, or failed once a unit has used
+    up max_attempts leases without finishing.
+    """
+
+    def __init__(self, path: str, max_attempts: int = WORK_QUEUE_MAX_ATTEMPTS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Autocommit mode; transactions are opened explicitly below
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS units (
+                key TEXT PRIMARY KEY,
+                payload TEXT,
+                state TEXT,
+                attempts INTEGER,
+                worker TEXT,
+                lease_until REAL,
+                error TEXT,
+                updated_at REAL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, row TEXT, worker TEXT, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_units_state ON units(state, lease_until)")
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return out
+
+    def put_units(self, units: dict) -> int:
+        """
+        Add units {key: JSON-serializable payload}. Keys already in the
+        queue (in any state) are left alone. Returns how many were added.
+        """
+        now = time.time()
+
+        def add(conn):
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO units VALUES (?, ?, 'queued', 0, NULL, NULL, NULL, ?)",
+                [(key, json.dumps(payload), now) for key, payload in units.items()],
+            )
+            return conn.total_changes - before
+
+        return self._transaction(add)
+
+    def lease(self, worker_id: str, lease_s: float = WORK_QUEUE_LEASE_S):
+        """
+        Lease the oldest available unit: queued, or leased by a worker whose
+        lease ran out. Returns (key, payload), or None if nothing is
+        available right now.
+        """
+        def take(conn):
+            now = time.time()
+            while True:
+                row = conn.execute(
+                    "SELECT key, payload, attempts FROM units "
+                    "WHERE state = 'queued' OR (state = 'leased' AND lease_until < ?) "
+                    "ORDER BY rowid LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    return None
+                key, payload, attempts = row
+                if attempts >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE units SET state = 'failed', error = COALESCE(error, 'lease expired'), "
+                        "updated_at = ? WHERE key = ?",
+                        (now, key),
+                    )
+                    continue
+                conn.execute(
+                    "UPDATE units SET state = 'leased', attempts = attempts + 1, worker = ?, "
+                    "lease_until = ?, updated_at = ? WHERE key = ?",
+                    (worker_id, now + lease_s, now, key),
+                )
+                return key, json.loads(payload)
+
+        return self._transaction(take)
+
+    def renew(self, key: str, worker_id: str, lease_s: float = WORK_QUEUE_LEASE_S) -> bool:
+        """Extend a lease this worker still holds; False if it was lost."""
+        def extend(conn):
+            now = time.time()
+            cur = conn.execute(
+                "UPDATE units SET lease_until = ?, updated_at = ? "
+                "WHERE key = ? AND worker = ? AND state = 'leased'",
+                (now + lease_s, now, key, worker_id),
+            )
+            return cur.rowcount == 1
+
+        return self._transaction(extend)
+
+    def complete(self, key: str, worker_id: str, row: dict) -> bool:
+        """
+        Store the result of a unit and mark it done. Returns False if the
+        unit already had a result (which is kept).
+        """
+        def finish(conn):
+            now = time.time()
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?)",
+                (key, json.dumps(row), worker_id, now),
+            )
+            conn.execute(
+                "UPDATE units SET state = 'done', lease_until = NULL, updated_at = ? WHERE key = ?",
+                (now, key),
+            )
+            return cur.rowcount == 1
+
+        return self._transaction(finish)
+
+    def fail(self, key: str, worker_id: str, error: str):
+        """
+        Give up this worker's lease after an error. The unit is queued again
+        unless it has used up its attempts.
+        """
+        def release(conn):
+            now = time.time()
+            conn.execute(
+                "UPDATE units SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "lease_until = NULL, error = ?, updated_at = ? "
+                "WHERE key = ? AND worker = ? AND state = 'leased'",
+                (self.max_attempts, error, now, key, worker_id),
+            )
+
+        self._transaction(release)
+
+    def counts(self) -> dict:
+        """Units per state, plus "pending" (queued or leased)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM units GROUP BY state").fetchall()
+        counts = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        counts["pending"] = counts["queued"] + counts["leased"]
+        return counts
+
+    def results(self) -> list:
+        """Every stored result row, in unit insertion order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.row FROM results r JOIN units u ON u.key = r.key ORDER BY u.rowid"
+            ).fetchall()
+        return [json.loads(row) for (row,) in rows]
+
+    def failures(self) -> list:
+        """(key, error) of every unit that ran out of attempts."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, error FROM units WHERE state = 'failed' ORDER BY rowid"
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+BROKERS = {
+    "sqlite": SQLiteQueue,
+}
+
+
+def register_broker(scheme: str, factory):
+    """Make a queue implementation openable as "<scheme>://<location>"."""
+    BROKERS[scheme] = factory
+
+
+def open_queue(url: str) -> WorkQueue:
+    """Open "<scheme>://<location>"; a bare path is a SQLite queue file."""
+    scheme, sep, location = url.partition("://")
+    if not sep:
+        scheme, location = "sqlite", url
+    if scheme not in BROKERS:
+        raise ValueError(f"Unknown work queue broker {scheme!r}; expected one of {sorted(BROKERS)}")
+    return BROKERS[scheme](location)
+
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def run_worker(
+    queue: WorkQueue,
+    handler,
+    concurrency: int = 1,
+    worker_id: str = None,
+    lease_s: float = WORK_QUEUE_LEASE_S,
+    poll_s: float = WORK_QUEUE_POLL_S,
+    on_done=None,
+) -> int:
+    """
+    Pull units until the queue has nothing pending, with `concurrency`
+    threads each running handler(payload) -> row. While another worker
+    still holds leases the threads keep polling, so they can pick up units
+    whose lease runs out. on_done(key, row) is called for every unit this
+    worker finished. Returns that number of units.
+    """
+    worker_id = worker_id or new_worker_id()
+    finished = []
+    finished_lock = threading.Lock()
+
+    def loop(slot):
+        me = f"{worker_id}/{slot}"
+        while True:
+            leased = queue.lease(me, lease_s)
+            if leased is None:
+                if queue.counts()["pending"] == 0:
+                    return
+                time.sleep(poll_s)
+                continue
+
+            key, payload = leased
+            stop = threading.Event()
+            keeper = threading.Thread(target=_keep_lease, args=(queue, key, me, lease_s, stop), daemon=True)
+            keeper.start()
+            try:
+                row = handler(payload)
+            except Exception as e:
+                queue.fail(key, me, f"{type(e).__name__}: {e}")
+                continue
+            finally:
+                stop.set()
+                keeper.join()
+            queue.complete(key, me, row)
+            with finished_lock:
+                finished.append(key)
+                if on_done:
+                    on_done(key, row)
+
+    threads = [threading.Thread(target=loop, args=(slot,)) for slot in range(max(1, concurrency))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(finished)
+
+
+def _keep_lease(queue, key, worker_id, lease_s, stop):
+    # Renew at a third of the lease so one slow renewal does not lose it
+    while not stop.wait(lease_s / 3):
+        if not queue.renew(key, worker_id, lease_s):
+            return
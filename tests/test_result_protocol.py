@@ -0,0 +1,55 @@
+import io
+import pickle
+from collections import Counter
+from decimal import Decimal
+
+import pytest
+
+from src.result_protocol import dumps, encode_frame, read_frame, safe_loads, split_frame
+
+
+def test_read_frame_round_trip():
+    messages = [{"index": 0, "chunk": [1, 2]}, {"index": 0, "results": []}, {"done": True}]
+    stream = io.BytesIO(b"".join(encode_frame(dumps(m)) for m in messages))
+    assert [pickle.loads(read_frame(stream)) for _ in messages] == messages
+    assert read_frame(stream) is None
+
+
+def test_read_frame_truncated():
+    frame = encode_frame(dumps({"done": True}))
+    assert read_frame(io.BytesIO(frame[:-1])) is None
+    assert read_frame(io.BytesIO(frame[:2])) is None
+
+
+def test_split_frame_partial_buffers():
+    first, second = encode_frame(b"abc"), encode_frame(b"defgh")
+    data = first + second
+    for cut in range(len(first)):
+        assert split_frame(data[:cut]) == (None, data[:cut])
+    payload, rest = split_frame(data)
+    assert payload == b"abc"
+    assert split_frame(rest) == (b"defgh", b"")
+
+
+def test_split_frame_empty_payload():
+    assert split_frame(encode_frame(b"") + b"x") == (b"", b"x")
+
+
+def test_safe_round_trip_keeps_types():
+    value = {"output": ((1, 2), {3}, frozenset([4]), b"x", Decimal("1.5"), Counter("aab"), 1j)}
+    assert safe_loads(dumps(value, safe=True)) == value
+
+
+def test_safe_dumps_refuses_unknown_types():
+    class Custom:
+        pass
+
+    with pytest.raises(pickle.PicklingError):
+        dumps({"output": Custom()}, safe=True)
+    with pytest.raises(pickle.PicklingError):
+        dumps({"output": len}, safe=True)
+
+
+def test_safe_loads_refuses_unknown_globals():
+    with pytest.raises(pickle.UnpicklingError):
+        safe_loads(pickle.dumps({"output": io.BytesIO}))
@@ -0,0 +1,115 @@
+import pytest
+
+from src.verdict import (
+    CANDIDATE_ERROR,
+    MISSING_ERROR,
+    PASS,
+    TIMEOUT,
+    UNEXPECTED_ERROR,
+    WRONG_ERROR,
+    WRONG_OUTPUT,
+    all_passed,
+    compact_entry,
+    compile_check,
+    restore_entries,
+    verdict_codes,
+    verdict_of,
+)
+
+
+@pytest.mark.parametrize(
+    "test, output, verdict",
+    [
+        ({"expected": 3}, 3, PASS),
+        ({"expected": 3}, 4, WRONG_OUTPUT),
+        ({"expected": [1, 2]}, (1, 2), PASS),
+        ({"expected": {"1": "a"}}, {1: "a"}, PASS),
+        ({"expected": 0.3, "tolerance": 1e-9}, 0.1 + 0.2, PASS),
+        ({"expected": [0.3, 1.0], "tolerance": {"abs": 1e-9}}, [0.1 + 0.2, 1.0], PASS),
+        ({"expected": 0.3}, 0.1 + 0.2, WRONG_OUTPUT),
+        ({"expected": [1, 2, 3], "unordered": True}, [3, 1, 2], PASS),
+        ({"expected": [1, 1, 2], "unordered": True}, [1, 2, 2], WRONG_OUTPUT),
+        ({"expected": "Abc", "comparator": "casefold"}, "aBC", PASS),
+        ({"expected": 1, "comparator": "exact"}, True, WRONG_OUTPUT),
+        ({"expected": 10, "comparator": "lambda output, expected: output >= expected"}, 12, PASS),
+        ({"expected": None, "raises": "ValueError"}, None, MISSING_ERROR),
+    ],
+)
+def test_returned(test, output, verdict):
+    assert compile_check(test).returned(output) == verdict
+
+
+@pytest.mark.parametrize(
+    "test, exc, verdict",
+    [
+        ({"expected": None, "raises": "ValueError"}, ValueError("bad"), PASS),
+        ({"expected": None, "raises": "ArithmeticError"}, ZeroDivisionError("x"), PASS),
+        ({"expected": None, "raises": ["KeyError", "IndexError"]}, IndexError(), PASS),
+        ({"expected": None, "raises": "ValueError"}, TypeError("x"), WRONG_ERROR),
+        ({"expected": None, "raises": "ValueError", "match": "neg"}, ValueError("negative"), PASS),
+        ({"expected": None, "raises": "ValueError", "match": "neg"}, ValueError("other"), WRONG_ERROR),
+        ({"expected": "error_div_zero"}, ZeroDivisionError("division by zero"), PASS),
+        ({"expected": 1}, ValueError("x"), UNEXPECTED_ERROR),
+    ],
+)
+def test_raised(test, exc, verdict):
+    assert compile_check(test).raised(exc) == verdict
+
+
+def test_compile_check_is_cached_per_spec():
+    assert compile_check({"input": 1, "expected": 2}) is compile_check({"input": 5, "expected": 2})
+    assert compile_check({"expected": 2}) is not compile_check({"expected": 2, "tolerance": 0.1})
+
+
+@pytest.mark.parametrize(
+    "entry, verdict",
+    [
+        ({"verdict": WRONG_OUTPUT, "input": 1, "expected": 1, "output": 1}, WRONG_OUTPUT),
+        ({"input": 1, "expected": 1, "output": 1}, PASS),
+        ({"input": 1, "expected": 2, "output": 1}, WRONG_OUTPUT),
+        ({"input": 0, "expected": "error_div_zero", "error": "division by zero"}, PASS),
+        ({"input": 1, "expected": 1, "error": "boom", "error_type": "ValueError"}, UNEXPECTED_ERROR),
+        ({"input": 1, "expected": 1, "error": "Timeout", "timeout": "wall"}, TIMEOUT),
+        ({"input": None, "expected": None, "error": "SyntaxError"}, CANDIDATE_ERROR),
+        ({"input": None, "expected": None, "error": "died", "sandbox_error": True}, CANDIDATE_ERROR),
+    ],
+)
+def test_verdict_of(entry, verdict):
+    assert verdict_of(entry) == verdict
+
+
+def test_verdict_codes_and_all_passed():
+    results = [{"verdict": PASS}, {"verdict": PASS}, {"verdict": WRONG_OUTPUT}, {"verdict": UNEXPECTED_ERROR}]
+    assert verdict_codes(results) == "PPWE"
+    assert not all_passed(results)
+    assert all_passed(results[:2])
+
+
+def test_compact_restore_round_trip():
+    tests = [
+        {"input": [1, 2], "expected": 3},
+        {"input": 0, "expected": None, "raises": "ZeroDivisionError"},
+        {"input": [2, 2], "expected": 5},
+    ]
+    entries = [
+        {"input": [1, 2], "expected": 3, "output": 3, "verdict": PASS, "duration_s": 0.1},
+        {"input": 0, "expected": None, "error": "division by zero", "error_type": "ZeroDivisionError",
+         "verdict": PASS, "duration_s": 0.2},
+        {"input": [2, 2], "expected": 5, "output": 4, "verdict": WRONG_OUTPUT, "duration_s": 0.3},
+    ]
+    compacted = [compact_entry(dict(e)) for e in entries]
+    assert compacted[0] == {"verdict": PASS, "duration_s": 0.1}
+    assert compacted[2] == entries[2]
+
+    restored = restore_entries(compacted, tests)
+    assert restored[0] == {"verdict": PASS, "duration_s": 0.1, "input": [1, 2], "expected": 3}
+    assert restored[1]["raises"] == ["ZeroDivisionError"]
+    assert restored[2] == entries[2]
+    assert verdict_codes(restored) == "PPW"
+
+
+def test_restore_entries_with_offset():
+    # Chunks after the first restore against their position in the suite
+    tests = [{"input": i, "expected": i} for i in range(4)]
+    restored = restore_entries([{"verdict": PASS, "duration_s": 0.0} for _ in range(2)], tests, start=2)
+    assert [e["input"] for e in restored] == [2, 3]